@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+設定ファイル（~/.edge_live_viewer/settings.json）の既定値と読み込み
+
+MainWindow とヘッドレスモードの両方が使うため、Qt に依存しない。
+"""
+
+import os
+import copy
+import json
+import logging
+
+logger = logging.getLogger('EdgeLiveViewer')
+
+SETTINGS_DIR = os.path.expanduser("~/.edge_live_viewer")
+SETTINGS_FILE = os.path.join(SETTINGS_DIR, "settings.json")
+
+DEFAULT_SETTINGS = {
+    "font_size": 31, "font_weight": 75, "font_shadow": 2, "font_color": "#FFFFFF", "font_family": "MS PGothic",
+    "font_shadow_directions": ["bottom-right"], "font_shadow_color": "#000000", "comment_speed": 6.0,
+    "comment_delay": 0, "display_position": "top", "max_comments": 80, "window_opacity": 0.8, "update_interval": 5,
+    "playback_speed": 1.0, "auto_next_thread": True, "next_thread_search_duration": 180, "first_launch": True,
+    "overlay_x": 100, "overlay_y": 100, "overlay_width": 600, "overlay_height": 800,
+    "hide_anchor_comments": False, "hide_url_comments": False, "spacing": 30, "ng_ids": [], "ng_names": [], "ng_texts": [],
+    "auth_token": None, "tinker_token": None, "hide_name_mail_on_detach": False, "display_images": True, "hide_image_urls": True,
+    # ### 機能追加: 本流スレ監視設定のデフォルト値を追加 ###
+    "watch_mainstream_thread": True,
+    "watch_duration": 60,
+    "watch_delay": 15,
+    "momentum_ratio": 1.5,
+    # Range リクエストによる dat の差分取得
+    "use_range_requests": True,
+    # 流速に応じた適応ポーリング
+    "adaptive_polling": False,
+    "adaptive_min_interval": 0.5,
+    "adaptive_max_interval": 10.0,
+    # asyncio による取得エンジン（False なら取得対象ごとに QThread を使う）
+    "async_engine": False,
+    # 並行監視（全購読合計の1秒あたりのリクエスト数と、待機中スレッドの取得間隔）
+    "poll_budget_per_second": 4.0,
+    "warm_poll_interval": 10.0,
+    # このレス数に達したら次スレを探して先に取得を始める（0 で無効）
+    "next_thread_prearm_at": 950,
+    # 板のURL（空なら bbs.eddibb.cc に直接接続。board_relay.py のリレーを指定できる）
+    "board_base_url": "",
+    # 完結した dat の zstd 圧縮アーカイブ
+    "use_dat_archive": True,
+    "dat_archive_max_mb": 200,
+}
+
+
+def load_settings(settings_file=SETTINGS_FILE):
+    """既定値に設定ファイルの値を重ねた辞書を返す（既定値にないキーは無視する）"""
+    settings = copy.deepcopy(DEFAULT_SETTINGS)
+    try:
+        if os.path.exists(settings_file):
+            with open(settings_file, "r", encoding="utf-8") as f:
+                loaded_settings = json.load(f)
+            for key, value in loaded_settings.items():
+                if key in settings:
+                    settings[key] = value
+    except Exception as e:
+        logger.error(f"設定の読み込みに失敗しました: {str(e)}")
+    return settings
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+dat 1行パーサーのマイクロベンチマーク
+
+1000レスの合成datを、旧 CommentFetcher.run 相当の解析と dat_parser.parse_dat_line で
+それぞれ解析し、1回あたりの所要時間と速度比を表示する。
+
+    python benchmarks/bench_dat_parser.py [--posts 1000] [--repeat 20]
+"""
+
+import os
+import re
+import sys
+import html
+import time
+import argparse
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dat_parser import parse_dat_line
+
+SAMPLE_BODIES = [
+    "きたああああああ",
+    " <br> 今日の試合やばい <br> 延長あるか？ ",
+    "&gt;&gt;12 それな &amp; わかる",
+    '<a href="../test/read.cgi/liveedge/1742132339/5" rel="noopener noreferrer" target="_blank">&gt;&gt;5</a> ほんこれ',
+    "画像 https://i.imgur.com/abcdEFG.jpg",
+    "<b>太字</b> と 普通の文字 !metadent:abcdef012345",
+]
+
+
+def build_synthetic_dat(posts=1000):
+    """1000レス分の合成datを生成する"""
+    lines = []
+    for i in range(posts):
+        name = "エッヂの名無し" if i % 7 else "エッヂの名無し</b>(ｵｲｺﾗﾐﾝﾅ abcd-EF12)<b>"
+        date_id = f"2025/03/16(日) 21:{(i // 60) % 60:02d}:{i % 60:02d}.{i % 100:02d} ID:Ab{i:06d}"
+        body = SAMPLE_BODIES[i % len(SAMPLE_BODIES)]
+        title = "【実況】ベンチマークスレ★1" if i == 0 else ""
+        lines.append(f"{name}<><>{date_id}<>{body}<>{title}")
+    return "\n".join(lines) + "\n"
+
+
+def legacy_parse_timestamp(date_str):
+    """旧 parse_datetime + datetime.timestamp() 相当"""
+    match = re.match(r'(\d{4}/\d{2}/\d{2}\(\S+\) \d{2}:\d{2}:\d{2}\.\d+)', date_str)
+    if not match:
+        return None
+    base, millis = match.group(1).rsplit('.', 1)
+    millis = millis.ljust(6, '0')
+    normalized_date = re.sub(r'\(\S+\)', '', f"{base}.{millis}")
+    return datetime.strptime(normalized_date, "%Y/%m/%d %H:%M:%S.%f").timestamp()
+
+
+def legacy_parse_dat(text):
+    """旧 CommentFetcher.run と同じ手順で全行を解析する（比較用）"""
+    comments = []
+    lines = text.split('\n')
+    for i in range(len(lines)):
+        line = lines[i]
+        if not line.strip():
+            continue
+        parts = line.split('<>')
+        if len(parts) >= 4:
+            date_id = parts[2]
+            body = parts[3]
+            id_match = re.search(r'ID:([^ ]+)', date_id)
+            date_match = re.search(r'(\d{4}/\d{2}/\d{2}\(\S+\) \d{2}:\d{2}:\d{2}\.\d+)', date_id)
+            date = date_match.group(1) if date_match else date_id
+            body = body.replace('<br>', ' ')
+            body = re.sub(r'<.*?>', '', body)
+            body = re.sub(r'!metadent:.*?$', '', body, flags=re.MULTILINE)
+            body = html.unescape(body)
+            comments.append({
+                'number': i + 1,
+                'name': parts[0],
+                'date': date,
+                'id': id_match.group(1) if id_match else "",
+                'text': body,
+                'timestamp': legacy_parse_timestamp(date)
+            })
+    return comments
+
+
+def parse_dat(text):
+    comments = []
+    for i, line in enumerate(text.split('\n')):
+        if line.strip():
+            comment = parse_dat_line(line, i + 1)
+            if comment:
+                comments.append(comment)
+    return comments
+
+
+def same_results(expected, actual):
+    """タイムスタンプの丸め誤差を除いて解析結果が一致するか"""
+    if len(expected) != len(actual):
+        return False
+    for a, b in zip(expected, actual):
+        if a['timestamp'] is None or b['timestamp'] is None:
+            if a['timestamp'] is not b['timestamp']:
+                return False
+        elif abs(a['timestamp'] - b['timestamp']) > 1e-6:
+            return False
+        if {k: v for k, v in a.items() if k != 'timestamp'} != {k: v for k, v in b.items() if k != 'timestamp'}:
+            return False
+    return True
+
+
+def measure(func, text, repeat):
+    """repeat 回のうち最速の1回の所要時間（秒）を返す"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="dat 1行パーサーのマイクロベンチマーク")
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    text = build_synthetic_dat(args.posts)
+    legacy = legacy_parse_dat(text)
+    current = parse_dat(text)
+    if not same_results(legacy, current):
+        print("エラー: 旧実装と解析結果が一致しません")
+        return 1
+
+    legacy_time = measure(legacy_parse_dat, text, args.repeat)
+    current_time = measure(parse_dat, text, args.repeat)
+    print(f"合成dat: {args.posts}レス, {len(text.encode('utf-8')) / 1024:.1f}KB")
+    print(f"旧実装        : {legacy_time * 1000:8.2f} ms")
+    print(f"parse_dat_line: {current_time * 1000:8.2f} ms")
+    print(f"速度比        : {legacy_time / current_time:8.2f} 倍")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+取得・解析・次スレ判定・描画の主な処理をまとめて計測するベンチマークスイート
+
+ディスプレイのない Linux でも動くよう、Qt は offscreen プラットフォームで起動する。
+各ケースを repeat 回実行して1回あたりの所要時間（最小・中央値・p95）と処理量を求め、
+JSON のベースラインに保存する。compare はベースラインと比べて最小値が threshold 以上
+遅くなったケースを表示し、1つでもあれば終了コード 1 を返す（他のケースと同じく、
+ほかの処理の割り込みに左右されにくい最速の1回で比べる）。
+
+- dat_full_parse: 1000レスの dat を IncrementalDatParser.feed_full で解析する（CommentFetcher の初回取得）
+- dat_tail_parse: 990レス解析済みのパーサー50個に追記10レスずつを feed_tail で渡す（以降の取得）
+- dat_poll_mock: mock_board に10レス追記し、DatPoller.poll で Range 取得から解析までを行う
+- subject_parse: 500スレッドの subject.txt を parse_subject_threads で解析する
+- next_thread_cold / next_thread_warm: select_next_thread_in（類似度キャッシュなし / あり）
+- overlay_add_comment: CommentOverlayWindow.add_comment で50件追加する（Pixmap 生成と行探索）
+- overlay_frame: 80件表示中に update_comments と paintEvent（repaint）を1フレーム分行う
+
+PyQt5 が読み込めない環境では Qt を使うケースを skipped として記録する。
+ログ出力は計測に含めないよう、実行中は WARNING 未満を抑止する。
+
+    python benchmarks/bench_suite.py run [--repeat 30] [--only dat_full_parse ...] [--out benchmarks/baselines/baseline.json]
+    python benchmarks/bench_suite.py compare [benchmarks/baselines/baseline.json] [current.json] [--threshold 0.15]
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import logging
+import platform
+import argparse
+import statistics
+from datetime import datetime
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_dat_parser import build_synthetic_dat
+from bench_title_similarity import build_synthetic_subject
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baselines", "baseline.json")
+DEFAULT_REPEAT = 30
+DEFAULT_THRESHOLD = 0.15
+
+
+class SkipCase(Exception):
+    """このケースを実行できない環境（PyQt5 がないなど）"""
+
+
+class Case:
+    """1つの計測対象。setup() の戻り値を run() に渡し、run() の時間だけを計る
+
+    units は run() 1回で処理する件数（処理量の計算に使う）、unit はその単位。
+    """
+
+    def __init__(self, name, setup, run, units=1, unit="回"):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.units = units
+        self.unit = unit
+
+
+def measure(case, repeat):
+    """repeat 回の所要時間から集計値の辞書を作る（1回目は準備運動として捨てる）
+
+    timeit と同じく、計測中はガベージコレクションを止める。
+    """
+    samples = []
+    for i in range(repeat + 1):
+        state = case.setup()
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            case.run(state)
+            elapsed = time.perf_counter() - start
+        finally:
+            if gc_enabled:
+                gc.enable()
+        if i > 0:
+            samples.append(elapsed)
+    samples.sort()
+    median = statistics.median(samples)
+    return {
+        "min_ms": round(samples[0] * 1000, 4),
+        "median_ms": round(median * 1000, 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 4),
+        "throughput": round(case.units / median, 1) if median > 0 else None,
+        "unit": f"{case.unit}/秒",
+        "repeat": repeat,
+    }
+
+
+# --- 取得・解析 ---
+
+def parse_cases():
+    from board_core import IncrementalDatParser, parse_subject_threads
+
+    dat = build_synthetic_dat(1000).encode("utf-8")
+    lines = dat.split(b"\n")
+    head = b"\n".join(lines[:990]) + b"\n"
+    tail = b"\n".join(lines[990:1000]) + b"\n"
+
+    def tail_setup():
+        # 1回の追記は短すぎて計測誤差が大きいため、50スレッド分をまとめて計る
+        parsers = [IncrementalDatParser("utf-8") for _ in range(50)]
+        for parser in parsers:
+            parser.feed_full(head)
+        return parsers
+
+    subject = build_synthetic_subject(500)
+    return [
+        Case("dat_full_parse", lambda: IncrementalDatParser("utf-8"),
+             lambda parser: parser.feed_full(dat), units=1000, unit="レス"),
+        Case("dat_tail_parse", tail_setup, lambda parsers: [parser.feed_tail(tail) for parser in parsers],
+             units=500, unit="レス"),
+        Case("subject_parse", lambda: None, lambda _: parse_subject_threads(subject), units=500, unit="スレッド"),
+    ]
+
+
+def poll_cases():
+    import requests
+    from mock_board import MockBoard, start_mock_board
+    from board_core import DatPoller
+
+    board = MockBoard()
+    thread = board.add_thread("1742132339", "【実況】ベンチマークスレ★1", created_at=1742132339, pending_posts=990)
+    server, base_url = start_mock_board(board)
+    session = requests.Session()
+    poller = DatPoller(thread.thread_id, base_url=base_url)
+    poller.poll(lambda url, headers: session.get(url, headers=headers, timeout=5))
+
+    def setup():
+        if thread.res_count >= 1000:
+            # 1000レスに達したら作り直し、Range 取得の差分が常に10レスになるようにする
+            with board.lock:
+                thread.lines = thread.lines[:990]
+                thread.res_count = 990
+                thread.generation += 1
+            poller.request_resync()
+            poller.poll(lambda url, headers: session.get(url, headers=headers, timeout=5))
+        with board.lock:
+            for _ in range(10):
+                board.post(thread.thread_id, posted_at=1742132339 + thread.res_count)
+        return poller
+
+    case = Case("dat_poll_mock", setup,
+                lambda p: p.poll(lambda url, headers: session.get(url, headers=headers, timeout=5)),
+                units=10, unit="レス")
+    case.server = server
+    return [case]
+
+
+# --- 次スレ判定 ---
+
+def next_thread_cases():
+    from board_core import parse_subject_threads, select_next_thread_in
+    from title_similarity import _ratio, _index_for
+
+    threads = parse_subject_threads(build_synthetic_subject(500))
+    query = "【実況】プロ野球 巨人vs阪神★12"
+
+    def cold_setup():
+        _ratio.cache_clear()
+        _index_for.cache_clear()
+
+    return [
+        Case("next_thread_cold", cold_setup, lambda _: select_next_thread_in("1", query, threads),
+             units=len(threads), unit="候補"),
+        Case("next_thread_warm", lambda: None, lambda _: select_next_thread_in("1", query, threads),
+             units=len(threads), unit="候補"),
+    ]
+
+
+# --- 描画 ---
+
+def overlay_cases():
+    try:
+        from PyQt5.QtWidgets import QApplication
+        from comment_animation_improved import CommentOverlayWindow
+    except ImportError as e:
+        raise SkipCase(f"PyQt5 を読み込めません: {e}")
+    from board_core import IncrementalDatParser
+
+    app = QApplication.instance() or QApplication([])
+    app.setProperty("comment_time", time.time())
+    comments = IncrementalDatParser("utf-8").feed_full(build_synthetic_dat(1000).encode("utf-8"))[0]
+
+    window = CommentOverlayWindow()
+    # 画像の取得（通信）は計測対象外
+    window.update_settings(dict(window.settings, display_images=False, max_comments=80))
+    window.stop_image_loader()
+    for timer in (window.timer, window.flow_timer, window.delay_processor, window.image_queue_timer):
+        timer.stop()
+    window.resize(1280, 720)
+    window.show()
+    app.processEvents()
+
+    def clear():
+        window.comments.clear()
+        window.row_usage.clear()
+
+    def add_setup():
+        clear()
+        return comments[:50]
+
+    def add_run(batch):
+        for comment in batch:
+            window.add_comment(comment)
+
+    def frame_setup():
+        if len(window.comments) < 80:
+            clear()
+            for comment in comments[100:180]:
+                window.add_comment(comment)
+            # 画面全体に散らばるよう位置をずらす
+            for i, comment in enumerate(window.comments):
+                comment.x = (i * 97) % window.width()
+        return window
+
+    def frame_run(w):
+        w.update_comments()
+        w.repaint()
+
+    cases = [
+        Case("overlay_add_comment", add_setup, add_run, units=50, unit="コメント"),
+        Case("overlay_frame", frame_setup, frame_run, units=1, unit="フレーム"),
+    ]
+    for case in cases:
+        # QApplication が先に破棄されないよう、ケースに参照を持たせる
+        case.app = app
+        case.window = window
+    return cases
+
+
+CASE_GROUPS = [parse_cases, poll_cases, next_thread_cases, overlay_cases]
+GROUP_CASE_NAMES = {
+    parse_cases: ["dat_full_parse", "dat_tail_parse", "subject_parse"],
+    poll_cases: ["dat_poll_mock"],
+    next_thread_cases: ["next_thread_cold", "next_thread_warm"],
+    overlay_cases: ["overlay_add_comment", "overlay_frame"],
+}
+
+
+def run_suite(repeat=DEFAULT_REPEAT, only=None):
+    results = {}
+    previous_disable = logging.root.manager.disable
+    logging.disable(logging.INFO)
+    try:
+        for group in CASE_GROUPS:
+            names = GROUP_CASE_NAMES[group]
+            if only and not set(only) & set(names):
+                continue
+            try:
+                cases = group()
+            except SkipCase as e:
+                for name in names:
+                    results[name] = {"skipped": str(e)}
+                continue
+            for case in cases:
+                if only and case.name not in only:
+                    continue
+                results[case.name] = measure(case, repeat)
+            for case in cases:
+                if hasattr(case, "server"):
+                    case.server.shutdown()
+                    case.server.server_close()
+                if hasattr(case, "window"):
+                    case.window.close()
+    finally:
+        logging.disable(previous_disable)
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "qt_platform": os.environ.get("QT_QPA_PLATFORM"),
+        },
+        "results": results,
+    }
+
+
+def print_results(report):
+    for name, result in report["results"].items():
+        if "skipped" in result:
+            print(f"{name:22s} skipped: {result['skipped']}")
+            continue
+        print(f"{name:22s} 中央値 {result['median_ms']:9.3f} ms  最小 {result['min_ms']:9.3f} ms  "
+              f"p95 {result['p95_ms']:9.3f} ms  {result['throughput']:>12,.1f} {result['unit']}")
+
+
+def compare_reports(baseline, current, threshold):
+    """最小値が threshold 以上遅くなったケースの (名前, ベースライン, 今回, 変化率) のリストを返し、比較表を表示する"""
+    regressions = []
+    for name, base in baseline["results"].items():
+        now = current["results"].get(name)
+        if now is None or "skipped" in base or "skipped" in now:
+            print(f"{name:22s} 比較できません")
+            continue
+        change = now["min_ms"] / base["min_ms"] - 1 if base["min_ms"] > 0 else 0.0
+        regressed = change >= threshold
+        mark = "遅くなりました" if regressed else ("速くなりました" if change <= -threshold else "")
+        print(f"{name:22s} {base['min_ms']:9.3f} ms -> {now['min_ms']:9.3f} ms  {change:+7.1%}  {mark}")
+        if regressed:
+            regressions.append((name, base["min_ms"], now["min_ms"], change))
+    return regressions
+
+
+def load_report(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="取得・解析・次スレ判定・描画のベンチマークスイート")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="計測して結果を表示する（--out で JSON に保存）")
+    run_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    run_parser.add_argument("--only", nargs="+", help="計測するケース名")
+    run_parser.add_argument("--out", help="結果を保存する JSON のパス（ベースラインの更新にも使う）")
+    compare_parser = subparsers.add_parser("compare", help="ベースラインと比べて遅くなったケースを表示する")
+    compare_parser.add_argument("baseline", nargs="?", default=DEFAULT_BASELINE)
+    compare_parser.add_argument("current", nargs="?", help="比較する結果の JSON（省略するとその場で計測する）")
+    compare_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help="遅くなったとみなす最小値の増加率（0.15 なら15%%）")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = run_suite(args.repeat, args.only)
+        print_results(report)
+        if args.out:
+            os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"結果を保存しました: {args.out}")
+        return 0
+
+    baseline = load_report(args.baseline)
+    current = load_report(args.current) if args.current else run_suite(args.repeat, list(baseline["results"]))
+    regressions = compare_reports(baseline, current, args.threshold)
+    if regressions:
+        print(f"{len(regressions)}件のケースがベースラインより {args.threshold:.0%} 以上遅くなりました")
+        return 1
+    print("ベースラインより遅くなったケースはありません")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
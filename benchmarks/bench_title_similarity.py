@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+タイトル類似度計算のマイクロベンチマーク
+
+500スレッドの合成 subject.txt に対し、次スレ検索1回分の類似度計算を
+旧実装（全スレッドに difflib.SequenceMatcher.ratio）と title_similarity.similar_titles で
+それぞれ行い、1回あたりの所要時間と速度比を表示する。
+similar_titles の絞り込みが一致するタイトルを落としていないことも確認する。
+
+    python benchmarks/bench_title_similarity.py [--threads 500] [--repeat 20]
+"""
+
+import os
+import sys
+import time
+import random
+import difflib
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from title_similarity import similar_titles, normalize_title, _ratio, _index_for
+
+THRESHOLD = 0.3
+
+SERIES = [
+    "【実況】プロ野球 巨人vs阪神",
+    "【実況】サッカー日本代表 W杯最終予選",
+    "【ニュース】今日のトップニュースを語るスレ",
+    "【雑談】エッヂ民の夜ふかしスレ",
+    "ガンダム新作 最新話実況",
+    "【悲報】ワイ、寝坊する",
+    "●なんJ風 雑談スレ",
+    "【速報】台風情報を見守るスレ",
+    "朝ドラ 本日の放送回を語るスレ",
+    "競馬 メインレース予想と実況",
+]
+SUFFIXES = ["", "★{n}", "Part{n}", "Part.{n}", " ★{n}"]
+WORDS = ["ワイ", "今日", "なんで", "やばい", "これ", "ほんま", "草", "定期", "ガチ", "雑談", "速報", "画像"]
+
+
+def build_synthetic_subject(threads=500, seed=1):
+    """シリーズ物のスレッドとばらばらな単発スレッドを混ぜた subject.txt を生成する"""
+    rng = random.Random(seed)
+    lines = []
+    base_id = 1742132339
+    for i in range(threads):
+        if i % 3 == 0:
+            series = SERIES[i % len(SERIES)]
+            title = series + rng.choice(SUFFIXES).format(n=rng.randint(1, 40))
+        else:
+            title = "".join(rng.choice(WORDS) for _ in range(rng.randint(3, 8)))
+        lines.append(f"{base_id - i * 37}.dat<>{title} ({rng.randint(1, 1000)})")
+    return "\n".join(lines) + "\n"
+
+
+def subject_titles(text):
+    return [line.split("<>", 1)[1].rsplit(" (", 1)[0] for line in text.splitlines() if line]
+
+
+def legacy_similar_titles(title, titles, threshold):
+    """旧 select_next_thread_in / filter_mainstream_candidates と同じ全件比較（比較用）"""
+    matches = {}
+    for candidate in titles:
+        ratio = difflib.SequenceMatcher(None, title, candidate).ratio()
+        if ratio >= threshold:
+            matches[candidate] = ratio
+    return matches
+
+
+def brute_force_similar_titles(title, titles, threshold):
+    """similar_titles と同じ正規化で全件を厳密に比較する（絞り込みの検証用）"""
+    query = normalize_title(title)
+    return {candidate: _ratio(query, normalize_title(candidate)) for candidate in titles
+            if _ratio(query, normalize_title(candidate)) >= threshold}
+
+
+def clear_caches():
+    _ratio.cache_clear()
+    _index_for.cache_clear()
+
+
+def measure(func, queries, titles, repeat, clear_cache=None):
+    """repeat 回のうち最速の1回の所要時間（秒）を返す"""
+    best = float("inf")
+    for _ in range(repeat):
+        if clear_cache:
+            clear_cache()
+        start = time.perf_counter()
+        for query in queries:
+            func(query, titles, THRESHOLD)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="タイトル類似度計算のマイクロベンチマーク")
+    parser.add_argument("--threads", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    titles = subject_titles(build_synthetic_subject(args.threads))
+    queries = [series + "★12" for series in SERIES]
+
+    for query in queries:
+        if similar_titles(query, titles, THRESHOLD) != brute_force_similar_titles(query, titles, THRESHOLD):
+            print(f"エラー: 絞り込みで一致するタイトルが失われました: {query}")
+            return 1
+
+    legacy_time = measure(legacy_similar_titles, queries, titles, args.repeat)
+    cold_time = measure(similar_titles, queries, titles, args.repeat, clear_cache=clear_caches)
+    warm_time = measure(similar_titles, queries, titles, args.repeat)
+    print(f"合成 subject.txt: {len(titles)}スレッド, 検索 {len(queries)}回")
+    print(f"旧実装（difflib 全件）    : {legacy_time * 1000:8.2f} ms")
+    print(f"similar_titles（初回）    : {cold_time * 1000:8.2f} ms  速度比 {legacy_time / cold_time:6.2f} 倍")
+    print(f"similar_titles（2回目以降）: {warm_time * 1000:8.2f} ms  速度比 {legacy_time / warm_time:6.2f} 倍")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+実際の板の代わりに subject.txt と伸びていく dat を返すローカルのモック板
+
+CommentFetcher・NextThreadFinder・MainstreamWatcher などをオフラインで動かし、計測するためのもの。
+ビュアーの設定「板のURL」（各クラスの base_url）を http://127.0.0.1:<ポート> にすると、このサーバーから取得する。
+Range / ETag / If-Modified-Since への応答は board_relay.RelayHandler と同じ（206・304・416）。
+
+書き込みは次のどちらかで発生させる。どちらもリクエストを受けたときに経過時間の分だけ進める。
+- SyntheticFeed: 実況スレッドに毎秒 posts_per_second 件書き込み、1000レスで次スレ（★n+1）を立てる。
+  splits を指定すると、次スレと同時に勢いの弱い重複スレッドも立てる
+- ReplayFeed: record で記録した実際のセッション（JSONL）を speed 倍速で再生する
+
+    python benchmarks/mock_board.py [--port 8766] [--posts-per-second 5] [--threads 500] [--splits 1]
+    python benchmarks/mock_board.py --replay session.jsonl [--speed 4]
+    python benchmarks/mock_board.py --record 1742132339 --duration 600 --out session.jsonl
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from datetime import datetime
+from email.utils import formatdate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from board_relay import create_server, ETAG_PREFIX, UPSTREAM
+
+logger = logging.getLogger('MockBoard')
+
+WEEKDAYS = "月火水木金土日"
+SAMPLE_BODIES = [
+    "きたああああああ",
+    "今日の試合やばい <br> 延長あるか？",
+    "&gt;&gt;12 それな",
+    "草",
+    "ほんこれ",
+    "画像 https://i.imgur.com/abcdEFG.jpg",
+]
+
+
+def format_dat_line(number, posted_at, title="", body=None):
+    """dat 形式の1行（改行なし）を作る"""
+    stamp = datetime.fromtimestamp(posted_at)
+    date = (f"{stamp:%Y/%m/%d}({WEEKDAYS[stamp.weekday()]}) {stamp:%H:%M:%S}."
+            f"{stamp.microsecond // 10000:02d}")
+    body = SAMPLE_BODIES[number % len(SAMPLE_BODIES)] if body is None else body
+    return f"エッヂの名無し<><>{date} ID:Mock{number:04d}<> {body} <>{title if number == 1 else ''}"
+
+
+class MockThread:
+    """1スレッド分の dat。filler（一覧を埋めるだけのスレッド）の本文は初めて要求されたときに作る"""
+
+    def __init__(self, thread_id, title, created_at, pending_posts=0):
+        self.thread_id = thread_id
+        self.title = title
+        self.created_at = created_at
+        self.lines = []
+        self.pending_posts = pending_posts
+        self.res_count = pending_posts
+        self.updated_at = created_at
+        self.generation = 0
+
+    def append(self, line, posted_at):
+        self.materialize()
+        self.lines.append(line.encode("utf-8") + b"\n")
+        self.res_count = len(self.lines)
+        self.updated_at = posted_at
+        self.generation += 1
+
+    def materialize(self):
+        if self.pending_posts:
+            for number in range(1, self.pending_posts + 1):
+                line = format_dat_line(number, self.created_at + number, self.title)
+                self.lines.append(line.encode("utf-8") + b"\n")
+            self.pending_posts = 0
+
+    def body(self):
+        self.materialize()
+        return b"".join(self.lines)
+
+
+class MockBoard:
+    """スレッドの集合と、board_relay.RelayHandler が使う get(path) を提供する"""
+
+    def __init__(self, feed=None, clock=time.time):
+        self.threads = {}
+        self.feed = feed
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def add_thread(self, thread_id, title, created_at=None, pending_posts=0):
+        thread = MockThread(str(thread_id), title, self.clock() if created_at is None else created_at, pending_posts)
+        self.threads[thread.thread_id] = thread
+        return thread
+
+    def post(self, thread_id, posted_at=None, body=None, line=None):
+        thread = self.threads[str(thread_id)]
+        posted_at = self.clock() if posted_at is None else posted_at
+        if line is None:
+            line = format_dat_line(thread.res_count + 1, posted_at, thread.title, body)
+        thread.append(line, posted_at)
+        return thread
+
+    def subject_text(self):
+        """最後の書き込みが新しい順の subject.txt"""
+        threads = sorted(self.threads.values(), key=lambda t: t.updated_at, reverse=True)
+        return "".join(f"{t.thread_id}.dat<>{t.title} ({t.res_count})\n" for t in threads)
+
+    def get(self, path):
+        """(status, body, content_type, etag, last_modified) を返す"""
+        with self.lock:
+            self.requests += 1
+            if self.feed is not None:
+                self.feed.advance(self, self.clock())
+            if path == "/subject.txt":
+                body = self.subject_text().encode("utf-8")
+                generation = sum(t.generation for t in self.threads.values())
+                updated_at = max((t.updated_at for t in self.threads.values()), default=0)
+            else:
+                thread = self.threads.get(path[len("/dat/"):-len(".dat")])
+                if thread is None:
+                    return 404, b"", "text/plain", "", None
+                body = thread.body()
+                generation = thread.generation
+                updated_at = thread.updated_at
+        etag = f'"{ETAG_PREFIX}-{generation:x}-{len(body):x}"'
+        return 200, body, "text/plain; charset=utf-8", etag, formatdate(updated_at, usegmt=True)
+
+
+class SyntheticFeed:
+    """実況スレッドに一定の速さで書き込み、1000レスで次スレに移る"""
+
+    def __init__(self, title="【実況】モック実況スレ", posts_per_second=5.0, splits=0, filler_threads=0, seed=1):
+        self.title = title
+        self.posts_per_second = posts_per_second
+        self.splits = splits
+        self.filler_threads = filler_threads
+        self.rng = random.Random(seed)
+        self.part = 1
+        self.live = []          # (thread_id, 1秒あたりの書き込み数)
+        self.last_time = None
+        self.carry = {}         # thread_id -> 端数の書き込み数
+
+    def start(self, board, now):
+        for i in range(self.filler_threads):
+            board.add_thread(str(int(now) - 3600 - i * 61), f"雑談スレ その{i + 1}",
+                             created_at=now - 3600 - i * 61, pending_posts=self.rng.randint(1, 999))
+        self.open_part(board, now)
+        self.last_time = now
+
+    def open_part(self, board, now):
+        """次スレと（splits 件の）重複スレッドを立てる"""
+        base_id = max([int(t) for t in board.threads] + [int(now)]) + 1
+        self.live = [(str(base_id), self.posts_per_second)]
+        for i in range(self.splits):
+            self.live.append((str(base_id + 1 + i), self.posts_per_second / (4 * (i + 1))))
+        for thread_id, _ in self.live:
+            # スレ立てと同時に >>1 が付く
+            board.add_thread(thread_id, f"{self.title}★{self.part}", created_at=now)
+            board.post(thread_id, posted_at=now)
+        self.part += 1
+
+    def advance(self, board, now):
+        if self.last_time is None:
+            self.start(board, now)
+            return
+        elapsed = now - self.last_time
+        if elapsed <= 0:
+            return
+        start_time = self.last_time
+        self.last_time = now
+        rollover = False
+        for thread_id, rate in self.live:
+            due = self.carry.get(thread_id, 0.0) + rate * elapsed
+            count = int(due)
+            self.carry[thread_id] = due - count
+            thread = board.threads[thread_id]
+            for i in range(count):
+                if thread.res_count >= 1000:
+                    break
+                board.post(thread_id, posted_at=start_time + elapsed * (i + 1) / count)
+            if thread_id == self.live[0][0] and thread.res_count >= 1000:
+                rollover = True
+        if rollover:
+            self.open_part(board, now)
+
+
+class ReplayFeed:
+    """record で記録したセッションを再生する
+
+    記録は1行1イベントの JSONL: {"t": 開始からの秒, "thread_id": ..., "title": ..., "line": dat の1行}
+    """
+
+    def __init__(self, events, speed=1.0):
+        self.events = sorted(events, key=lambda e: e["t"])
+        self.speed = speed
+        self.position = 0
+        self.started_at = None
+
+    @classmethod
+    def load(cls, path, speed=1.0):
+        with open(path, encoding="utf-8") as f:
+            return cls([json.loads(line) for line in f if line.strip()], speed)
+
+    def advance(self, board, now):
+        if self.started_at is None:
+            self.started_at = now
+        elapsed = (now - self.started_at) * self.speed
+        while self.position < len(self.events) and self.events[self.position]["t"] <= elapsed:
+            event = self.events[self.position]
+            self.position += 1
+            if event["thread_id"] not in board.threads:
+                board.add_thread(event["thread_id"], event["title"], created_at=now)
+            board.post(event["thread_id"], posted_at=now, line=event["line"])
+
+    def finished(self):
+        return self.position >= len(self.events)
+
+
+def record_session(thread_id, duration, out_path, upstream=UPSTREAM, interval=2.0):
+    """実際のスレッドの dat を duration 秒間取得し、追記された行を ReplayFeed の形式で保存する"""
+    import requests
+
+    url = f"{upstream}/dat/{thread_id}.dat"
+    data = b""
+    title = ""
+    started_at = time.monotonic()
+    with requests.Session() as session, open(out_path, "w", encoding="utf-8") as out:
+        while time.monotonic() - started_at < duration:
+            headers = {"Range": f"bytes={len(data)}-"} if data else {}
+            response = session.get(url, headers=headers, timeout=5)
+            if response.status_code in (200, 206):
+                chunk = response.content if response.status_code == 206 else response.content[len(data):]
+                complete = chunk[:chunk.rfind(b"\n") + 1]
+                data += complete
+                elapsed = time.monotonic() - started_at
+                for raw in complete.decode("utf-8", errors="replace").split("\n")[:-1]:
+                    if not title:
+                        title = raw.split("<>")[-1] or f"スレッド {thread_id}"
+                    out.write(json.dumps({"t": round(elapsed, 3), "thread_id": str(thread_id),
+                                          "title": title, "line": raw}, ensure_ascii=False) + "\n")
+            elif response.status_code != 416:
+                response.raise_for_status()
+            time.sleep(interval)
+    logger.info(f"{len(data)}バイトを記録しました: {out_path}")
+
+
+def start_mock_board(board, host="127.0.0.1", port=0):
+    """モック板をバックグラウンドで起動し、(server, base_url) を返す。port=0 なら空いているポートを使う"""
+    server = create_server(host, port, board)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="subject.txt と伸びていく dat を返すモック板")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--posts-per-second", type=float, default=5.0)
+    parser.add_argument("--threads", type=int, default=500, help="subject.txt を埋めるスレッド数")
+    parser.add_argument("--splits", type=int, default=0, help="次スレと同時に立つ重複スレッドの数")
+    parser.add_argument("--replay", help="record で保存したセッションを再生する")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--record", metavar="THREAD_ID", help="実際のスレッドを記録する")
+    parser.add_argument("--duration", type=float, default=600)
+    parser.add_argument("--out", default="session.jsonl")
+    args = parser.parse_args()
+
+    if args.record:
+        record_session(args.record, args.duration, args.out)
+        return 0
+
+    if args.replay:
+        feed = ReplayFeed.load(args.replay, args.speed)
+    else:
+        feed = SyntheticFeed(posts_per_second=args.posts_per_second, splits=args.splits,
+                             filler_threads=args.threads)
+    server = create_server(args.host, args.port, MockBoard(feed))
+    logger.info(f"モック板を開始しました: http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,795 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PyQt5 に依存しない板アクセスの中核（subject.txt・dat の取得と解析、次スレ・本流の判定、勢い）
+
+thread_fetcher_improved の QThread 版、board_engine の非同期版、SubjectIndex、headless、
+ベンチマークやワーカープロセスから共通に使う。通信は HttpClient（requests は最初の取得時に読み込む）か、
+呼び出し側が渡す http_get(url, headers) で行い、結果は戻り値・イテレーター・コールバックで返す。
+Qt のシグナルへの変換は thread_fetcher_improved と board_engine の各クラスが行う。
+"""
+
+import re
+import time
+import html
+import bisect
+import codecs
+import logging
+from collections import deque
+from datetime import datetime
+
+from dat_parser import parse_dat_line
+from title_similarity import similar_titles
+from momentum_series import recent_momentum
+
+logger = logging.getLogger('BoardCore')
+
+# 板のURL。board_relay.py を経由する場合はリレーのURLを各クラスの base_url に渡す
+BASE_URL = "https://bbs.eddibb.cc/liveedge"
+MIN_PLAYBACK_SPEED = 0.25
+MAX_PLAYBACK_SPEED = 16.0
+
+# エンドポイントごとの文字コード。応答に charset がなければこれで復号し、requests の response.text のように
+# 本文全体から文字コードを推測（apparent_encoding）することはしない。書き込み（bbs.cgi）は main.py が Shift_JIS で送受信する
+SUBJECT_ENCODING = "utf-8"
+DAT_ENCODING = "utf-8"
+CHARSET_PATTERN = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+
+def response_encoding(response, default):
+    """Content-Type の charset があればそれを、なければ default を返す（推測はしない）"""
+    match = CHARSET_PATTERN.search(response.headers.get("Content-Type", ""))
+    if match:
+        try:
+            return codecs.lookup(match.group(1)).name
+        except LookupError:
+            logger.warning(f"不明な charset を無視します: {match.group(1)}")
+    return default
+
+def decode_response(response, default):
+    """本文のバイト列を response_encoding の文字コードで復号する（response.text の代わり）"""
+    return response.content.decode(response_encoding(response, default), errors="replace")
+
+def http_get(url, headers=None, timeout=5):
+    """requests による同期 GET。DatPoller.poll などに http_get(url, headers) として渡せる
+
+    requests の読み込みには時間がかかるため、解析や判定だけを使う場合に読み込まずに済むよう最初の呼び出しで読み込む。
+    requests の通信エラー（RequestException）は OSError の派生なので、このモジュールでは OSError として扱う。
+    """
+    import requests
+    return requests.get(url, headers=headers, timeout=timeout)
+
+class HttpClient:
+    """接続を使い回す同期 GET。インスタンスを http_get(url, headers) として渡せる（1スレッドから使う）"""
+
+    def __init__(self, timeout=5):
+        self.timeout = timeout
+        self.session = None
+
+    def get(self, url, headers=None, timeout=None):
+        if self.session is None:
+            import requests
+            self.session = requests.Session()
+        return self.session.get(url, headers=headers, timeout=self.timeout if timeout is None else timeout)
+
+    def __call__(self, url, headers=None):
+        return self.get(url, headers)
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+class ValidatorCache:
+    """URLごとに ETag / Last-Modified を保持し、条件付きGETを行うキャッシュ"""
+
+    def __init__(self):
+        self.validators = {}  # url -> (etag, last_modified)
+        self.not_modified_count = 0  # 304 で本文の取得・解析を省略できた回数
+
+    def request_headers(self, url):
+        """保持している検証子から If-None-Match / If-Modified-Since を組み立てる"""
+        etag, last_modified = self.validators.get(url, (None, None))
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def update(self, url, response):
+        """レスポンスの検証子を記録する。304 (変更なし) の場合は True を返す"""
+        if response.status_code == 304:
+            self.not_modified_count += 1
+            return True
+        if response.status_code in (200, 206):
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            if etag or last_modified:
+                self.validators[url] = (etag, last_modified)
+        return False
+
+    def forget(self, url):
+        self.validators.pop(url, None)
+
+    def get(self, url, headers=None, timeout=5, client=None):
+        """条件付きGETを送る。戻り値は (response, 変更なしか)。client（HttpClient）を渡すとその接続で送る"""
+        request_headers = dict(headers or {})
+        request_headers.update(self.request_headers(url))
+        if client is not None:
+            response = client.get(url, headers=request_headers, timeout=timeout)
+        else:
+            response = http_get(url, headers=request_headers, timeout=timeout)
+        return response, self.update(url, response)
+
+
+# 以下の関数は通信を行わない。QThread 版と board_engine の非同期版の両方から使う
+
+SUBJECT_LINE_PATTERN = re.compile(r'(.*)\s*\((\d+)\)$')
+STAR_NUMBER_PATTERN = re.compile(r'★(\d+)$')
+
+def parse_subject_line(line):
+    """subject.txt の1行を (スレッドID, タイトル, レス数の文字列) に分解する。形式が不正なら None"""
+    if not line or "<>" not in line:
+        return None
+    thread_id_dat, title_res = line.split("<>", 1)
+    title_res_match = SUBJECT_LINE_PATTERN.search(title_res)
+    if not title_res_match:
+        return None
+    return (thread_id_dat.replace(".dat", ""),
+            html.unescape(title_res_match.group(1).strip()),
+            title_res_match.group(2))
+
+def parse_subject_threads(text, current_timestamp=None):
+    """subject.txt 全体をスレッド一覧用の辞書のリストに変換する（勢いはスレッドIDの時刻から計算）"""
+    if current_timestamp is None:
+        current_timestamp = time.time()
+    threads = []
+    for line in text.splitlines():
+        if not line:
+            continue
+        try:
+            parsed = parse_subject_line(line)
+            if not parsed:
+                continue
+            thread_id, title, res_count_str = parsed
+            res_count = int(res_count_str)
+
+            # スレッドIDをUNIXタイムスタンプとして直接利用
+            timestamp = int(thread_id)
+            date_str = datetime.fromtimestamp(timestamp).strftime('%Y/%m/%d %H:%M:%S')
+
+            time_diff = current_timestamp - timestamp
+            momentum = 0
+            if time_diff > 0:
+                momentum = int(res_count / time_diff * 86400)
+
+            threads.append({
+                'id': thread_id,
+                'title': title,
+                'res_count': res_count_str,
+                'timestamp': timestamp,
+                'date': date_str,
+                # 勢いは数値で保持し、表示時にカンマ区切りにする
+                'momentum': momentum
+            })
+        except Exception as e:
+            logger.warning(f"subject.txt の解析に失敗しました: {str(e)} - Line: {line}")
+    return threads
+
+def extract_last_number(title):
+    """タイトルから末尾に最も近いスレッド進行に関連する数字を抽出"""
+    # 「★数字」「Part.数字」「Part数字」を優先的に検索
+    star_match = STAR_NUMBER_PATTERN.search(title)
+    part_dot_match = re.search(r'Part\.(\d+)$', title)
+    part_match = re.search(r'Part(\d+)$', title)
+
+    if star_match:
+        return float(star_match.group(1)), True
+    elif part_dot_match:
+        return float(part_dot_match.group(1)), True
+    elif part_match:
+        return float(part_match.group(1)), True
+
+    # 上記がない場合、最後の数字を返す
+    number_match = re.findall(r'(\d*\.\d+|\d+)', title)
+    if number_match:
+        return float(number_match[-1]), True
+    return 0, False  # 数字がない場合は0とFalseを返す
+
+def select_next_thread(thread_id, thread_title, subject_text):
+    """subject.txt の内容から次スレを選ぶ（●→通常ルール→反省会ルールの順）。見つからなければ None"""
+    return select_next_thread_in(thread_id, thread_title, parse_subject_basic_info(subject_text))
+
+def select_next_thread_in(thread_id, thread_title, threads):
+    """解析済みのスレッド一覧（'id', 'title', 'res_count' を持つ辞書）から次スレを選ぶ"""
+    starts_with_mark = thread_title.startswith('●')
+    logger.info(f"現在のスレッド: {thread_title}, 前スレが「●」で始まるか: {starts_with_mark}")
+
+    # 最初にすべての候補をレス数付きでリストアップする
+    all_candidates = []
+    for thread in threads:
+        try:
+            if thread['id'] == thread_id: continue
+
+            # 1000レス未満の候補のみをリストに追加する
+            if int(thread['res_count']) < 1000:
+                all_candidates.append({
+                    "id": thread['id'],
+                    "title": thread['title'],
+                    "res_count": int(thread['res_count'])
+                })
+        except Exception as e:
+            logger.warning(f"次スレ候補の解析エラー: {thread}, {e}")
+
+    if not all_candidates:
+        logger.info("1000レス未満の次スレ候補が見つかりませんでした")
+        return None
+    logger.info(f"次スレ候補を{len(all_candidates)}件に絞り込みました（1000レス未満のスレッドのみ）")
+
+    # 反省会ルールは類似度情報が付与された候補から探す（●ルールでは付与しないため対象外）
+    candidates_with_info = []
+    if starts_with_mark:
+        # ●ルール: 絞り込まれた候補の中で、最もID(時刻)が新しいものを選択
+        mark_candidates = [c for c in all_candidates if c['title'].startswith('●')]
+        if mark_candidates:
+            best_candidate = max(mark_candidates, key=lambda c: int(c['id']))
+            logger.info(f"次スレを発見しました（●ルール）: {best_candidate['title']} (ID: {best_candidate['id']})")
+            return best_candidate
+
+    # 通常ルール
+    else:
+        # 候補リストに類似度や番号情報を追加していく
+        similarities = similar_titles(thread_title, [c['title'] for c in all_candidates], 0.3)
+        for candidate in all_candidates:
+            similarity = similarities.get(candidate['title'])
+            if similarity is not None:
+                next_number, _ = extract_last_number(candidate['title'])
+                candidate['similarity'] = similarity
+                candidate['number'] = next_number
+                candidate['is_star'] = bool(STAR_NUMBER_PATTERN.search(candidate['title']))
+                candidates_with_info.append(candidate)
+
+        current_number, has_number = extract_last_number(thread_title)
+
+        if has_number:
+            LOWER_BOUND_OFFSET = 2
+            UPPER_BOUND_OFFSET = 3
+            start_num = max(1, int(current_number) - LOWER_BOUND_OFFSET)
+            end_num = int(current_number) + UPPER_BOUND_OFFSET
+            expected_numbers = list(range(start_num, end_num + 1))
+        else:
+            expected_numbers = [1, 2]
+
+        valid_candidates = []
+        for candidate in candidates_with_info:
+            next_num = candidate["number"]
+            if next_num in expected_numbers or \
+               (candidate["is_star"] and next_num in [1, 2]) or \
+               (not has_number and next_num == 2 and re.search(r'(★2|Part\.2|Part2)', candidate["title"])):
+                valid_candidates.append(candidate)
+
+        if valid_candidates:
+            best_candidate = max(valid_candidates, key=lambda c: c["similarity"])
+            logger.info(f"次スレを発見しました（通常ルール）: {best_candidate['title']} (ID: {best_candidate['id']}, 類似度: {best_candidate['similarity']:.2f})")
+            return {"id": best_candidate["id"], "title": best_candidate["title"]}
+
+    # 反省会ルール (フォールバック)
+    logger.info("通常の次スレが見つからなかったため、『反省会』スレッドのフォールバック検索を実行します。")
+
+    reflection_candidates = []
+    for candidate in candidates_with_info:
+        if "反省会" in candidate["title"]:
+            if candidate.get("similarity", 0) >= 0.6: # 類似度情報がなければ0として扱う
+                reflection_candidates.append(candidate)
+                logger.debug(f"反省会候補: {candidate['title']} (類似度: {candidate.get('similarity', 0):.2f})")
+
+    if reflection_candidates:
+        best_reflection_candidate = max(reflection_candidates, key=lambda c: c.get('similarity', 0))
+        logger.info(f"次スレを発見しました（反省会ルール）: {best_reflection_candidate['title']}")
+        return {
+            "id": best_reflection_candidate["id"],
+            "title": best_reflection_candidate["title"]
+        }
+
+    logger.info("すべての検索ルールで次スレを見つけることができませんでした。")
+    return None
+
+def parse_subject_basic_info(text):
+    """subject.txt から本流監視用の最小限の情報 (id, title, res_count) を取り出す"""
+    threads = []
+    for line in text.splitlines():
+        try:
+            parsed = parse_subject_line(line)
+        except Exception:
+            continue
+        if parsed:
+            threads.append({'id': parsed[0], 'title': parsed[1], 'res_count': parsed[2]})
+    return threads
+
+def filter_mainstream_candidates(all_threads, original_title, original_thread_id, current_thread_id, min_res=10):
+    """
+    NextThreadFinderの判定ロジックを模倣し、本流の可能性がある候補を絞り込む
+    """
+    # 1. ●ルールのチェック
+    if original_title.startswith('●'):
+        logger.debug("本流監視: ●ルールを適用します")
+        return [thread for thread in all_threads
+                if thread['id'] not in (current_thread_id, original_thread_id) and thread['title'].startswith('●')]
+
+    # 2. 通常ルールの適用
+    # a. 期待される次スレの番号を計算
+    current_number, has_number = extract_last_number(original_title)
+    if not has_number:
+        expected_numbers = [2]
+    else:
+        expected_numbers = [current_number + 1, current_number]
+
+    logger.debug(f"本流監視: 元スレ='{original_title}', 期待される番号={expected_numbers}")
+
+    # b. 候補の選別
+    similarities = similar_titles(original_title, [thread['title'] for thread in all_threads], 0.3)
+    valid_candidates = []
+    for thread in all_threads:
+        # 基本的な除外条件
+        if thread['id'] == current_thread_id: continue
+        if thread['id'] == original_thread_id: continue
+        if int(thread['res_count']) >= 1000: continue
+        if int(thread['res_count']) < min_res: continue
+
+        # タイトル類似度が低すぎるものは、番号チェックの前に除外
+        if thread['title'] not in similarities:
+            continue
+
+        # 候補スレの番号が期待値と一致するかチェック
+        next_num, _ = extract_last_number(thread['title'])
+        is_star = bool(STAR_NUMBER_PATTERN.search(thread['title']))
+
+        if next_num in expected_numbers:
+            valid_candidates.append(thread)
+        elif is_star and next_num in [1, 2]:
+            valid_candidates.append(thread)
+        elif not has_number and next_num == 2:
+            if re.search(r'(★2|Part\.2|Part2)(?:\s+.*)?$', thread['title']):
+                valid_candidates.append(thread)
+
+    if valid_candidates:
+        logger.debug(f"本流監視: {len(valid_candidates)}件の候補を発見しました")
+
+    return valid_candidates
+
+def first_post_timestamp(dat_text):
+    """dat 本文の1行目（>>1）の投稿時刻をエポック秒で返す。取り出せなければ 0"""
+    date_match = re.search(r'(\d{4}/\d{2}/\d{2}).*?(\d{2}:\d{2}:\d{2})', dat_text.split('\n', 1)[0])
+    if date_match:
+        return datetime.strptime(f"{date_match.group(1)} {date_match.group(2)}", '%Y/%m/%d %H:%M:%S').timestamp()
+    return 0
+
+# 勢いの計算で dat の1行目だけを読むときに取得する先頭のバイト数
+FIRST_POST_RANGE_BYTES = 1024
+
+def thread_created_at(thread_id, now=None):
+    """スレッドIDをスレ立て時刻（エポック秒）として返す。時刻として使えないIDなら None"""
+    try:
+        created_at = int(thread_id)
+    except (TypeError, ValueError):
+        return None
+    # 10桁の過去の時刻でなければ、IDの付け方が違うとみなして dat の1行目に頼る
+    if len(str(thread_id)) != 10 or created_at > (time.time() if now is None else now) + 60:
+        return None
+    return created_at
+
+def first_post_request_headers():
+    """dat の1行目（>>1 の投稿時刻）を読むのに足りる先頭だけを要求するヘッダー"""
+    return {"Range": f"bytes=0-{FIRST_POST_RANGE_BYTES - 1}"}
+
+def format_momentum(res_count, created_at, now=None):
+    """レス数と作成時刻から1日あたりの勢いをカンマ区切りの文字列で返す"""
+    if created_at <= 0:
+        return "0"
+    time_diff = (time.time() if now is None else now) - created_at
+    if time_diff <= 0:
+        return "0"
+    return f"{int(float(res_count) / time_diff * 86400):,}"
+
+def momentum_value(thread):
+    return int(thread.get('momentum', '0').replace(',', ''))
+
+def sort_threads(threads, sort_by):
+    """スレッド一覧を勢い順（momentum）・直近の勢い順（recent）・新着順（date）に並べ替える"""
+    if sort_by == "momentum":
+        threads.sort(key=lambda x: x.get('momentum', 0), reverse=True)
+    elif sort_by == "recent":
+        # 直近の勢いの記録がないスレッドは平均の勢いで並べる
+        threads.sort(key=lambda x: x.get('momentum', 0) if recent_momentum(x) is None else recent_momentum(x),
+                     reverse=True)
+    elif sort_by == "date":
+        threads.sort(key=lambda x: x.get('timestamp', 0), reverse=True)
+    return threads
+
+def find_mainstream_thread(current_thread, candidates, momentum_ratio):
+    """current_thread より momentum_ratio 倍を超えて勢いのある候補を返す。なければ None
+
+    全スレッドに直近の勢い（SubjectIndex が付ける）があればそれで比べ、なければ平均の勢いで比べる。
+    """
+    threads = [current_thread] + candidates
+    use_recent = all(recent_momentum(thread) is not None for thread in threads)
+    momentum_of = recent_momentum if use_recent else momentum_value
+    current_momentum = momentum_of(current_thread)
+    if current_momentum == 0:
+        if not use_recent:
+            return None  # 平均の勢いが 0 なのは作成時刻が分からなかったとき
+        # 直近の書き込みが止まっているなら、伸びている候補があればそちらが本流
+        return next((thread for thread in candidates if momentum_of(thread) > 0), None)
+    return next((thread for thread in candidates if momentum_of(thread) > current_momentum * momentum_ratio), None)
+
+def apply_momentum(threads, created_at_of=None, now=None):
+    """各スレッドに1日あたりの勢い 'momentum'（カンマ区切りの文字列）を付ける
+
+    作成時刻はスレッドIDから求め、時刻でないIDだけ created_at_of(thread_id) に問い合わせる（省略時は 0）。
+    """
+    now = time.time() if now is None else now
+    for thread in threads:
+        created_at = thread_created_at(thread['id'], now)
+        if created_at is None:
+            created_at = created_at_of(thread['id']) if created_at_of is not None else 0
+        thread['momentum'] = format_momentum(thread['res_count'], created_at, now)
+    return threads
+
+def check_mainstream(all_threads, original_title, original_thread_id, current_thread_id,
+                     momentum_ratio=1.5, min_res=10, created_at_of=None, now=None):
+    """subject.txt の一覧から本流スレッドを探す
+
+    本流があればその辞書、なければ None、接続中のスレッドが一覧から落ちて監視を続けられなければ False を返す。
+    """
+    current_thread = next((t for t in all_threads if t['id'] == current_thread_id), None)
+    if not current_thread:
+        logger.warning(f"現在接続中のスレッド {current_thread_id} が一覧に見つかりません。監視を中止します。")
+        return False
+    candidates = filter_mainstream_candidates(all_threads, original_title, original_thread_id,
+                                              current_thread_id, min_res)
+    apply_momentum([current_thread] + candidates, created_at_of, now)
+    return find_mainstream_thread(current_thread, candidates, momentum_ratio)
+
+def fetch_subject_basic_info(validators, base_url=BASE_URL, timeout=5, client=None):
+    """subject.txt を条件付きGETで取得し、parse_subject_basic_info の一覧を返す。変更がなければ None"""
+    response, not_modified = validators.get(f"{base_url}/subject.txt", timeout=timeout, client=client)
+    if not_modified:
+        return None
+    response.raise_for_status()
+    return parse_subject_basic_info(decode_response(response, SUBJECT_ENCODING))
+
+class IncrementalDatParser:
+    """解析済みの部分を保持し、追記された行だけを解析する dat パーサー
+
+    data には解析済みの「改行で終わる完結した行」のバイト列を保持する。
+    Range 取得した差分は feed_tail、dat 全体は feed_full に渡す。feed_full は
+    解析済み部分と前方一致するかを調べ、一致すれば追記分だけを解析し、
+    一致しなければ（削除・あぼーん等による書き換え）全体を解析し直す。
+    各行の解析は dat_parser.parse_dat_line に任せる。
+
+    復号は encoding のインクリメンタルデコーダーで行う。Range で取得した差分の末尾にある書きかけの行は
+    改行までで切って次回に回すため、途中で切れた多バイト文字を復号することはない
+    （UTF-8 でも Shift_JIS でも改行のバイトは多バイト文字の一部にならない）。
+    """
+
+    def __init__(self, encoding=None):
+        self.encoding = encoding
+        self.data = bytearray()
+        self.line_count = 0
+        self.comments = []
+
+    @property
+    def encoding(self):
+        return self._encoding
+
+    @encoding.setter
+    def encoding(self, encoding):
+        self._encoding = encoding
+        self.decoder = codecs.getincrementaldecoder(encoding or DAT_ENCODING)(errors="replace")
+
+    def reset(self):
+        """解析済みの状態を破棄する（文字コードは保持）"""
+        self.data = bytearray()
+        self.line_count = 0
+        self.comments = []
+        self.decoder.reset()
+
+    def feed_tail(self, chunk):
+        """解析済み部分の直後に続くバイト列を解析し、新しいコメントのリストを返す
+
+        改行で終わっていない書きかけの行は解析せず、次回の取得に回す。
+        """
+        chunk = chunk[:chunk.rfind(b"\n") + 1]
+        if not chunk:
+            return []
+        lines = self.decoder.decode(chunk).split('\n')[:-1]
+        new_comments = []
+        for i, line in enumerate(lines):
+            if not line.strip():
+                continue
+            comment = parse_dat_line(line, self.line_count + i + 1)
+            if comment:
+                new_comments.append(comment)
+        self.data += chunk
+        self.line_count += len(lines)
+        self.comments.extend(new_comments)
+        return new_comments
+
+    def feed_full(self, content):
+        """dat 全体を受け取り、(新しいコメントのリスト, 解析済み部分が書き換えられていたか) を返す"""
+        if self.data and content.startswith(self.data):
+            return self.feed_tail(content[len(self.data):]), False
+        prefix_changed = bool(self.data)
+        self.reset()
+        return self.feed_tail(content), prefix_changed
+
+class AdaptivePollInterval:
+    """スレッドの流速から次のポーリング間隔を決める
+
+    直近の投稿タイムスタンプから投稿レート（件/秒）を推定し、1回の取得で
+    おおよそ target_batch 件が届く間隔を min_interval〜max_interval の範囲で選ぶ。
+    投稿が増えたときは即座に間隔を詰め、減ったときは半分ずつ緩める。
+    304や新着なしの応答が続く間は backoff 倍ずつ間隔を広げる。
+    """
+
+    def __init__(self, min_interval=0.5, max_interval=10.0, initial_interval=None,
+                 target_batch=3, window=60, backoff=1.5):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.target_batch = target_batch
+        self.window = window  # レート推定に使う直近の秒数（投稿時刻基準）
+        self.backoff = backoff
+        self.post_times = deque(maxlen=200)
+        self.idle_polls = 0
+        self.interval = self.clamp(initial_interval if initial_interval is not None else min_interval)
+
+    def clamp(self, interval):
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def rate(self):
+        """直近 window 秒の投稿レート（件/秒）。サーバーとの時計のずれを避けるため最新投稿の時刻を基準にする"""
+        if not self.post_times:
+            return 0.0
+        latest = self.post_times[-1]
+        recent = [t for t in self.post_times if t >= latest - self.window]
+        span = max(latest - recent[0], 1.0)
+        return len(recent) / span
+
+    def observe(self, comments):
+        """今回の取得結果を反映し、次の間隔（秒）を返す。304や新着なしは空リストを渡す"""
+        if not comments:
+            self.idle_polls += 1
+            self.interval = self.clamp(self.interval * self.backoff)
+            return self.interval
+
+        self.idle_polls = 0
+        for comment in comments:
+            if comment.get('timestamp'):
+                self.post_times.append(comment['timestamp'])
+        rate = self.rate()
+        target = self.target_batch / rate if rate > 0 else self.max_interval
+        if target < self.interval:
+            self.interval = self.clamp(target)
+        else:
+            self.interval = self.clamp((self.interval + target) / 2)
+        return self.interval
+
+class PlaybackTimeline:
+    """過去ログ再生のタイムライン
+
+    各コメントの投稿時刻から、先頭のコメントを0秒とした再生位置（秒）を事前に計算しておき、
+    単調増加する時計で「現在の再生位置までに来たコメント」をまとめて取り出す。
+    待ち時間を積み重ねるのではなく絶対的な期限と比べるため、スリープの誤差が蓄積しない。
+    速度を変えても、その時点の再生位置を起点に計算し直すので位置はずれない。
+    タイムスタンプのないコメントは直前のコメントと同じ位置に置く。
+    レス番号と再生位置はどちらも昇順に並ぶので、シークは bisect で行う。
+    """
+
+    def __init__(self, comments, speed=1.0, clock=time.monotonic):
+        self.comments = list(comments)
+        self.numbers = [c['number'] for c in self.comments]
+        self.offsets = []
+        base = next((c['timestamp'] for c in self.comments if c.get('timestamp')), None)
+        self.base_timestamp = base
+        offset = 0.0
+        for comment in self.comments:
+            timestamp = comment.get('timestamp')
+            if timestamp and base is not None:
+                # dat の順序を保つため、時刻が前後していても位置は戻さない
+                offset = max(offset, timestamp - base)
+            self.offsets.append(offset)
+        self.index = 0
+        self.clock = clock
+        self.speed = speed
+        self.anchor_clock = None
+        self.anchor_position = 0.0
+
+    def start(self):
+        self.anchor_clock = self.clock()
+
+    def pause(self):
+        self.anchor_position = self.position()
+        self.anchor_clock = None
+
+    resume = start
+
+    def is_paused(self):
+        return self.anchor_clock is None
+
+    def position(self):
+        """現在の再生位置（秒）"""
+        if self.anchor_clock is None:
+            return self.anchor_position
+        return self.anchor_position + (self.clock() - self.anchor_clock) * self.speed
+
+    def set_speed(self, speed):
+        self.anchor_position = self.position()
+        if self.anchor_clock is not None:
+            self.anchor_clock = self.clock()
+        self.speed = speed
+
+    def finished(self):
+        return self.index >= len(self.comments)
+
+    def seek_index(self, index):
+        """index 番目のコメントの位置へ移動する（一時停止中なら停止したまま）"""
+        self.index = max(0, min(index, len(self.comments)))
+        self.anchor_position = self.offsets[self.index] if self.index < len(self.offsets) else \
+            (self.offsets[-1] if self.offsets else 0.0)
+        if self.anchor_clock is not None:
+            self.anchor_clock = self.clock()
+
+    def seek_number(self, number):
+        """レス番号 number（欠番ならその次）から再生する"""
+        self.seek_index(bisect.bisect_left(self.numbers, number))
+
+    def seek_timestamp(self, timestamp):
+        """投稿時刻 timestamp（エポック秒）以降の最初のコメントから再生する"""
+        if self.base_timestamp is None:
+            self.seek_index(0)
+            return
+        self.seek_index(bisect.bisect_left(self.offsets, timestamp - self.base_timestamp))
+
+    def pop_due(self):
+        """現在の再生位置までに来たコメントをまとめて返す"""
+        end = bisect.bisect_right(self.offsets, self.position(), self.index)
+        batch = self.comments[self.index:end]
+        self.index = end
+        return batch
+
+    def time_until_next(self):
+        """次のコメントまでの実時間（秒）。再生し終えていれば None"""
+        if self.finished():
+            return None
+        return max(0.0, (self.offsets[self.index] - self.position()) / self.speed)
+
+class DatPoller:
+    """1スレッド分の dat の差分取得を行う（通信そのものは呼び出し側に任せる）
+
+    next_request() が返す URL とヘッダーで GET し、レスポンスを handle_response() に渡す。
+    None が返ったら全体の取り直しが必要なので、next_request() からやり直す。
+    poll() は requests 風の同期 GET 関数でこの手順をまとめて行う。非同期版は board_engine を参照。
+
+    304: 前回から変化なし
+    206: 先頭1バイトが改行なら差分として扱い、違えば書き換えとみなして全体を取り直す
+    200: サーバーがRangeを無視した場合など。パーサーが前方一致を調べて差分のみ解析する
+    416: datが解析位置より短くなった（削除・あぼーん等）ため全体を取り直す
+    """
+
+    def __init__(self, thread_id, use_range=True, base_url=BASE_URL):
+        self.thread_id = thread_id
+        self.url = f"{base_url}/dat/{thread_id}.dat"
+        self.use_range = use_range
+        self.parser = IncrementalDatParser()
+        self.validators = ValidatorCache()
+        self.resync_pending = False
+
+    def next_request(self):
+        """次に送るリクエストの (url, headers)
+
+        解析済みデータがある間は条件付きGETとし、再同期のための全体取得では検証子を送らない。
+        """
+        headers = {}
+        if not self.parser.data:
+            self.validators.forget(self.url)
+        elif self.use_range:
+            # 解析済み末尾の改行1バイトから要求し、datが書き換えられていないか確認する
+            headers["Range"] = f"bytes={len(self.parser.data) - 1}-"
+        headers.update(self.validators.request_headers(self.url))
+        return self.url, headers
+
+    def handle_response(self, response):
+        """レスポンスを解析し (新しいコメントのリスト, 再同期したか) を返す。全体の取り直しが必要なら None"""
+        if self.validators.update(self.url, response):
+            return [], False
+        ranged = bool(self.parser.data) and self.use_range
+        if response.status_code == 416 and ranged:
+            logger.info(f"datが短くなりました（416）。全体を再取得します: {self.thread_id}")
+            return self.request_resync()
+        response.raise_for_status()
+
+        if self.parser.encoding is None:
+            # 文字コードは初回レスポンスで一度だけ決定する（charset がなければ dat の既定の文字コード）
+            self.parser.encoding = response_encoding(response, DAT_ENCODING)
+
+        content = response.content
+        if response.status_code == 206 and ranged:
+            if content[:1] == b"\n":
+                return self.parser.feed_tail(content[1:]), False
+            logger.info(f"datの書き換えを検出しました。全体を再取得します: {self.thread_id}")
+            return self.request_resync()
+
+        new_comments, prefix_changed = self.parser.feed_full(content)
+        if prefix_changed:
+            logger.info(f"datの書き換えを検出しました。全体を再解析しました: {self.thread_id}")
+        resynced = self.resync_pending or prefix_changed
+        self.resync_pending = False
+        return new_comments, resynced
+
+    def request_resync(self):
+        self.parser.reset()
+        self.resync_pending = True
+        return None
+
+    def poll(self, http_get):
+        """http_get(url, headers) で dat を取得し、handle_response() の結果を返す"""
+        result = None
+        while result is None:
+            url, headers = self.next_request()
+            result = self.handle_response(http_get(url, headers))
+        return result
+
+# 以下は取得から判定までを1つのスレッドで行う同期版。QThread 版はシグナルへの通知を加えた薄い包みになっている
+
+def search_next_thread(thread_id, thread_title, fetch_threads, search_duration=180, retry_interval=3,
+                       should_stop=None, sleep=time.sleep):
+    """fetch_threads() が返す一覧から、search_duration 秒の間 retry_interval 秒ごとに次スレを探す
+
+    fetch_threads は一覧（'id', 'title', 'res_count' を持つ辞書のリスト）か、前回から変化がなければ None を返す。
+    見つかった次スレの辞書を返し、見つからないまま時間切れになるか should_stop() が真になれば None を返す。
+    """
+    deadline = time.time() + search_duration
+    while not (should_stop and should_stop()) and time.time() < deadline:
+        try:
+            threads = fetch_threads()
+            if threads is None:
+                # subject.txt が前回から変わっていなければ判定結果も変わらない
+                logger.info("subject.txt に変更はありません（304）")
+            else:
+                next_thread = select_next_thread_in(thread_id, thread_title, threads)
+                if next_thread:
+                    return next_thread
+                logger.info(f"次スレが見つからなかったため、{retry_interval}秒後に再試行します")
+        except Exception as e:
+            logger.error(f"次スレ検索中にエラーが発生しました: {str(e)}")
+        sleep(retry_interval)
+    return None
+
+def follow_thread(poller, http_get=http_get, interval=5.0, poll_interval=None, should_stop=None,
+                  sleep=time.sleep, max_retries=3, retry_delay=2):
+    """poller のスレッドを取得し続け、新しいコメントがあるたびにそのリストを返すイテレーター
+
+    最初の取得では既存のレスをすべて返す。1000レスに達するか should_stop() が真になると終わる。
+    poll_interval（AdaptivePollInterval）を渡すと取得間隔を流速に合わせ、なければ interval 秒ごとに取得する。
+    通信に max_retries 回続けて失敗すると最後の例外を送出する。
+    """
+    retries = 0
+    while not (should_stop and should_stop()):
+        try:
+            new_comments, resynced = poller.poll(http_get)
+        except OSError as e:
+            retries += 1
+            logger.warning(f"コメント取得失敗 ({retries}/{max_retries}): {str(e)}")
+            if retries >= max_retries:
+                raise
+            sleep(retry_delay)
+            continue
+        retries = 0
+        if resynced:
+            logger.info(f"再同期しました: {poller.thread_id}, 行数={poller.parser.line_count}")
+        if new_comments:
+            yield new_comments
+        if poller.parser.line_count >= 1000:
+            return
+        sleep(poll_interval.observe(new_comments) if poll_interval is not None else interval)
@@ -0,0 +1,682 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+asyncio のイベントループ1本で板のポーリングをまとめて行うエンジン
+
+BoardEngine はバックグラウンドスレッドでイベントループを動かし、dat・subject.txt の取得を
+コルーチンとして並行に実行する。監視するスレッドが増えても OS スレッドは1本のまま。
+
+Async* クラスは thread_fetcher_improved の QThread 版と同じシグナルと
+start() / stop() / isRunning() / wait() を持つ薄いブリッジで、MainWindow からは同じように扱える。
+dat の差分取得や次スレ判定などの処理は QThread 版と共通の board_core の関数・クラスを使う。
+"""
+
+import time
+import asyncio
+import logging
+import threading
+import concurrent.futures
+
+import aiohttp
+import requests
+from requests.structures import CaseInsensitiveDict
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from board_core import (
+    BASE_URL, ValidatorCache, DatPoller, AdaptivePollInterval,
+    select_next_thread_in, parse_subject_basic_info, filter_mainstream_candidates, first_post_timestamp,
+    thread_created_at, first_post_request_headers, check_mainstream,
+    SUBJECT_ENCODING, DAT_ENCODING, decode_response,
+)
+
+logger = logging.getLogger('BoardEngine')
+
+
+def build_response(url, status, reason, headers, body):
+    """aiohttp の応答を requests.Response に詰め替える
+
+    ValidatorCache や DatPoller は requests.Response を前提にしているため、
+    status_code / headers / content / encoding / raise_for_status をそのまま使えるようにする。
+    """
+    response = requests.models.Response()
+    response.url = url
+    response.status_code = status
+    response.reason = reason
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = body
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    return response
+
+
+class BoardEngine:
+    """イベントループを1本のバックグラウンドスレッドで動かし、HTTP セッションを共有する"""
+
+    def __init__(self, max_connections=10):
+        self.max_connections = max_connections
+        self.loop = None
+        self.thread = None
+        self.session = None
+        self._ready = threading.Event()
+
+    def start(self):
+        if self.is_running():
+            return
+        self.loop = asyncio.new_event_loop()
+        self._ready.clear()
+        self.thread = threading.Thread(target=self._run, name="BoardEngine", daemon=True)
+        self.thread.start()
+        self._ready.wait()
+        logger.info("BoardEngine を開始しました")
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_forever()
+        # stop() 後に残っているタスクを取り消し、セッションを閉じる
+        self.loop.run_until_complete(self._shutdown())
+        self.loop.close()
+
+    async def _shutdown(self):
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def stop(self, timeout=5):
+        if not self.is_running():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+        logger.info("BoardEngine を停止しました")
+
+    def submit(self, coro):
+        """コルーチンをイベントループに投入し、concurrent.futures.Future を返す（どのスレッドからでも可）"""
+        if not self.is_running():
+            self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def get(self, url, headers=None, timeout=5):
+        """GET して requests.Response を返す。通信エラーは requests の例外に変換する"""
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_connections)
+            self.session = aiohttp.ClientSession(connector=connector)
+        try:
+            async with self.session.get(url, headers=headers,
+                                        timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                body = await resp.read()
+                return build_response(url, resp.status, resp.reason, resp.headers, body)
+        except asyncio.TimeoutError as e:
+            raise requests.exceptions.Timeout(f"タイムアウトしました: {url}") from e
+        except aiohttp.ClientError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+
+    async def conditional_get(self, validators, url, headers=None, timeout=5):
+        """ValidatorCache.get の非同期版。戻り値は (response, 変更なしか)"""
+        request_headers = dict(headers or {})
+        request_headers.update(validators.request_headers(url))
+        response = await self.get(url, headers=request_headers, timeout=timeout)
+        return response, validators.update(url, response)
+
+    async def poll_dat(self, poller, timeout=5):
+        """DatPoller.poll の非同期版"""
+        result = None
+        while result is None:
+            url, headers = poller.next_request()
+            result = poller.handle_response(await self.get(url, headers=headers, timeout=timeout))
+        return result
+
+
+class EngineTask(QObject):
+    """BoardEngine 上のコルーチンを QThread と同じ start() / stop() / isRunning() / wait() で扱う"""
+
+    def __init__(self, engine, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.running = True
+        self.future = None
+        self.task = None  # イベントループ上で run() を実行している asyncio.Task
+
+    def start(self):
+        self.running = True
+        self.future = self.engine.submit(self._run_guarded())
+
+    async def _run_guarded(self):
+        self.task = asyncio.current_task()
+        try:
+            # 始まる前に stop() された場合は何もしない
+            if self.running:
+                await self.run()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"{type(self).__name__} で予期しないエラーが発生しました: {str(e)}")
+        finally:
+            self.task = None
+
+    async def run(self):
+        """イベントループ上で行う処理（QThread.run と同じく、サブクラスで上書きする）"""
+
+    def stop(self):
+        self.running = False
+        if self.future is not None and not self.future.done() and self.engine.is_running():
+            # asyncio.sleep や通信待ちの途中でもすぐに取り消される。future 自体を取り消すと
+            # コルーチンが終わる前に完了扱いになるため、イベントループ上でタスクを取り消す
+            self.engine.loop.call_soon_threadsafe(self._cancel)
+
+    def _cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+
+    def isRunning(self):
+        return self.future is not None and not self.future.done()
+
+    def isFinished(self):
+        return self.future is not None and self.future.done()
+
+    def wait(self, msecs=None):
+        """QThread.wait と同じく、コルーチンが終わる（取り消しなら後始末まで済む）のを待つ"""
+        if self.future is None:
+            return True
+        done, _ = concurrent.futures.wait([self.future], timeout=None if msecs is None else msecs / 1000)
+        return bool(done)
+
+
+class AsyncCommentFetcher(EngineTask):
+    """CommentFetcher のリアルタイム監視の非同期版
+
+    過去ログの再生は CommentFetcher（QThread）が担当するため、
+    all_comments_fetched / playback_finished は接続互換のためだけに持つ。
+    """
+    comments_fetched = pyqtSignal(list)
+    all_comments_fetched = pyqtSignal(list)
+    thread_filled = pyqtSignal(str, str)
+    error_occurred = pyqtSignal(str)
+    thread_over_1000 = pyqtSignal(str)
+    playback_finished = pyqtSignal()
+    interval_changed = pyqtSignal(float)
+
+    def __init__(self, engine, thread_id, thread_title="", update_interval=0.5, use_range=True, poller=None, archive=None, initial_result=None, base_url=BASE_URL, start_number=None, parent=None):
+        super().__init__(engine, parent)
+        self.thread_id = thread_id
+        self.thread_title = thread_title
+        self.update_interval = update_interval
+        self.is_past_thread = False
+        self.start_number = start_number  # 1回目の取得でこの番号以降の既存レスも通知する
+        self.archive = archive
+        self.last_res_index = -1
+        self.max_retries = 3
+        self.retry_delay = 2
+        self.is_first_fetch = True
+        self.poll_interval = None
+        self.poller = poller or DatPoller(thread_id, use_range=use_range, base_url=base_url)
+        self.parser = self.poller.parser
+        self.validators = self.poller.validators
+        self.initial_result = initial_result
+
+    @property
+    def not_modified_count(self):
+        return self.validators.not_modified_count
+
+    def set_adaptive_polling(self, enabled, min_interval=0.5, max_interval=10.0):
+        """CommentFetcher.set_adaptive_polling と同じ"""
+        if enabled:
+            self.poll_interval = AdaptivePollInterval(min_interval, max_interval, initial_interval=self.update_interval)
+        else:
+            self.poll_interval = None
+
+    def next_poll_interval(self, new_comments):
+        if self.poll_interval is None:
+            return self.update_interval
+        interval = self.poll_interval.observe(new_comments)
+        self.interval_changed.emit(interval)
+        return interval
+
+    async def run(self):
+        retry_count = 0
+        while self.running:
+            try:
+                if self.initial_result is not None:
+                    # ThreadConnector が接続時に取得した結果を1回目の取得として使う
+                    (new_comments, resynced), self.initial_result = self.initial_result, None
+                else:
+                    new_comments, resynced = await self.engine.poll_dat(self.poller)
+                if resynced:
+                    logger.info(f"再同期しました: {self.thread_id}, 行数={self.parser.line_count}")
+
+                if not self.is_first_fetch:
+                    start_index = self.last_res_index + 1
+                elif self.start_number:
+                    # 並行監視から引き継いだ DatPoller では、今回より前に解析済みのレスも含めて選ぶ
+                    start_index = self.start_number - 1
+                    new_comments = self.parser.comments
+                else:
+                    start_index = max(0, self.parser.line_count - 4)
+                batch_comments = [c for c in new_comments if c['number'] > start_index]
+                interval = self.next_poll_interval(batch_comments)
+                if batch_comments and self.running:
+                    self.comments_fetched.emit(batch_comments)
+                    self.last_res_index = batch_comments[-1]['number'] - 1
+                retry_count = 0
+                self.is_first_fetch = False
+
+                if self.parser.line_count >= 1000:
+                    if self.archive is not None:
+                        # 圧縮とファイル書き込みでイベントループを止めないよう別スレッドで行う
+                        await asyncio.get_running_loop().run_in_executor(
+                            None, self.archive.put, self.thread_id, bytes(self.parser.data),
+                            self.parser.encoding, self.thread_title)
+                    self.thread_filled.emit(self.thread_id, self.thread_title)
+                    self.thread_over_1000.emit(f"スレッド： {self.thread_title} が1000レスに到達しました。")
+                    break
+
+                await asyncio.sleep(interval)
+
+            except requests.exceptions.RequestException as e:
+                retry_count += 1
+                logger.warning(f"コメント取得失敗 ({retry_count}/{self.max_retries}): {str(e)}")
+                if retry_count >= self.max_retries:
+                    self.error_occurred.emit(f"コメントの取得に繰り返し失敗しました: {str(e)}")
+                    break
+                await asyncio.sleep(self.retry_delay)
+            except Exception as e:
+                self.error_occurred.emit(f"コメントの取得に失敗しました: {str(e)}")
+                await asyncio.sleep(self.update_interval)
+
+
+class AsyncNextThreadFinder(EngineTask):
+    """NextThreadFinder の非同期版"""
+    next_thread_found = pyqtSignal(dict)
+    search_finished = pyqtSignal(bool)
+
+    def __init__(self, engine, thread_id, thread_title, search_duration=180, subject_index=None, base_url=BASE_URL,
+                 parent=None):
+        super().__init__(engine, parent)
+        self.thread_id = thread_id
+        self.thread_title = thread_title
+        self.search_duration = search_duration
+        self.base_url = base_url
+        self.validators = ValidatorCache()
+        self.subject_index = subject_index
+        self.subject_version = -1
+
+    async def run(self):
+        if self.subject_index is not None:
+            self.subject_index.request_interval(self, 3.0)
+        try:
+            await self.search()
+        finally:
+            if self.subject_index is not None:
+                self.subject_index.release_interval(self)
+
+    async def search(self):
+        start_time = time.time()
+        while self.running and (time.time() - start_time) < self.search_duration:
+            try:
+                threads = await self.fetch_threads()
+                if threads is not None:
+                    next_thread = select_next_thread_in(self.thread_id, self.thread_title, threads)
+                    if next_thread and self.running:
+                        logger.info(f"次スレを発見しました: {next_thread['title']} (ID: {next_thread['id']})")
+                        self.next_thread_found.emit(next_thread)
+                        self.search_finished.emit(True)
+                        return
+            except Exception as e:
+                logger.error(f"次スレ検索中にエラーが発生しました: {str(e)}")
+            await asyncio.sleep(3)
+
+        if self.running:
+            logger.info(f"次スレが見つかりませんでした: {self.thread_title}")
+            self.search_finished.emit(False)
+
+    async def fetch_threads(self):
+        """一覧に変化があればスレッドのリスト、なければ None（SubjectIndex があればそこから読む）"""
+        if self.subject_index is not None:
+            update = self.subject_index.updated_since(self.subject_version)
+            if update is None:
+                return None
+            threads, self.subject_version = update
+            return threads
+        response, not_modified = await self.engine.conditional_get(self.validators, f"{self.base_url}/subject.txt")
+        if not_modified:
+            return None
+        response.raise_for_status()
+        return parse_subject_basic_info(decode_response(response, SUBJECT_ENCODING))
+
+
+class AsyncMainstreamWatcher(EngineTask):
+    """MainstreamWatcher の非同期版。作成時刻がスレッドIDから分からない候補だけ dat の先頭を並行に取得する"""
+    mainstream_thread_found = pyqtSignal(dict)
+    search_finished = pyqtSignal()
+
+    def __init__(self, engine, original_title, original_thread_id, current_thread_id,
+                 watch_duration=60, momentum_ratio=1.5, min_res=10, grace_period=15, subject_index=None,
+                 base_url=BASE_URL, parent=None):
+        super().__init__(engine, parent)
+        self.original_title = original_title
+        self.original_thread_id = original_thread_id
+        self.current_thread_id = current_thread_id
+        self.watch_duration = watch_duration
+        self.momentum_ratio = momentum_ratio
+        self.min_res = min_res
+        self.grace_period = grace_period
+        self.validators = ValidatorCache()
+        self.subject_index = subject_index
+        self.subject_version = -1
+        self.created_at = {}  # スレッドID -> dat の1行目から求めた作成時刻
+        self.base_url = base_url
+
+    async def run(self):
+        if self.subject_index is not None:
+            self.subject_index.request_interval(self, 5.0)
+        try:
+            await self.watch()
+        finally:
+            if self.subject_index is not None:
+                self.subject_index.release_interval(self)
+
+    async def watch(self):
+        logger.info(f"本流スレッドの監視を開始します。{self.grace_period}秒後に比較を開始し、その後{self.watch_duration}秒間監視します。")
+        await asyncio.sleep(self.grace_period)
+        deadline = time.time() + self.watch_duration
+
+        while self.running and time.time() < deadline:
+            try:
+                found = await self.check_mainstream()
+                if found is False:
+                    break
+                if found:
+                    logger.info(f"本流スレッドを発見しました: {found['title']} (勢い: {found['momentum']})")
+                    if self.running:
+                        self.mainstream_thread_found.emit(found)
+                    self.running = False
+                    break
+            except Exception as e:
+                logger.error(f"本流スレッド監視中にエラーが発生しました: {e}")
+            await asyncio.sleep(5)
+
+        logger.info("本流スレッドの監視を終了します。")
+        if self.running:
+            self.search_finished.emit()
+
+    async def check_mainstream(self):
+        """本流スレッドがあればその辞書、なければ None、監視を続けられなければ False を返す"""
+        if self.subject_index is not None:
+            update = self.subject_index.updated_since(self.subject_version)
+            if update is None:
+                return None
+            all_threads, self.subject_version = update
+        else:
+            response, not_modified = await self.engine.conditional_get(
+                self.validators, f"{self.base_url}/subject.txt", timeout=2)
+            if not_modified:
+                return None
+            response.raise_for_status()
+            all_threads = parse_subject_basic_info(decode_response(response, SUBJECT_ENCODING))
+        # 比べる候補のうち作成時刻がスレッドIDから分からないものだけ、dat の1行目を並行に取得しておく
+        now = time.time()
+        candidates = filter_mainstream_candidates(all_threads, self.original_title, self.original_thread_id,
+                                                  self.current_thread_id, self.min_res)
+        unknown = [t['id'] for t in all_threads if t['id'] == self.current_thread_id] + [t['id'] for t in candidates]
+        unknown = [thread_id for thread_id in unknown
+                   if thread_id not in self.created_at and thread_created_at(thread_id, now) is None]
+        if unknown:
+            timestamps = await asyncio.gather(*(self.fetch_dat_timestamp(thread_id) for thread_id in unknown))
+            self.created_at.update(zip(unknown, timestamps))
+
+        return check_mainstream(all_threads, self.original_title, self.original_thread_id, self.current_thread_id,
+                                self.momentum_ratio, self.min_res, created_at_of=self.created_at.get, now=now)
+
+    async def fetch_dat_timestamp(self, thread_id):
+        """dat の先頭だけを取得し、1行目の投稿時刻を返す（取得できなければ 0）"""
+        try:
+            response = await self.engine.get(f"{self.base_url}/dat/{thread_id}.dat",
+                                             headers=first_post_request_headers(), timeout=2)
+            response.raise_for_status()
+            return first_post_timestamp(decode_response(response, DAT_ENCODING))
+        except Exception:
+            return 0
+
+
+PRIORITY_ACTIVE = 0  # オーバーレイに流しているスレッド
+PRIORITY_WARM = 1    # 切り替えに備えて取得だけ続けるスレッド
+
+
+class DatSubscription:
+    """PollScheduler が管理する1スレッド分の購読"""
+
+    def __init__(self, thread_id, thread_title="", interval=5.0, priority=PRIORITY_WARM, poller=None, use_range=True,
+                 base_url=BASE_URL, notify=True):
+        self.thread_id = thread_id
+        self.thread_title = thread_title
+        self.interval = interval
+        self.priority = priority
+        # False なら取得と解析だけを行い、新着を通知しない（cursor は最初の位置のまま残る）
+        self.notify = notify
+        self.poller = poller or DatPoller(thread_id, use_range=use_range, base_url=base_url)
+        # 通知済みの最後のレス番号。取得済みのパーサーを引き継いだ場合はそこから続ける
+        self.cursor = self.poller.parser.line_count if poller else None
+        self.next_due = 0.0
+        self.task = None
+        self.failures = 0
+        self.released = False  # release() で引き渡し済み（PollScheduler.lock の下で変更する）
+
+
+class PollScheduler(EngineTask):
+    """複数スレッドの dat を1つのスケジューラーで巡回する
+
+    各購読は自分のカーソル・取得間隔・優先度を持つ。全体のリクエスト数は
+    requests_per_second 以下に抑え、取得時期が重なったときは優先度の高い購読
+    （PRIORITY_ACTIVE）から先に取得する。PRIORITY_WARM の購読は warm_interval より
+    短い間隔では取得しない。購読の変更はどのスレッドから呼んでもよい。
+    """
+    comments_fetched = pyqtSignal(str, list)  # スレッドID, 新着コメント
+    thread_filled = pyqtSignal(str, str)
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, engine, requests_per_second=4.0, warm_interval=10.0, max_retries=3, base_url=BASE_URL, parent=None):
+        super().__init__(engine, parent)
+        self.base_url = base_url
+        self.requests_per_second = max(0.1, requests_per_second)
+        self.warm_interval = warm_interval
+        self.max_retries = max_retries
+        self.priority_delay = 2.0
+        self.subscriptions = {}  # thread_id -> DatSubscription（イベントループ内でのみ変更する）
+        self.tokens = self.burst = max(1.0, self.requests_per_second)
+        self.last_refill = time.monotonic()
+        self.wake = None
+        # release() と取得の開始を排他し、引き渡した DatPoller をイベントループが書き換えないようにする
+        self.lock = threading.Lock()
+
+    # --- GUI スレッドから呼ぶ操作 ---
+
+    def subscribe(self, thread_id, thread_title="", interval=5.0, priority=PRIORITY_WARM, poller=None, use_range=True,
+                  notify=True):
+        """スレッドを購読する。poller を渡すと解析済みの状態から取得を続ける
+
+        notify=False の購読は新着を comments_fetched で通知せず、引き取ったときに release() が返す
+        cursor から続きを流せるようにしておく（切り替える前の次スレの準備など）。
+        """
+        subscription = DatSubscription(thread_id, thread_title, interval, priority, poller, use_range, self.base_url,
+                                       notify)
+        self._call_soon(self._add, subscription)
+
+    def unsubscribe(self, thread_id):
+        self._call_soon(self._remove, thread_id)
+
+    def set_priority(self, thread_id, priority):
+        self._call_soon(self._set_priority, thread_id, priority)
+
+    def configure(self, requests_per_second, warm_interval):
+        """リクエスト数の上限と待機中の購読の取得間隔を変更する"""
+        self._call_soon(self._configure, max(0.1, requests_per_second), warm_interval)
+
+    def is_subscribed(self, thread_id):
+        return thread_id in self.subscriptions
+
+    def cached_comments(self, thread_id):
+        """購読中のスレッドの取得済みコメント（切り替え直後の表示用）"""
+        subscription = self.subscriptions.get(thread_id)
+        return list(subscription.poller.parser.comments) if subscription else []
+
+    def release(self, thread_id):
+        """購読をやめ、(DatPoller, cursor) を返す。購読していなければ (None, None)
+
+        cursor は通知済みの最後のレス番号（notify=False の購読では最初に取得した位置）で、
+        引き取った側はその次から流せば取りこぼしも重複もない。まだ取得していなければ None。
+        引き渡した購読はロックの下で印を付け、イベントループはそれ以降その取得を始めない。
+        取得中の購読は DatPoller がまだ書き換えられるため引き継がず (None, None) を返す。
+        購読の解除はイベントループに頼むだけにし、呼び出し元を待たせない。
+        """
+        with self.lock:
+            subscription = self.subscriptions.get(thread_id)
+            if subscription is None or subscription.released:
+                return None, None
+            subscription.released = True
+            in_flight = subscription.task is not None
+        self._call_soon(self._detach, subscription)
+        if in_flight:
+            return None, None
+        return subscription.poller, subscription.cursor
+
+    def _call_soon(self, callback, *args):
+        if not self.engine.is_running():
+            self.engine.start()
+        self.engine.loop.call_soon_threadsafe(callback, *args)
+
+    # --- 以下はイベントループ内で実行される ---
+
+    def _wake(self):
+        if self.wake is not None:
+            self.wake.set()
+
+    def _add(self, subscription):
+        self.subscriptions[subscription.thread_id] = subscription
+        logger.info(f"購読を追加しました: {subscription.thread_id} (優先度: {subscription.priority}, 購読数: {len(self.subscriptions)})")
+        self._wake()
+
+    def _remove(self, thread_id):
+        if self.subscriptions.pop(thread_id, None):
+            logger.info(f"購読を解除しました: {thread_id} (購読数: {len(self.subscriptions)})")
+
+    def _configure(self, requests_per_second, warm_interval):
+        self.requests_per_second = requests_per_second
+        self.burst = max(1.0, requests_per_second)
+        self.warm_interval = warm_interval
+
+    def _set_priority(self, thread_id, priority):
+        subscription = self.subscriptions.get(thread_id)
+        if subscription:
+            subscription.priority = priority
+            # 優先度が上がった購読はすぐに取得する
+            if priority == PRIORITY_ACTIVE:
+                subscription.next_due = 0.0
+            self._wake()
+
+    def _detach(self, subscription):
+        """release() の後始末。引き渡した購読を外し、取得中だったものは取り消す"""
+        thread_id = subscription.thread_id
+        if self.subscriptions.get(thread_id) is subscription:
+            del self.subscriptions[thread_id]
+        if subscription.task is not None and not subscription.task.done():
+            subscription.task.cancel()
+        logger.info(f"購読を引き継ぎました: {thread_id} (購読数: {len(self.subscriptions)})")
+
+    def interval_for(self, subscription):
+        if subscription.priority == PRIORITY_WARM:
+            return max(subscription.interval, self.warm_interval)
+        return subscription.interval
+
+    def _pick_due(self, now):
+        """取得時期を過ぎた購読から次に取得するものを選ぶ
+
+        優先度が1段低いごとに priority_delay 秒遅れて取得時期を迎えたものとして比べるため、
+        予算が足りないときは PRIORITY_ACTIVE が先に取得されるが、待機中の購読も止まらない。
+        """
+        due = [s for s in self.subscriptions.values() if s.task is None and not s.released and s.next_due <= now]
+        return min(due, key=lambda s: s.next_due + s.priority * self.priority_delay) if due else None
+
+    def _refill_tokens(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.requests_per_second)
+        self.last_refill = now
+
+    async def _wait_for_wake(self, timeout):
+        try:
+            await asyncio.wait_for(self.wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.wake.clear()
+
+    async def run(self):
+        self.wake = asyncio.Event()
+        try:
+            while self.running:
+                now = time.monotonic()
+                subscription = self._pick_due(now)
+                if subscription is None:
+                    pending = [s.next_due for s in self.subscriptions.values() if s.task is None and not s.released]
+                    await self._wait_for_wake(max(0.0, min(pending) - now) if pending else None)
+                    continue
+
+                self._refill_tokens(now)
+                if self.tokens < 1.0:
+                    # 予算の回復を待ってから選び直し、その間に優先度が変わっても反映する
+                    await asyncio.sleep((1.0 - self.tokens) / self.requests_per_second)
+                    continue
+                with self.lock:
+                    # 選んでからここまでの間に release() で引き渡されていれば取得しない
+                    if subscription.released:
+                        continue
+                    subscription.task = asyncio.create_task(self._poll(subscription))
+                self.tokens -= 1.0
+        finally:
+            await self._cancel_polls()
+
+    async def _cancel_polls(self):
+        """stop() の後始末。取得中の購読を取り消して終わるのを待ち、購読をすべて外す"""
+        tasks = [s.task for s in self.subscriptions.values() if s.task is not None]
+        self.subscriptions.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _poll(self, subscription):
+        thread_id = subscription.thread_id
+        backoff = 1
+        try:
+            new_comments, _ = await self.engine.poll_dat(subscription.poller)
+            subscription.failures = 0
+            line_count = subscription.poller.parser.line_count
+            if subscription.cursor is None:
+                # 初回は CommentFetcher と同じく末尾の数件だけを通知する
+                subscription.cursor = max(0, line_count - 4)
+            batch = [c for c in new_comments if c['number'] > subscription.cursor] if subscription.notify else []
+            if batch:
+                subscription.cursor = batch[-1]['number']
+                # stop() の後や購読を外した後に届いた分は通知しない
+                if self.running and self.subscriptions.get(thread_id) is subscription:
+                    self.comments_fetched.emit(thread_id, batch)
+            if line_count >= 1000:
+                self._remove(thread_id)
+                if self.running:
+                    self.thread_filled.emit(thread_id, subscription.thread_title)
+        except requests.exceptions.RequestException as e:
+            subscription.failures += 1
+            backoff = 2 ** subscription.failures
+            logger.warning(f"購読中のスレッドの取得に失敗 ({subscription.failures}/{self.max_retries}): {thread_id}, {str(e)}")
+            if subscription.failures >= self.max_retries:
+                self._remove(thread_id)
+                if self.running:
+                    self.error_occurred.emit(f"スレッド {thread_id} の取得に繰り返し失敗したため監視を中止しました: {str(e)}")
+        except Exception as e:
+            logger.error(f"購読中のスレッドの解析に失敗しました: {thread_id}, {str(e)}")
+        finally:
+            subscription.task = None
+            subscription.next_due = time.monotonic() + self.interval_for(subscription) * backoff
+            self._wake()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+subject.txt と dat をキャッシュして中継するリレーサーバー
+
+同じスレッドを複数のビュアーで見る場合に、板への取得を1か所にまとめる。
+ビュアーの設定「板のURL」を http://<ホスト>:<ポート> にすると、N台のビュアーでも
+板への取得は取得間隔ごとに1回になる。
+
+- 同じパスへの同時リクエストは上流への取得を1回にまとめる（初回は取得を待ち、以降は共有する）
+- キャッシュが ttl 秒より古ければ古いまま返し、裏で1回だけ取り直す（stale-while-revalidate）
+- dat の取り直しは Range リクエストで追記分だけを取得する（DatPoller と同じ手順）
+- ビュアーからの Range / If-None-Match / If-Modified-Since に応じて 206・304・416 を返す
+
+    python board_relay.py [--port 8765] [--upstream https://bbs.eddibb.cc/liveedge] [--ttl 1.0] [--subject-ttl 5.0]
+"""
+
+import re
+import sys
+import time
+import logging
+import argparse
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('BoardRelay')
+
+UPSTREAM = "https://bbs.eddibb.cc/liveedge"
+PATH_PATTERN = re.compile(r'^/(?:subject\.txt|dat/\d+\.dat)$')
+RANGE_PATTERN = re.compile(r'^bytes=(\d+)-(\d*)$')
+# 再起動をまたいで同じ ETag を別の内容に付けないよう、起動ごとに変える
+ETAG_PREFIX = f"{int(time.time()):x}"
+
+
+class CacheEntry:
+    """1パス分のキャッシュ。読み書きは condition を取って行う"""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.status = None        # 上流の最後の結果（200 またはエラーのステータス）。None は未取得
+        self.body = b""
+        self.content_type = "text/plain"
+        self.last_modified = None
+        self.generation = 0       # 本文が変わるたびに増える（ETag に使う）
+        self.upstream_etag = None
+        self.upstream_last_modified = None
+        self.fetched_at = 0.0     # 上流に最後に確認した時刻（monotonic）
+        self.accessed_at = time.monotonic()
+        self.refreshing = False
+
+    @property
+    def etag(self):
+        return f'"{ETAG_PREFIX}-{self.generation:x}-{len(self.body):x}"'
+
+    def snapshot(self):
+        return self.status, self.body, self.content_type, self.etag, self.last_modified
+
+
+class RelayCache:
+    """上流の subject.txt と dat をパスごとにキャッシュする"""
+
+    def __init__(self, upstream=UPSTREAM, ttl=1.0, subject_ttl=5.0, idle_timeout=600.0, timeout=5):
+        self.upstream = upstream.rstrip("/")
+        self.ttl = ttl
+        self.subject_ttl = subject_ttl
+        self.idle_timeout = idle_timeout  # これだけ参照されなかった dat はキャッシュから捨てる
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.upstream_requests = 0
+
+    def get(self, path):
+        """パスのキャッシュを返す。(status, body, content_type, etag, last_modified)"""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is None:
+                self.evict_idle(now)
+                entry = self.entries[path] = CacheEntry()
+            entry.accessed_at = now
+
+        ttl = self.subject_ttl if path == "/subject.txt" else self.ttl
+        with entry.condition:
+            if entry.status is None:
+                if entry.refreshing:
+                    # 他のリクエストが取得中なので、その結果を待って共有する
+                    entry.condition.wait_for(lambda: not entry.refreshing, self.timeout + 1)
+                    return entry.snapshot()
+                entry.refreshing = True
+                leader = True
+            else:
+                leader = False
+                if now - entry.fetched_at >= ttl and not entry.refreshing:
+                    # 古いキャッシュを返しつつ、裏で1回だけ取り直す
+                    entry.refreshing = True
+                    threading.Thread(target=self.refresh, args=(path, entry), daemon=True).start()
+                return entry.snapshot()
+
+        if leader:
+            self.refresh(path, entry)
+            with entry.condition:
+                return entry.snapshot()
+
+    def evict_idle(self, now):
+        for path, entry in list(self.entries.items()):
+            if path != "/subject.txt" and now - entry.accessed_at > self.idle_timeout and not entry.refreshing:
+                del self.entries[path]
+
+    def refresh(self, path, entry):
+        """上流から取り直してキャッシュを更新する（entry.refreshing を立ててから呼ぶ）"""
+        try:
+            self.fetch_upstream(path, entry)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"上流からの取得に失敗しました: {path}: {str(e)}")
+            with entry.condition:
+                if entry.status is None:
+                    entry.status = 502
+                # 失敗しても ttl の間は取り直さず、古いキャッシュを返し続ける
+                entry.fetched_at = time.monotonic()
+        finally:
+            with entry.condition:
+                entry.refreshing = False
+                entry.condition.notify_all()
+
+    def fetch_upstream(self, path, entry, allow_range=True):
+        with entry.condition:
+            body = entry.body
+            upstream_etag = entry.upstream_etag
+            upstream_last_modified = entry.upstream_last_modified
+            cached = allow_range and entry.status == 200
+            ranged = cached and path.startswith("/dat/") and bool(body)
+
+        headers = {}
+        if ranged:
+            # 最後の1バイトから要求し、上流の dat が書き換えられていないか確かめる
+            headers["Range"] = f"bytes={len(body) - 1}-"
+        if cached:
+            if upstream_etag:
+                headers["If-None-Match"] = upstream_etag
+            if upstream_last_modified:
+                headers["If-Modified-Since"] = upstream_last_modified
+        self.upstream_requests += 1
+        response = self.session.get(f"{self.upstream}{path}", headers=headers, timeout=self.timeout)
+
+        if response.status_code == 304:
+            with entry.condition:
+                entry.fetched_at = time.monotonic()
+            return
+        if ranged and (response.status_code == 416 or
+                       (response.status_code == 206 and response.content[:1] != body[-1:])):
+            logger.info(f"上流の dat が書き換えられました。全体を取り直します: {path}")
+            return self.fetch_upstream(path, entry, allow_range=False)
+
+        with entry.condition:
+            entry.fetched_at = time.monotonic()
+            if response.status_code == 206 and ranged:
+                new_body = body + response.content[1:]
+            elif response.status_code == 200:
+                new_body = response.content
+            else:
+                entry.status = response.status_code
+                return
+            entry.status = 200
+            entry.content_type = response.headers.get("Content-Type", entry.content_type)
+            entry.upstream_etag = response.headers.get("ETag")
+            entry.upstream_last_modified = response.headers.get("Last-Modified")
+            if new_body != entry.body:
+                entry.body = new_body
+                entry.generation += 1
+                entry.last_modified = entry.upstream_last_modified or formatdate(time.time(), usegmt=True)
+
+
+class RelayHandler(BaseHTTPRequestHandler):
+    """キャッシュの内容を条件付きGET・Range リクエストに応じて返す"""
+    server_version = "EdgeBoardRelay/1.0"
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if not PATH_PATTERN.match(path):
+            self.send_error(404)
+            return
+        status, body, content_type, etag, last_modified = self.server.cache.get(path)
+        if status != 200:
+            self.send_error(status or 504)
+            return
+
+        if self.headers.get("If-None-Match") == etag or (
+                "If-None-Match" not in self.headers and last_modified
+                and self.headers.get("If-Modified-Since") == last_modified):
+            self.send_response(304)
+            self.send_validators(etag, last_modified)
+            self.end_headers()
+            return
+
+        range_match = RANGE_PATTERN.match(self.headers.get("Range", ""))
+        if range_match:
+            start = int(range_match.group(1))
+            end = min(int(range_match.group(2)) if range_match.group(2) else len(body) - 1, len(body) - 1)
+            if start >= len(body) or start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(body)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_body(206, body[start:end + 1], content_type, etag, last_modified,
+                           content_range=f"bytes {start}-{end}/{len(body)}")
+            return
+        self.send_body(200, body, content_type, etag, last_modified)
+
+    def send_validators(self, etag, last_modified):
+        self.send_header("ETag", etag)
+        if last_modified:
+            self.send_header("Last-Modified", last_modified)
+        self.send_header("Cache-Control", "no-cache")
+
+    def send_body(self, status, body, content_type, etag, last_modified, content_range=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Accept-Ranges", "bytes")
+        if content_range:
+            self.send_header("Content-Range", content_range)
+        self.send_validators(etag, last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+
+def create_server(host="0.0.0.0", port=8765, cache=None):
+    server = ThreadingHTTPServer((host, port), RelayHandler)
+    server.daemon_threads = True
+    server.cache = cache or RelayCache()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="subject.txt と dat をキャッシュして中継するリレーサーバー")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--upstream", default=UPSTREAM)
+    parser.add_argument("--ttl", type=float, default=1.0, help="dat を上流に確認する間隔（秒）")
+    parser.add_argument("--subject-ttl", type=float, default=5.0, help="subject.txt を上流に確認する間隔（秒）")
+    args = parser.parse_args()
+
+    cache = RelayCache(args.upstream, ttl=args.ttl, subject_ttl=args.subject_ttl)
+    server = create_server(args.host, args.port, cache)
+    logger.info(f"リレーを開始しました: http://{args.host}:{args.port} -> {cache.upstream}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"リレーを終了しました（上流への取得 {cache.upstream_requests}回）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,7 +9,6 @@ import re  # ここを追加
 from PyQt5.QtWidgets import (QWidget, QApplication)
 from PyQt5.QtCore import (Qt, QTimer, QRect, QPoint, QSize, QThread, pyqtSignal, QBuffer, QByteArray)
 from PyQt5.QtGui import (QFont, QColor, QPainter, QFontMetrics, QPen, QBrush, QImage, QMovie, QPixmap)
-import requests
 from io import BytesIO
 import threading
 from queue import Queue, Empty
@@ -46,6 +45,8 @@ class ImageLoaderThread(QThread):
         }
 
     def run(self):
+        # requests の読み込みは重いため、起動時ではなくこのスレッドで行う
+        import requests
         while self.running:
             try:
                 # キューからURLとコメントIDを取得
@@ -165,6 +166,7 @@ class CommentOverlayWindow(QWidget):
 
         self.current_batch_size = 0
         self.current_update_interval = 1.0
+        self.adaptive_update_interval = None  # 適応ポーリング時に CommentFetcher から通知される取得間隔
 
         self.move_area_height = 25
         self.close_button_size = 22
@@ -271,7 +273,9 @@ class CommentOverlayWindow(QWidget):
         self.current_batch_size = batch_size
         app = QApplication.instance()
         main_window = app.property("main_window")
-        if main_window:
+        if self.adaptive_update_interval:
+            self.current_update_interval = self.adaptive_update_interval
+        elif main_window:
             self.current_update_interval = main_window.settings.get("update_interval", 1.0)
         else:
             self.current_update_interval = 1.0
@@ -280,7 +284,7 @@ class CommentOverlayWindow(QWidget):
         for comment in comments:
             comment_timestamp = comment.get('timestamp')
             if self.comment_delay > 0 and comment_timestamp:
-                display_time = comment_timestamp.timestamp() + self.comment_delay
+                display_time = comment_timestamp + self.comment_delay
                 self.delayed_comment_queue.append((display_time, comment))
             else:
                 self.comment_queue.append(comment)
@@ -299,6 +303,12 @@ class CommentOverlayWindow(QWidget):
                 self.flow_timer.stop()
             self.schedule_next_comment()
 
+    def set_update_interval(self, interval):
+        """適応ポーリングで選ばれた取得間隔を流量計算に反映する。None で設定値に戻す"""
+        self.adaptive_update_interval = interval
+        if interval:
+            self.current_update_interval = interval
+
     def process_delayed_comments(self):
         # (このメソッドは変更なし)
         if not self.delayed_comment_queue:
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+完結した dat を zstd 圧縮して ~/.edge_live_viewer/archive/ に保存するアーカイブ
+
+1000レスに到達したスレッドや subject.txt から落ちた過去ログは内容が変わらないため、
+一度取得したものはここから読み出し、再生やシークのたびに取り直さないようにする。
+index.json にスレッドごとのサイズ・文字コード・最終利用時刻を記録し、
+圧縮後の合計サイズが上限を超えたら最も長く使われていないものから削除する（LRU）。
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+
+import zstandard as zstd
+
+from dat_parser import parse_dat_content
+
+logger = logging.getLogger('DatArchive')
+
+DEFAULT_ARCHIVE_DIR = os.path.expanduser("~/.edge_live_viewer/archive")
+
+
+class DatArchive:
+    """dat の zstd 圧縮アーカイブ。CommentFetcher（QThread）と GUI の両方から使えるようロックで保護する"""
+
+    def __init__(self, directory=DEFAULT_ARCHIVE_DIR, max_bytes=200 * 1024 * 1024, level=10):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.level = level
+        self.index_path = os.path.join(directory, "index.json")
+        self.lock = threading.Lock()
+        self.index = self._load_index()
+        # 保存のたびに listener(thread_id, content, encoding, title) を呼ぶ（検索インデックスへの登録など）
+        self.listeners = []
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"アーカイブの索引を読み込めませんでした。作り直します: {str(e)}")
+            return {}
+
+    def _save_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    def _path(self, thread_id):
+        return os.path.join(self.directory, f"{thread_id}.dat.zst")
+
+    def __contains__(self, thread_id):
+        return str(thread_id) in self.index
+
+    def total_bytes(self):
+        return sum(entry["size"] for entry in self.index.values())
+
+    def get(self, thread_id):
+        """保存済みなら (dat のバイト列, 文字コード) を返す。なければ None"""
+        thread_id = str(thread_id)
+        with self.lock:
+            entry = self.index.get(thread_id)
+            if entry is None:
+                return None
+            try:
+                with open(self._path(thread_id), "rb") as f:
+                    content = zstd.ZstdDecompressor().decompress(f.read())
+            except (OSError, zstd.ZstdError) as e:
+                logger.warning(f"アーカイブの読み込みに失敗したため削除します: {thread_id}, {str(e)}")
+                self._remove(thread_id)
+                self._save_index()
+                return None
+            entry["last_access"] = time.time()
+            self._save_index()
+        logger.info(f"アーカイブから dat を読み込みました: {thread_id} ({len(content) / 1024:.1f}KB)")
+        return content, entry.get("encoding")
+
+    def put(self, thread_id, content, encoding=None, title=""):
+        """dat を保存する（既にあれば上書き）。上限を超えた分は古いものから削除する"""
+        thread_id = str(thread_id)
+        if not content:
+            return
+        compressed = zstd.ZstdCompressor(level=self.level).compress(bytes(content))
+        with self.lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                tmp_path = self._path(thread_id) + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(compressed)
+                os.replace(tmp_path, self._path(thread_id))
+            except OSError as e:
+                logger.error(f"dat のアーカイブに失敗しました: {thread_id}, {str(e)}")
+                return
+            now = time.time()
+            self.index[thread_id] = {
+                "size": len(compressed),
+                "raw_size": len(content),
+                "encoding": encoding,
+                "title": title,
+                "stored_at": now,
+                "last_access": now,
+            }
+            self._evict()
+            self._save_index()
+        logger.info(f"dat をアーカイブしました: {thread_id} ({len(content) / 1024:.1f}KB -> {len(compressed) / 1024:.1f}KB)")
+        for listener in self.listeners:
+            listener(thread_id, content, encoding, title)
+
+    def _remove(self, thread_id):
+        self.index.pop(thread_id, None)
+        try:
+            os.remove(self._path(thread_id))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"アーカイブの削除に失敗しました: {thread_id}, {str(e)}")
+
+    def _evict(self):
+        total = self.total_bytes()
+        for thread_id in sorted(self.index, key=lambda k: self.index[k]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            total -= self.index[thread_id]["size"]
+            self._remove(thread_id)
+            logger.info(f"アーカイブの上限を超えたため削除しました: {thread_id}")
+
+    def entries(self):
+        """保存済みの (スレッドID, タイトル, ファイルパス, 文字コード) のリスト"""
+        with self.lock:
+            return [(thread_id, entry.get("title", ""), self._path(thread_id), entry.get("encoding"))
+                    for thread_id, entry in self.index.items()]
+
+    def set_max_bytes(self, max_bytes):
+        with self.lock:
+            self.max_bytes = max_bytes
+            self._evict()
+            self._save_index()
+
+
+def parse_archive_file(args):
+    """プロセスプール用: アーカイブの1ファイルを読み込んで解析し (thread_id, title, コメント) を返す
+
+    子プロセスはこのモジュールを読み込むため、ここでは PyQt5 に依存するものを読み込まない。
+    読み込めなかったファイルのコメントは None。
+    """
+    thread_id, title, path, encoding = args
+    try:
+        with open(path, "rb") as f:
+            content = zstd.ZstdDecompressor().decompress(f.read())
+    except (OSError, zstd.ZstdError):
+        return thread_id, title, None
+    return thread_id, title, parse_dat_content(content, encoding)
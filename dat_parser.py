@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+dat 形式の1行（名前<>メール<>日付 ID<>本文<>タイトル）を解析するパーサー
+
+正規表現はモジュール読み込み時に一度だけコンパイルし、各フィールドは1回の走査で処理する。
+"""
+
+import re
+import html
+import time
+import logging
+from datetime import datetime
+
+logger = logging.getLogger('DatParser')
+
+DATE_PATTERN = re.compile(r'\d{4}/\d{2}/\d{2}\(\S+\) \d{2}:\d{2}:\d{2}\.\d+')
+WEEKDAY_PATTERN = re.compile(r'\(\S+\)')
+# 日付（と時）ごとのエポック秒のキャッシュ: (YYYY/MM/DD, 時) -> その時刻00分00秒のエポック秒
+_hour_epoch_cache = {}
+_HOUR_EPOCH_CACHE_SIZE = 4096
+
+# 本文からタグと !metadent: 以降をまとめて取り除く（<br> は事前に空白へ置換する）
+MARKUP_PATTERN = re.compile(r'<[^>]*>|!metadent:.*')
+
+
+def clean_body(text):
+    """本文のHTMLを表示用のプレーンテキストに変換する"""
+    if '<' in text:
+        text = text.replace('<br>', ' ')
+    if '<' in text or '!metadent:' in text:
+        text = MARKUP_PATTERN.sub('', text)
+    if '&' in text:
+        text = html.unescape(text)
+    return text
+
+
+def parse_datetime(date_str):
+    """投稿日時文字列をdatetimeオブジェクトに変換（日本語曜日対応）"""
+    try:
+        match = DATE_PATTERN.match(date_str)
+        if not match:
+            logger.warning(f"日時形式が不正: {date_str}")
+            return None
+        base, millis = match.group().rsplit('.', 1)
+        millis = millis.ljust(6, '0')
+        normalized_date = WEEKDAY_PATTERN.sub('', f"{base}.{millis}")
+        return datetime.strptime(normalized_date, "%Y/%m/%d %H:%M:%S.%f")
+    except ValueError as e:
+        logger.warning(f"日時解析に失敗: {date_str}, エラー: {str(e)}")
+        return None
+
+
+def parse_timestamp(date_str):
+    """投稿日時文字列 'YYYY/MM/DD(曜) HH:MM:SS.ff' をエポック秒（float）に変換する
+
+    固定位置の数字を直接切り出し、日付部分の変換結果はキャッシュする。
+    レイアウトが崩れている場合のみ parse_datetime にフォールバックする。
+    """
+    try:
+        close = date_str.index(') ', 10)
+        if date_str[4] != '/' or date_str[7] != '/' or date_str[10] != '(' or \
+           date_str[close + 4] != ':' or date_str[close + 7] != ':' or date_str[close + 10] != '.':
+            raise ValueError(date_str)
+        hour = int(date_str[close + 2:close + 4])
+        minute = int(date_str[close + 5:close + 7])
+        second = int(date_str[close + 8:close + 10])
+        fraction = date_str[close + 11:]
+        if not fraction.isdigit():
+            raise ValueError(date_str)
+
+        key = (date_str[:10], hour)
+        base = _hour_epoch_cache.get(key)
+        if base is None:
+            # 時単位で mktime するため、夏時間のある環境でも切り替え日以外は正しい
+            base = time.mktime((int(date_str[:4]), int(date_str[5:7]), int(date_str[8:10]),
+                                hour, 0, 0, 0, 0, -1))
+            if len(_hour_epoch_cache) >= _HOUR_EPOCH_CACHE_SIZE:
+                _hour_epoch_cache.clear()
+            _hour_epoch_cache[key] = base
+        return base + minute * 60 + second + int(fraction) / 10 ** len(fraction)
+    except (ValueError, IndexError, OverflowError):
+        parsed = parse_datetime(date_str)
+        return parsed.timestamp() if parsed else None
+
+
+def parse_dat_line(line, number):
+    """datの1行をコメント辞書に変換する。形式が不正な行は None
+
+    戻り値のキーは number, name, date, id, text, timestamp のみ。timestamp はエポック秒（float）。
+    """
+    parts = line.split('<>', 4)
+    if len(parts) < 4:
+        return None
+    name, _, date_id, text = parts[:4]
+
+    id_pos = date_id.find('ID:')
+    if id_pos >= 0:
+        id_end = date_id.find(' ', id_pos)
+        user_id = date_id[id_pos + 3:] if id_end < 0 else date_id[id_pos + 3:id_end]
+    else:
+        user_id = ""
+
+    date_match = DATE_PATTERN.search(date_id)
+    date = date_match.group() if date_match else date_id
+
+    return {
+        'number': number,
+        'name': name,
+        'date': date,
+        'id': user_id,
+        'text': clean_body(text),
+        'timestamp': parse_timestamp(date)
+    }
+
+
+def parse_dat_content(content, encoding=None):
+    """dat のバイト列全体をコメントのリストにする"""
+    text = content.decode(encoding or "utf-8", errors="replace")
+    comments = []
+    for i, line in enumerate(text.split('\n')):
+        if line.strip():
+            comment = parse_dat_line(line, i + 1)
+            if comment:
+                comments.append(comment)
+    return comments
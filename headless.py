@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+画面を使わずにスレッドを取得し、新しいレスを1行1件の JSON（JSONL）で書き出すヘッドレスモード
+
+MainWindow・CommentOverlayWindow は作らず、ビュアーと同じ ThreadConnector・CommentFetcher・
+NextThreadFinder を QCoreApplication のイベントループで動かす。ディスプレイのない環境での
+アーカイブ、他のツールへの受け渡し、負荷試験に使う。
+
+    python main.py --headless --thread 1742132339 [--out comments.jsonl] [--follow] [--from-number 1]
+
+- 各レスは CommentFetcher が通知する辞書に thread_id と thread_title を加えて書き出す
+- 取得した分（1回の取得で届いたレス）ごとに flush する
+- 接続時に既存のレスは、ビュアーと同じく最後の数件だけを書き出す（--from-number で開始番号を指定できる）
+- --follow を付けると、1000レスに達したときに次スレを探して続ける（handle_thread_filled と同じ）。
+  次スレは最初のレスから書き出す
+- 過去ログは全レスを書き出して終了する
+"""
+
+import sys
+import json
+import signal
+import logging
+
+from PyQt5.QtCore import QCoreApplication, QObject, QTimer
+
+from app_settings import load_settings
+from dat_archive import DatArchive
+from subject_index import SubjectIndex
+from thread_fetcher_improved import BASE_URL, CommentFetcher, NextThreadFinder, ThreadConnector
+
+logger = logging.getLogger('Headless')
+
+
+class HeadlessStream(QObject):
+    """1つのスレッド（--follow なら次スレも）のレスを out に JSONL で書き出す"""
+
+    def __init__(self, thread_id, out, follow=False, start_number=None, settings=None, parent=None):
+        super().__init__(parent)
+        self.thread_id = str(thread_id)
+        self.out = out
+        self.follow = follow
+        self.start_number = start_number
+        self.settings = settings if settings is not None else load_settings()
+        self.base_url = self.settings.get("board_base_url") or BASE_URL
+        self.subject_index = SubjectIndex(base_url=self.base_url, parent=self)
+        self.archive = None
+        if self.settings.get("use_dat_archive", True):
+            self.archive = DatArchive(max_bytes=int(self.settings.get("dat_archive_max_mb", 200) * 1024 * 1024))
+        self.thread_connector = None
+        self.comment_fetcher = None
+        self.next_thread_finder = None
+        self.current_thread_id = None
+        self.current_thread_title = None
+        self.written = 0
+        self.exit_code = 0
+        self.stopping = False
+
+    def start(self):
+        self.subject_index.start()
+        self.connect_to_thread(self.thread_id, start_number=self.start_number)
+
+    def connect_to_thread(self, thread_id, thread_title=None, start_number=None):
+        self.thread_connector = ThreadConnector(
+            thread_id,
+            thread_title,
+            subject_index=self.subject_index,
+            archive=self.archive,
+            use_range=self.settings.get("use_range_requests", True),
+            base_url=self.base_url,
+            parent=self
+        )
+        self.thread_connector.connected.connect(lambda result: self.on_thread_connected(result, start_number))
+        self.thread_connector.connect_failed.connect(self.on_thread_connect_failed)
+        self.thread_connector.start()
+        logger.info(f"スレッド {thread_id} への接続処理を開始しました")
+
+    def on_thread_connected(self, result, start_number):
+        self.release_connector()
+        if self.stopping:
+            return
+        self.current_thread_id = result["thread_id"]
+        self.current_thread_title = result["title"]
+        logger.info(f"スレッド接続 - ID: {self.current_thread_id}, タイトル: {self.current_thread_title}, "
+                    f"過去ログ: {result['is_past_thread']}")
+        self.comment_fetcher = CommentFetcher(
+            thread_id=self.current_thread_id,
+            thread_title=self.current_thread_title,
+            update_interval=self.settings["update_interval"],
+            is_past_thread=result["is_past_thread"],
+            start_number=start_number,
+            use_range=self.settings.get("use_range_requests", True),
+            poller=result["poller"],
+            playback=False,
+            archive=self.archive,
+            initial_result=result["initial_result"],
+            base_url=self.base_url,
+            parent=self
+        )
+        if self.settings.get("adaptive_polling", False):
+            self.comment_fetcher.set_adaptive_polling(
+                True, self.settings.get("adaptive_min_interval", 0.5), self.settings.get("adaptive_max_interval", 10.0))
+        self.comment_fetcher.comments_fetched.connect(self.write_comments)
+        self.comment_fetcher.all_comments_fetched.connect(self.write_comments)
+        self.comment_fetcher.thread_filled.connect(self.on_thread_filled)
+        self.comment_fetcher.error_occurred.connect(self.on_fetch_error)
+        self.comment_fetcher.finished.connect(self.on_fetcher_finished)
+        self.comment_fetcher.start()
+
+    def on_thread_connect_failed(self, thread_id, message):
+        self.release_connector()
+        logger.error(message)
+        self.finish(1)
+
+    def release_connector(self):
+        """通知を終えた ThreadConnector の終了を待つ（終了前に破棄されないように）"""
+        connector, self.thread_connector = self.thread_connector, None
+        if connector is not None:
+            connector.wait(3000)
+
+    def write_comments(self, comments):
+        if self.stopping:
+            return
+        try:
+            for comment in comments:
+                record = dict(comment, thread_id=self.current_thread_id, thread_title=self.current_thread_title)
+                self.out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.out.flush()
+        except BrokenPipeError:
+            # 出力先（パイプの読み手）が終了した
+            self.finish(0)
+            return
+        self.written += len(comments)
+
+    def on_fetch_error(self, message):
+        logger.error(message)
+        if self.comment_fetcher is not None and not self.comment_fetcher.running:
+            return
+        self.exit_code = 1
+
+    def on_thread_filled(self, thread_id, thread_title):
+        if not self.follow:
+            return
+        logger.info(f"スレッド {thread_id} が埋まりました。次スレを検索します")
+        self.next_thread_finder = NextThreadFinder(thread_id, thread_title,
+                                                   self.settings.get("next_thread_search_duration", 180),
+                                                   subject_index=self.subject_index, base_url=self.base_url,
+                                                   parent=self)
+        self.next_thread_finder.next_thread_found.connect(self.on_next_thread_found)
+        self.next_thread_finder.search_finished.connect(self.on_search_finished)
+        self.next_thread_finder.start()
+
+    def on_next_thread_found(self, next_thread):
+        logger.info(f"次スレが見つかりました: {next_thread['id']} - {next_thread['title']}")
+        self.connect_to_thread(next_thread["id"], next_thread["title"], start_number=1)
+
+    def on_search_finished(self, found):
+        self.next_thread_finder = None
+        if not found:
+            logger.info("次スレが見つかりませんでした。終了します")
+            self.finish(0)
+
+    def on_fetcher_finished(self):
+        if self.sender() is not self.comment_fetcher or self.stopping:
+            return
+        # 1000レス到達で次スレを探している間は終了しない
+        if self.next_thread_finder is None and self.thread_connector is None:
+            self.finish(self.exit_code)
+
+    def finish(self, exit_code=0):
+        """取得処理を止めてイベントループを終了する"""
+        if self.stopping:
+            return
+        self.stopping = True
+        self.exit_code = exit_code
+        if self.thread_connector is not None:
+            self.thread_connector.stop()
+            self.thread_connector.wait(3000)
+        if self.next_thread_finder is not None:
+            self.next_thread_finder.stop()
+            self.next_thread_finder.wait(3000)
+        if self.comment_fetcher is not None:
+            self.comment_fetcher.stop()
+        self.subject_index.stop()
+        logger.info(f"ヘッドレスモードを終了します（書き出したレス: {self.written}件）")
+        QCoreApplication.instance().exit(exit_code)
+
+
+def run_headless(thread_id, out_path=None, follow=False, start_number=None):
+    """ヘッドレスモードを実行し、終了コードを返す。out_path を省略すると標準出力に書き出す"""
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    out = open(out_path, "a", encoding="utf-8") if out_path else sys.stdout
+    try:
+        stream = HeadlessStream(thread_id, out, follow=follow, start_number=start_number)
+        # Ctrl+C で取得処理を止めてから終了する。Python のシグナルハンドラを動かすため定期的にイベントループを抜ける
+        signal.signal(signal.SIGINT, lambda *args: stream.finish(0))
+        signal.signal(signal.SIGTERM, lambda *args: stream.finish(0))
+        wakeup = QTimer()
+        wakeup.timeout.connect(lambda: None)
+        wakeup.start(200)
+        QTimer.singleShot(0, stream.start)
+        return app.exec_()
+    finally:
+        if out is not sys.stdout:
+            out.close()
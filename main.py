@@ -4,16 +4,20 @@
 """
 エッヂ実況ビュアー
 エッヂ掲示板のコメントをニコニコ動画風に表示するアプリケーション
+
+起動を速くするため、最初の画面に要らないモジュール（requests、非同期エンジンの aiohttp、
+設定ダイアログ、検索インデックス）は使うときに読み込む。--profile-startup で起動の内訳を表示する。
 """
 
+from startup_profile import startup_profile
+
 import os
 import sys
 import time
 import json
 import re
-import requests
+import argparse
 import logging
-import zstandard as zstd
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QLabel, QPushButton, QLineEdit, 
                              QTabWidget, QTableWidget, QTableWidgetItem, 
@@ -23,13 +27,18 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
 from PyQt5.QtCore import Qt, QTimer, QUrl, QPoint, QThread, pyqtSignal
 from PyQt5.QtGui import QFont, QColor, QDesktopServices
 
-from thread_fetcher_improved import ThreadFetcher, CommentFetcher, NextThreadFinder, MainstreamWatcher
+from thread_fetcher_improved import (CommentFetcher, NextThreadFinder, MainstreamWatcher, PastLogPlayer, ThreadConnector,
+                                     select_next_thread_in, sort_threads, BASE_URL)
+from subject_index import SubjectIndex
 from comment_animation_improved import CommentOverlayWindow
-from settings_dialog import SettingsDialog
+from dat_archive import DatArchive
+from app_settings import load_settings
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('EdgeLiveViewer')
 
+startup_profile.mark("imports")
+
 class PostCommentWorker(QThread):
     """コメント投稿を非同期で実行するワーカースレッド"""
     finished = pyqtSignal(bool, str, str, str, str)  # success, response, name, mail, comment
@@ -49,6 +58,7 @@ class PostCommentWorker(QThread):
     
     def _send_post_request(self):
         """エッヂに書き込みリクエストを送信（スレッドセーフ）"""
+        import requests
         url = "https://bbs.eddibb.cc/test/bbs.cgi"
         headers = {
             "User-Agent": "EdgeLiveViewer/1.0",
@@ -395,13 +405,38 @@ class MainWindow(QMainWindow):
         
         QApplication.instance().setProperty("main_window", self)
         self.settings = self.load_settings()
+        startup_profile.mark("settings")
+        # subject.txt と dat の取得先（board_relay.py のリレーを指定できる。変更は再起動後に反映）
+        self.base_url = self.settings.get("board_base_url") or BASE_URL
         self.overlay_window = None
-        self.thread_fetcher = None
         self.comment_fetcher = None
+        # 接続処理は ThreadConnector がバックグラウンドで行い、完了したら on_thread_connected で取得を始める
+        self.thread_connector = None
+        # 過去ログは取得後メモリに保持し、シーク・一時停止はこのプレイヤーで行う
+        self.past_log_player = None
+        self.past_log_start_number = None
+        # 検索結果から開くスレッドの再生開始番号（thread_id -> レス番号）。接続が終わるまで保持する
+        self.pending_start_numbers = {}
+        # 検索インデックスと過去ログのアーカイブは、画面を表示してから start_deferred_services で用意する
+        self.search_indexer = None
+        self.dat_archive = None
         self.next_thread_finder = None
         # ### 機能追加: MainstreamWatcher と元スレタイトルのプロパティを追加 ###
         self.mainstream_watcher = None
         self.original_thread_title_for_watcher = None
+        # 非同期エンジン（設定で有効な場合のみ、最初の取得時に起動する）
+        self.board_engine = None
+        # subject.txt はスレッド一覧・次スレ検索・本流監視・タイトル解決で共有する
+        self.subject_index = SubjectIndex(base_url=self.base_url, engine=self.get_board_engine(), parent=self)
+        self.subject_index.threads_updated.connect(self.on_subject_updated)
+        self.subject_index.threads_added.connect(self.on_subject_threads_added)
+        self.subject_index.error_occurred.connect(self.show_error)
+        # 並行監視: 接続中以外のスレッドも取得を続け、切り替えに備える
+        self.poll_scheduler = None
+        self.watched_threads = {}  # thread_id -> タイトル（ユーザーが並行監視を選んだスレッド）
+        self.overlay_sources = set()  # 接続中のスレッドに加えてオーバーレイに流すスレッド
+        # 埋まりかけのスレッドの次スレ（先に並行監視へ加え、1000レス到達時にそのまま引き継ぐ）
+        self.prearmed_thread = None
 
         self.current_thread_id = None
         self.current_thread_title = None
@@ -410,14 +445,14 @@ class MainWindow(QMainWindow):
         self.load_auth_token()
         self.write_widget = None
         self.is_docked = True
-        self.refresh_timer = QTimer(self)
         self.init_ui()
+        startup_profile.mark("ui")
         
         app = QApplication.instance()
         app.setProperty("main_window", self)
         
-        self.start_thread_fetcher_initial()
-        self.show_tutorial_if_first_launch()
+        # スレッド一覧の取得などは最初の描画を待ってから始める
+        self.deferred_services_started = False
         
         self.health_timer = QTimer(self)
         self.health_timer.timeout.connect(self.check_fetcher_health)
@@ -428,11 +463,37 @@ class MainWindow(QMainWindow):
         self.is_thread_finished = False  # 1000レス到達で正常停止した場合はTrue
         self.detail_table.doubleClicked.connect(self.start_playback_from_comment)
 
-        # --- 追加: タイマーの設定と開始 ---
-        self.refresh_timer.timeout.connect(self.refresh_thread_list)
-        if self.auto_refresh_check.isChecked():
-            self.refresh_timer.start(30000)  # 30秒 = 30000ミリ秒
-        # --- 追加ここまで ---
+    def showEvent(self, event):
+        super().showEvent(event)
+        # 最小化して起動した場合など、描画されないまま待ち続けないようにする
+        QTimer.singleShot(1000, self.start_deferred_services)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not startup_profile.has_mark("first_paint"):
+            startup_profile.mark("first_paint")
+            QTimer.singleShot(0, self.start_deferred_services)
+
+    def start_deferred_services(self):
+        """最初の画面に要らない処理を、最初の描画の後に始める
+
+        検索インデックスと過去ログのアーカイブもここで作るため、それらを使う処理は
+        描画より先に呼ばれた場合に備えて、使う前にこれを呼ぶ（2回目以降は何もしない）。
+        """
+        if self.deferred_services_started:
+            return
+        self.deferred_services_started = True
+        # アーカイブされたスレッドは検索インデックスにも登録する
+        from search_index import SearchIndexer
+        self.search_indexer = SearchIndexer(parent=self)
+        self.search_indexer.search_finished.connect(self.show_search_results)
+        self.search_indexer.reindex_finished.connect(self.on_reindex_finished)
+        self.search_indexer.error_occurred.connect(self.show_error)
+        self.search_indexer.start()
+        self.dat_archive = self.create_dat_archive()
+        startup_profile.mark("services")
+        self.start_thread_fetcher_initial()
+        self.show_tutorial_if_first_launch()
 
     def init_ui(self):
         central_widget = QWidget()
@@ -460,6 +521,7 @@ class MainWindow(QMainWindow):
         sort_layout.addWidget(QLabel("並び替え:"))
         self.sort_combo = QComboBox()
         self.sort_combo.addItem("勢い順", "momentum")
+        self.sort_combo.addItem("勢い順（直近5分）", "recent")
         self.sort_combo.addItem("新着順", "date")
         self.sort_combo.currentIndexChanged.connect(self.change_sort_order)
         sort_layout.addWidget(self.sort_combo)
@@ -491,6 +553,8 @@ class MainWindow(QMainWindow):
         self.thread_table.setSelectionBehavior(QTableWidget.SelectRows)
         self.thread_table.setEditTriggers(QTableWidget.NoEditTriggers)
         self.thread_table.doubleClicked.connect(self.thread_selected)
+        self.thread_table.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.thread_table.customContextMenuRequested.connect(self.show_thread_context_menu)
         
         self.thread_table.setColumnWidth(1, 60)
         self.thread_table.setColumnWidth(2, 60)
@@ -505,7 +569,14 @@ class MainWindow(QMainWindow):
         
         self.thread_title_label = QLabel("接続中のスレッド: 未接続")
         self.thread_title_label.setAlignment(Qt.AlignCenter)
-        self.detail_layout.addWidget(self.thread_title_label)
+        title_layout = QHBoxLayout()
+        title_layout.addWidget(self.thread_title_label, 1)
+        # 過去ログ再生中のみ表示する
+        self.pause_button = QPushButton("一時停止")
+        self.pause_button.clicked.connect(self.toggle_past_log_pause)
+        self.pause_button.hide()
+        title_layout.addWidget(self.pause_button)
+        self.detail_layout.addLayout(title_layout)
         
         self.detail_table = QTableWidget(0, 5)
         self.detail_table.setHorizontalHeaderLabels(["番号", "本文", "名前", "ID", "投稿日時"])
@@ -528,6 +599,46 @@ class MainWindow(QMainWindow):
         self.detail_layout.addWidget(self.write_widget)
         
         self.tab_widget.addTab(self.detail_tab, "スレッド詳細")
+
+        # 検索タブ（アーカイブ済みスレッドの全文検索）
+        search_tab = QWidget()
+        search_layout = QVBoxLayout(search_tab)
+        search_form = QHBoxLayout()
+        self.search_text_input = QLineEdit()
+        self.search_text_input.setPlaceholderText("本文（空白区切りで AND 検索）")
+        self.search_text_input.returnPressed.connect(self.run_search)
+        search_form.addWidget(self.search_text_input, 3)
+        self.search_id_input = QLineEdit()
+        self.search_id_input.setPlaceholderText("ID")
+        self.search_id_input.returnPressed.connect(self.run_search)
+        search_form.addWidget(self.search_id_input, 1)
+        self.search_period_combo = QComboBox()
+        self.search_period_combo.addItem("すべて", None)
+        self.search_period_combo.addItem("1日以内", 1)
+        self.search_period_combo.addItem("1週間以内", 7)
+        self.search_period_combo.addItem("1ヶ月以内", 30)
+        search_form.addWidget(self.search_period_combo)
+        search_button = QPushButton("検索")
+        search_button.clicked.connect(self.run_search)
+        search_form.addWidget(search_button)
+        reindex_button = QPushButton("インデックス再構築")
+        reindex_button.clicked.connect(self.reindex_search)
+        search_form.addWidget(reindex_button)
+        search_layout.addLayout(search_form)
+
+        self.search_table = QTableWidget(0, 5)
+        self.search_table.setHorizontalHeaderLabels(["スレッド", "番号", "本文", "ID", "投稿日時"])
+        self.search_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        self.search_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.search_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.search_table.verticalHeader().setVisible(False)
+        self.search_table.setColumnWidth(0, 160)
+        self.search_table.setColumnWidth(1, 40)
+        self.search_table.setColumnWidth(3, 80)
+        self.search_table.setColumnWidth(4, 100)
+        self.search_table.doubleClicked.connect(self.open_search_result)
+        search_layout.addWidget(self.search_table)
+        self.tab_widget.addTab(search_tab, "検索")
         
         main_layout.addWidget(self.tab_widget)
         
@@ -544,22 +655,22 @@ class MainWindow(QMainWindow):
     # --- 追加: 自動更新のON/OFFを切り替えるメソッド ---
     def toggle_auto_refresh(self, state):
         if state == Qt.Checked:
-            self.refresh_timer.start(30000)
+            self.subject_index.request_interval("thread_list", 30.0)
             self.statusBar().showMessage("スレッド一覧の自動更新を開始しました。")
             logger.info("スレッド一覧の自動更新を開始しました。")
         else:
-            self.refresh_timer.stop()
+            self.subject_index.release_interval("thread_list")
             self.statusBar().showMessage("スレッド一覧の自動更新を停止しました。")
             logger.info("スレッド一覧の自動更新を停止しました。")
     # --- 追加ここまで ---
 
     def update_thread_list(self, threads):
         # 以前の修正を反映したバージョン
+        # 行は1回でまとめて確保する（1行ずつ insertRow すると数百件で目に見えて遅い）
         self.thread_table.setRowCount(0)
+        self.thread_table.setRowCount(len(threads))
         
-        for thread in threads:
-            row = self.thread_table.rowCount()
-            self.thread_table.insertRow(row)
+        for row, thread in enumerate(threads):
             
             self.thread_table.setItem(row, 0, QTableWidgetItem(thread["title"]))
             self.thread_table.setItem(row, 1, QTableWidgetItem(thread["res_count"]))
@@ -572,7 +683,7 @@ class MainWindow(QMainWindow):
             self.thread_table.item(row, 0).setData(Qt.UserRole, thread["id"])
         
         # 自動更新時にはステータスメッセージを上書きしないように配慮
-        if not self.refresh_timer.isActive() or not self.auto_refresh_check.isChecked():
+        if not self.auto_refresh_check.isChecked():
              self.statusBar().showMessage(f"スレッド一覧を更新しました（{len(threads)}件）")
 
     def start_playback_from_comment(self):
@@ -588,10 +699,13 @@ class MainWindow(QMainWindow):
         comment_number = int(self.detail_table.item(selected_row, 0).text())
         logger.info(f"ダブルクリックで選択されたコメント番号: {comment_number}")
 
-        # 現在のCommentFetcherを停止
-        if self.comment_fetcher and self.comment_fetcher.isRunning():
-            self.comment_fetcher.stop()
-            logger.info("既存のCommentFetcherを停止しました")
+        # 保持している過去ログがあればメモリ上でシークするだけ
+        player = self.past_log_player
+        if player is None or player.thread_id != self.current_thread_id:
+            # 現在のCommentFetcherを停止
+            if self.comment_fetcher and self.comment_fetcher.isRunning():
+                self.comment_fetcher.stop()
+                logger.info("既存のCommentFetcherを停止しました")
 
         # CommentOverlayWindowをリセット
         if self.overlay_window:
@@ -602,6 +716,12 @@ class MainWindow(QMainWindow):
                 self.overlay_window.flow_timer.stop()
             logger.info("CommentOverlayWindowをリセットしました")
 
+        if player is not None and player.thread_id == self.current_thread_id:
+            player.play(comment_number)
+            self.pause_button.setText("一時停止")
+            self.statusBar().showMessage(f"コメント番号 {comment_number} から再生を開始しました")
+            return
+
         # 新しいCommentFetcherを開始（指定位置から）
         self.start_thread_fetcher_from_position(
             self.current_thread_id,
@@ -612,6 +732,7 @@ class MainWindow(QMainWindow):
 
     def start_thread_fetcher_from_position(self, thread_id, thread_title, start_number=None):
         """指定された番号からCommentFetcherを開始"""
+        self.start_deferred_services()
         if self.comment_fetcher and self.comment_fetcher.isRunning():
             self.comment_fetcher.stop()
 
@@ -625,6 +746,8 @@ class MainWindow(QMainWindow):
             playback_speed=playback_speed,
             comment_delay=comment_delay,
             start_number=start_number,  # 新しい引数を追加
+            archive=self.dat_archive,
+            base_url=self.base_url,
             parent=self
         )
         self.comment_fetcher.comments_fetched.connect(self.display_comments)
@@ -678,8 +801,11 @@ class MainWindow(QMainWindow):
             logger.info("書き込み欄をドッキングしました")
 
     def closeEvent(self, event):
-        if self.thread_fetcher is not None:
-            self.thread_fetcher.stop()
+        self.subject_index.stop()
+
+        if self.thread_connector is not None:
+            self.thread_connector.stop()
+            self.thread_connector.wait(3000)
         
         if self.comment_fetcher is not None:
             self.comment_fetcher.stop()
@@ -690,6 +816,16 @@ class MainWindow(QMainWindow):
         # ### 機能追加: MainstreamWatcher も停止させる ###
         if self.mainstream_watcher is not None:
             self.mainstream_watcher.stop()
+
+        if self.poll_scheduler is not None:
+            self.poll_scheduler.stop()
+
+        self.stop_past_log_player()
+        if self.search_indexer is not None:
+            self.search_indexer.stop()
+
+        if self.board_engine is not None:
+            self.board_engine.stop()
         
         if self.overlay_window is not None and self.overlay_window.isVisible():
             self.overlay_window.close()
@@ -707,10 +843,102 @@ class MainWindow(QMainWindow):
             logger.debug("check_fetcher_health: スレッドは正常に完了したため、再起動しません")
             return
         
+        # 過去ログは取得を終えた CommentFetcher が止まっているのが正常
+        if self.is_past_thread:
+            return
+        
         if self.comment_fetcher and not self.comment_fetcher.isRunning():
             logger.warning("CommentFetcher が停止している可能性があります。再起動します")
             self.start_thread_fetcher(self.current_thread_id, self.current_thread_title)
     
+    def run_search(self):
+        text = self.search_text_input.text().strip()
+        post_id = self.search_id_input.text().strip()
+        if not text and not post_id:
+            return
+        self.start_deferred_services()
+        days = self.search_period_combo.currentData()
+        since = time.time() - days * 86400 if days else None
+        self.search_indexer.request_search(text, post_id, since)
+        self.statusBar().showMessage("検索中...")
+
+    def show_search_results(self, results):
+        self.search_table.setRowCount(0)
+        for row, result in enumerate(results):
+            self.search_table.insertRow(row)
+            title_item = QTableWidgetItem(result["title"] or result["thread_id"])
+            title_item.setData(Qt.UserRole, result["thread_id"])
+            self.search_table.setItem(row, 0, title_item)
+            self.search_table.setItem(row, 1, QTableWidgetItem(str(result["number"])))
+            self.search_table.setItem(row, 2, QTableWidgetItem(result["text"]))
+            self.search_table.setItem(row, 3, QTableWidgetItem(result["id"]))
+            self.search_table.setItem(row, 4, QTableWidgetItem(result["date"]))
+        self.statusBar().showMessage(f"検索結果: {len(results)}件")
+
+    def reindex_search(self):
+        self.start_deferred_services()
+        if self.dat_archive is None:
+            self.show_error("過去ログの保存が無効なため、インデックスを再構築できません。")
+            return
+        self.search_indexer.request_reindex(self.dat_archive)
+        self.statusBar().showMessage("検索インデックスを再構築しています...")
+
+    def on_reindex_finished(self, count):
+        self.statusBar().showMessage(f"検索インデックスを再構築しました（{count}スレッド）")
+
+    def open_search_result(self):
+        """検索結果のスレッドを開き、そのレスから再生する"""
+        row = self.search_table.currentRow()
+        if row < 0:
+            return
+        thread_id = self.search_table.item(row, 0).data(Qt.UserRole)
+        number = int(self.search_table.item(row, 1).text())
+
+        player = self.past_log_player
+        if player is not None and player.thread_id == thread_id:
+            player.play(number)
+            self.tab_widget.setCurrentIndex(1)
+        else:
+            # タイトルを渡さずに接続し、subject.txt になければ過去ログとして開く。
+            # 現行スレッドか過去ログかは接続が終わってから on_thread_connected で判断する
+            self.connect_to_thread_by_id(thread_id, start_number=number)
+            return
+        self.statusBar().showMessage(f"スレッド {thread_id} をレス {number} から再生します")
+
+    def on_past_log_loaded(self, comments):
+        """過去ログの取得が終わったらプレイヤーに渡して再生を始める"""
+        self.stop_past_log_player()
+        self.past_log_player = PastLogPlayer(
+            self.current_thread_id, comments,
+            playback_speed=self.settings.get("playback_speed", 1.0),
+            parent=self
+        )
+        self.past_log_player.comments_fetched.connect(self.display_comments)
+        self.past_log_player.playback_finished.connect(self.on_playback_finished)
+        self.past_log_player.play(self.past_log_start_number)
+        self.pause_button.setText("一時停止")
+        self.pause_button.show()
+
+    def stop_past_log_player(self):
+        if self.past_log_player is not None:
+            self.past_log_player.stop()
+            self.past_log_player.deleteLater()
+            self.past_log_player = None
+        self.pause_button.hide()
+
+    def toggle_past_log_pause(self):
+        player = self.past_log_player
+        if player is None:
+            return
+        if player.is_paused():
+            player.resume()
+            self.pause_button.setText("一時停止")
+            self.statusBar().showMessage("過去ログの再生を再開しました")
+        else:
+            player.pause()
+            self.pause_button.setText("再開")
+            self.statusBar().showMessage("過去ログの再生を一時停止しました")
+
     def show_context_menu(self, pos):
         row = self.detail_table.currentRow()
         if row < 0:
@@ -768,6 +996,7 @@ class MainWindow(QMainWindow):
                 self.statusBar().showMessage(f"NG 名前 '{text}' を追加しました")
     
     def open_ng_settings(self):
+        from settings_dialog import SettingsDialog
         dialog = SettingsDialog(self)
         dialog.tab_widget.setCurrentIndex(2)
         if dialog.exec_():
@@ -795,6 +1024,7 @@ class MainWindow(QMainWindow):
     
     def send_post_request(self, thread_id, name, mail, comment):
         """エッヂに書き込みリクエストを送信"""
+        import requests
         url = "https://bbs.eddibb.cc/test/bbs.cgi"
         headers = {
             "User-Agent": "EdgeLiveViewer/1.0",
@@ -1012,6 +1242,11 @@ class MainWindow(QMainWindow):
                     break
         
         self.overlay_window.add_comment_batch(comments)
+
+        prearm_at = self.settings.get("next_thread_prearm_at", 950)
+        if comments and not self.is_past_thread and 0 < prearm_at <= comments[-1]["number"] and (
+                self.prearmed_thread is None or self.prearmed_thread["source_thread_id"] != self.current_thread_id):
+            self.prearm_next_thread()
         
         # リアルタイムモードの場合のみ、テーブルに逐次追加
         if not self.is_past_thread:
@@ -1067,45 +1302,241 @@ class MainWindow(QMainWindow):
                 self.handle_post_error(response, name, mail, comment)
     
     def start_thread_fetcher_initial(self):
-        if self.thread_fetcher is not None:
-            self.thread_fetcher.stop()
-        
-        sort_by = self.sort_combo.currentData()
-        self.thread_fetcher = ThreadFetcher(sort_by=sort_by)
-        self.thread_fetcher.threads_fetched.connect(self.update_thread_list)
-        self.thread_fetcher.error_occurred.connect(self.show_error)
-        self.thread_fetcher.start()
+        self.subject_index.start()
+        # 自動更新は SubjectIndex に30秒間隔の取得を申告して行う（申告と同時に1回取得する）
+        if self.auto_refresh_check.isChecked():
+            self.subject_index.request_interval("thread_list", 30.0)
+        else:
+            self.subject_index.refresh()
         logger.info("スレッド一覧の取得を開始しました")
+
+    def on_subject_updated(self, threads):
+        self.update_thread_list(sort_threads(threads, self.sort_combo.currentData()))
+        if not startup_profile.has_mark("first_thread_list"):
+            startup_profile.mark("first_thread_list")
+            startup_profile.report()
+
+    def on_subject_threads_added(self, threads):
+        # 接続中のスレッドの次スレが一覧に現れたら、レス数を待たずに準備する
+        self.prearm_next_thread(new_threads=threads)
+
+    def prearm_next_thread(self, new_threads=None):
+        """接続中のスレッドの次スレを先に見つけて並行監視に加え、1000レス到達時の切り替えを待ち時間なしにする
+
+        new_threads を渡した場合は、次スレがその中にあるときだけ準備する。
+        次スレが見つかるまでは SubjectIndex に短い間隔での取得を頼み、見つかるかスレッドを切り替えたら取り下げる。
+        """
+        if self.is_past_thread or self.current_thread_id is None or self.is_thread_finished:
+            return
+        if self.thread_connector is not None:
+            return  # 切り替え中は current_thread_id が切り替え前のスレッドを指している
+        if not self.settings.get("auto_next_thread", True) or self.settings.get("next_thread_prearm_at", 950) <= 0:
+            return
+        if new_threads is None and "prearm" not in self.subject_index.demands:
+            # 申告は1回だけ行う（request_interval はそのたびに取得を起こすため、レスの受信ごとには呼ばない）
+            self.subject_index.request_interval("prearm", 10.0)
+        next_thread = select_next_thread_in(self.current_thread_id, self.current_thread_title, self.subject_index.threads())
+        if not next_thread:
+            return
+        if new_threads is not None and next_thread["id"] not in {thread["id"] for thread in new_threads}:
+            return
+        if self.prearmed_thread is not None and self.prearmed_thread["id"] == next_thread["id"]:
+            return
+
+        # 前の準備を片付ける。次スレが見つかったので短い間隔での取得の申告もここで取り下げる
+        self.disarm_next_thread()
+        self.prearmed_thread = {"id": next_thread["id"], "title": next_thread["title"],
+                                "source_thread_id": self.current_thread_id}
+        scheduler = self.ensure_poll_scheduler()
+        from board_engine import PRIORITY_WARM
+        if not scheduler.is_subscribed(next_thread["id"]):
+            # 切り替えまでは流さず、切り替えた時点で準備を始めてからのレスをまとめて流す
+            scheduler.subscribe(
+                next_thread["id"], next_thread["title"],
+                interval=self.settings["update_interval"],
+                priority=PRIORITY_WARM,
+                use_range=self.settings.get("use_range_requests", True),
+                notify=False
+            )
+        logger.info(f"次スレを先に準備しました: {next_thread['title']} (ID: {next_thread['id']})")
+        self.statusBar().showMessage(f"次スレ {next_thread['title']} を準備しています")
+
+    def disarm_next_thread(self, keep_thread_id=None):
+        """準備していた次スレの取得をやめる（keep_thread_id のスレッドは切り替え先なので購読を残す）"""
+        prearmed = self.prearmed_thread
+        self.prearmed_thread = None
+        self.subject_index.release_interval("prearm")
+        if prearmed is None or prearmed["id"] == keep_thread_id or prearmed["id"] in self.watched_threads:
+            return
+        if self.poll_scheduler is not None:
+            self.poll_scheduler.unsubscribe(prearmed["id"])
     
+    def ensure_board_engine(self):
+        if self.board_engine is None:
+            # aiohttp の読み込みに時間がかかるため、エンジンを初めて使うときに読み込む
+            from board_engine import BoardEngine
+            self.board_engine = BoardEngine()
+        return self.board_engine
+
+    def get_board_engine(self):
+        """設定で非同期エンジンが有効ならエンジンを返す（無効なら None で QThread 版を使う）"""
+        if not self.settings.get("async_engine", False):
+            return None
+        return self.ensure_board_engine()
+
+    def ensure_poll_scheduler(self):
+        """並行監視のスケジューラーを返す（初回のみ作成。非同期エンジンの設定に関わらず使う）"""
+        if self.poll_scheduler is None:
+            from board_engine import PollScheduler
+            self.poll_scheduler = PollScheduler(
+                self.ensure_board_engine(),
+                requests_per_second=self.settings.get("poll_budget_per_second", 4.0),
+                warm_interval=self.settings.get("warm_poll_interval", 10.0),
+                base_url=self.base_url,
+                parent=self
+            )
+            self.poll_scheduler.comments_fetched.connect(self.on_scheduled_comments)
+            self.poll_scheduler.thread_filled.connect(self.on_watched_thread_filled)
+            self.poll_scheduler.error_occurred.connect(self.show_error)
+            self.poll_scheduler.start()
+        return self.poll_scheduler
+
+    def watch_thread(self, thread_id, thread_title, poller=None):
+        """スレッドを並行監視に加える（接続中のスレッドは切り替え時に加わる）"""
+        self.watched_threads[thread_id] = thread_title
+        if thread_id == self.current_thread_id and not self.is_past_thread:
+            return
+        scheduler = self.ensure_poll_scheduler()
+        from board_engine import PRIORITY_ACTIVE, PRIORITY_WARM
+        scheduler.subscribe(
+            thread_id, thread_title,
+            interval=self.settings["update_interval"],
+            priority=PRIORITY_ACTIVE if thread_id in self.overlay_sources else PRIORITY_WARM,
+            poller=poller,
+            use_range=self.settings.get("use_range_requests", True)
+        )
+        self.statusBar().showMessage(f"スレッド {thread_title} を並行監視しています（{len(self.watched_threads)}件）")
+
+    def unwatch_thread(self, thread_id):
+        self.watched_threads.pop(thread_id, None)
+        self.overlay_sources.discard(thread_id)
+        if self.poll_scheduler is not None:
+            self.poll_scheduler.unsubscribe(thread_id)
+
+    def set_overlay_source(self, thread_id, enabled):
+        """並行監視中のスレッドのコメントをオーバーレイにも流すか切り替える"""
+        if enabled:
+            self.overlay_sources.add(thread_id)
+        else:
+            self.overlay_sources.discard(thread_id)
+        if self.poll_scheduler is not None:
+            from board_engine import PRIORITY_ACTIVE, PRIORITY_WARM
+            self.poll_scheduler.set_priority(thread_id, PRIORITY_ACTIVE if enabled else PRIORITY_WARM)
+
+    def take_watched_poller(self, thread_id):
+        """並行監視中のスレッドに切り替える際、取得済みの DatPoller と通知済みの位置 (cursor) を引き取る"""
+        if self.poll_scheduler is None or not self.poll_scheduler.is_subscribed(thread_id):
+            return None, None
+        return self.poll_scheduler.release(thread_id)
+
+    def on_scheduled_comments(self, thread_id, comments):
+        if thread_id in self.overlay_sources and thread_id != self.current_thread_id and self.overlay_window:
+            self.overlay_window.add_comment_batch(comments)
+
+    def on_watched_thread_filled(self, thread_id, thread_title):
+        logger.info(f"並行監視中のスレッド {thread_id} が埋まりました")
+        self.unwatch_thread(thread_id)
+        self.statusBar().showMessage(f"並行監視中のスレッド {thread_title} が1000レスに到達しました")
+
+    def show_thread_context_menu(self, pos):
+        row = self.thread_table.currentRow()
+        if row < 0:
+            return
+        thread_id = self.thread_table.item(row, 0).data(Qt.UserRole)
+        thread_title = self.thread_table.item(row, 0).text()
+
+        menu = QMenu(self)
+        if thread_id in self.watched_threads:
+            unwatch_action = menu.addAction("並行監視をやめる")
+            unwatch_action.triggered.connect(lambda: self.unwatch_thread(thread_id))
+            overlay_action = menu.addAction("オーバーレイにも流す")
+            overlay_action.setCheckable(True)
+            overlay_action.setChecked(thread_id in self.overlay_sources)
+            overlay_action.triggered.connect(lambda checked: self.set_overlay_source(thread_id, checked))
+        else:
+            watch_action = menu.addAction("並行して監視する")
+            watch_action.triggered.connect(lambda: self.watch_thread(thread_id, thread_title))
+        menu.exec_(self.thread_table.mapToGlobal(pos))
+
+
     def refresh_thread_list(self):
-        if self.thread_fetcher is not None:
-            self.thread_fetcher.stop()
-        
-        sort_by = self.sort_combo.currentData()
-        self.thread_fetcher = ThreadFetcher(sort_by=sort_by)
-        self.thread_fetcher.threads_fetched.connect(self.update_thread_list)
-        self.thread_fetcher.error_occurred.connect(self.show_error)
-        self.thread_fetcher.start()
+        # 一覧に変化があれば on_subject_updated で表示が更新される
+        self.subject_index.refresh()
         logger.info("スレッド一覧を更新しました")
     
-    def start_thread_fetcher(self, thread_id, thread_title, is_past_thread=False, start_number=None):
+    def start_thread_fetcher(self, thread_id, thread_title, is_past_thread=False, start_number=None,
+                             poller=None, initial_result=None):
+        self.start_deferred_services()
+        previous_fetcher = self.comment_fetcher
         if self.comment_fetcher and self.comment_fetcher.isRunning():
             self.comment_fetcher.stop()
+        if previous_fetcher is not None:
+            self.return_to_watch(previous_fetcher, thread_id)
+        # poller / initial_result は ThreadConnector が接続時に取得したもの
+        warm_poller = None
+        resume_number = None
+        if poller is None and not is_past_thread:
+            warm_poller, cursor = self.take_watched_poller(thread_id)
+            poller = warm_poller
+            if warm_poller is not None:
+                # 並行監視で通知済みの位置の次から流し、準備中に書き込まれたレスも取りこぼさない
+                resume_number = cursor + 1 if cursor is not None else None
+                cached_comments = list(warm_poller.parser.comments)
+        self.stop_past_log_player()
+        self.past_log_start_number = start_number
         
         playback_speed = self.settings.get("playback_speed", 1.0)
         comment_delay = self.settings.get("comment_delay", 0) if not is_past_thread else 0
-        self.comment_fetcher = CommentFetcher(
-            thread_id=thread_id,
-            thread_title=thread_title,
-            update_interval=self.settings["update_interval"],
-            is_past_thread=is_past_thread,
-            playback_speed=playback_speed,
-            comment_delay=comment_delay,
-            start_number=start_number,
-            parent=self
-        )
+        engine = self.get_board_engine()
+        if engine is not None and not is_past_thread:
+            # 過去ログの再生は CommentFetcher が担当する
+            from board_engine import AsyncCommentFetcher
+            self.comment_fetcher = AsyncCommentFetcher(
+                engine,
+                thread_id=thread_id,
+                thread_title=thread_title,
+                update_interval=self.settings["update_interval"],
+                use_range=self.settings.get("use_range_requests", True),
+                poller=poller,
+                archive=self.dat_archive,
+                initial_result=initial_result,
+                base_url=self.base_url,
+                start_number=resume_number,
+                parent=self
+            )
+        else:
+            self.comment_fetcher = CommentFetcher(
+                thread_id=thread_id,
+                thread_title=thread_title,
+                update_interval=self.settings["update_interval"],
+                is_past_thread=is_past_thread,
+                playback_speed=playback_speed,
+                comment_delay=comment_delay,
+                start_number=start_number if resume_number is None else resume_number,
+                use_range=self.settings.get("use_range_requests", True),
+                poller=poller,
+                playback=False,  # 過去ログの再生は PastLogPlayer が行う
+                archive=self.dat_archive,
+                initial_result=initial_result,
+                base_url=self.base_url,
+                parent=self
+            )
+        self.apply_adaptive_polling()
+        self.comment_fetcher.interval_changed.connect(self.on_poll_interval_changed)
         self.comment_fetcher.comments_fetched.connect(self.display_comments)
         self.comment_fetcher.all_comments_fetched.connect(self.display_all_comments)
+        if is_past_thread:
+            self.comment_fetcher.all_comments_fetched.connect(self.on_past_log_loaded)
         self.comment_fetcher.thread_filled.connect(self.handle_thread_filled)
         self.comment_fetcher.error_occurred.connect(self.show_error)
         self.comment_fetcher.thread_over_1000.connect(self.on_thread_over_1000)
@@ -1116,8 +1547,43 @@ class MainWindow(QMainWindow):
         self.current_thread_title = thread_title
         self.thread_title_label.setText(f"接続中のスレッド: {thread_title}")
         self.detail_table.setRowCount(0)  # 初期化
+        if warm_poller is not None:
+            # 並行監視で取得済みのコメントをすぐに表示する（resume_number 以降は取得処理が流す）
+            if resume_number is not None:
+                cached_comments = [c for c in cached_comments if c["number"] < resume_number]
+            self.fill_detail_table(cached_comments)
+            logger.info(f"並行監視中のスレッド {thread_id} に切り替えました（取得済み {warm_poller.parser.line_count}行）")
         logger.info(f"スレッド {thread_id} の監視を開始しました (タイトル: {thread_title}, 過去ログ: {is_past_thread})")
 
+    def return_to_watch(self, fetcher, next_thread_id):
+        """並行監視中のスレッドから離れる場合は、取得済みの状態ごとスケジューラーに戻す"""
+        fetcher_classes = (CommentFetcher,)
+        if self.board_engine is not None:
+            # 非同期版の取得処理はエンジンを起動した後にしか作られない
+            from board_engine import AsyncCommentFetcher
+            fetcher_classes += (AsyncCommentFetcher,)
+        if not isinstance(fetcher, fetcher_classes):
+            return
+        if not fetcher.is_past_thread and fetcher.thread_id != next_thread_id and fetcher.thread_id in self.watched_threads:
+            self.watch_thread(fetcher.thread_id, fetcher.thread_title, poller=fetcher.poller)
+
+    def apply_adaptive_polling(self):
+        """設定に従って CommentFetcher の適応ポーリングを切り替える"""
+        enabled = self.settings.get("adaptive_polling", False)
+        self.comment_fetcher.set_adaptive_polling(
+            enabled,
+            min_interval=self.settings.get("adaptive_min_interval", 0.5),
+            max_interval=self.settings.get("adaptive_max_interval", 10.0)
+        )
+        if self.overlay_window and not enabled:
+            self.overlay_window.set_update_interval(None)
+
+    def on_poll_interval_changed(self, interval):
+        """適応ポーリングで選ばれた取得間隔をコメントの流量計算に反映"""
+        if self.overlay_window:
+            self.overlay_window.set_update_interval(interval)
+        logger.debug(f"次回のコメント取得まで {interval:.2f}秒")
+
     def on_playback_finished(self):
         """再生終了時の処理"""
         self.statusBar().showMessage(f"スレッド {self.current_thread_id} の再生が終了しました")
@@ -1128,6 +1594,12 @@ class MainWindow(QMainWindow):
         if not self.is_past_thread:
             return  # 過去ログ以外では何もしない
         
+        self.fill_detail_table(comments)
+        logger.info(f"過去ログの全コメントを表示しました: {len(comments)}件")
+        self.statusBar().showMessage(f"過去ログ {self.current_thread_id} の全コメント（{len(comments)}件）を表示しました")
+
+    def fill_detail_table(self, comments):
+        """スレッド詳細画面をコメントのリストで置き換える"""
         self.detail_table.setRowCount(0)  # テーブルをクリア
         current_row_count = 0
         
@@ -1147,19 +1619,14 @@ class MainWindow(QMainWindow):
             self.detail_table.setItem(current_row_count, 3, QTableWidgetItem(comment["id"]))
             self.detail_table.setItem(current_row_count, 4, QTableWidgetItem(comment.get("date", "不明")))
             current_row_count += 1
-        
-        logger.info(f"過去ログの全コメントを表示しました: {len(comments)}件")
-        self.statusBar().showMessage(f"過去ログ {self.current_thread_id} の全コメント（{len(comments)}件）を表示しました")
     
     def change_sort_order(self):
-        if self.thread_fetcher is not None:
-            self.thread_fetcher.stop()
-        
         sort_by = self.sort_combo.currentData()
-        self.thread_fetcher = ThreadFetcher(sort_by=sort_by)
-        self.thread_fetcher.threads_fetched.connect(self.update_thread_list)
-        self.thread_fetcher.error_occurred.connect(self.show_error)
-        self.thread_fetcher.start()
+        # 並び替えは SubjectIndex が保持している一覧で行い、subject.txt は取り直さない
+        if self.subject_index.is_loaded():
+            self.update_thread_list(sort_threads(self.subject_index.threads(), sort_by))
+        else:
+            self.subject_index.refresh()
         logger.info(f"ソート順を {sort_by} に変更しました")
     
     def thread_selected(self):
@@ -1168,12 +1635,7 @@ class MainWindow(QMainWindow):
             thread_id = self.thread_table.item(selected_row, 0).data(Qt.UserRole)
             thread_title = self.thread_table.item(selected_row, 0).text()
             
-            if self.next_thread_finder is not None and self.next_thread_finder.isRunning():
-                self.next_thread_finder.stop()
-                self.next_thread_finder.wait(3000)  # 最大3秒待機
-                logger.info(f"次スレ検索を停止しました（スレッド一覧から選択: {thread_id}）")
-                self.next_thread_finder = None
-            
+            # 次スレ検索は connect_to_thread_by_id が停止する
             self.connect_to_thread_by_id(thread_id, thread_title)
             self.tab_widget.setCurrentIndex(1)  # スレッド詳細タブに切り替え
             logger.info(f"スレッド {thread_id} を選択し、スレッド詳細タブに切り替えました")
@@ -1220,48 +1682,84 @@ class MainWindow(QMainWindow):
         # スレッドに接続
         self.connect_to_thread_by_id(thread_id)
     
-    def connect_to_thread_by_id(self, thread_id, thread_title=None):
-
-
+    def connect_to_thread_by_id(self, thread_id, thread_title=None, start_number=None):
+        """スレッドへの接続を始める。存在確認などは ThreadConnector が行い、完了後に on_thread_connected が呼ばれる
+
+        GUI スレッドでは停止の要求と表示の片付けだけを行い、切り替え前の取得処理の終了は待たない。
+        start_number を指定すると、過去ログだった場合にそのレスから再生する。
+        """
+        # 接続処理に過去ログのアーカイブを渡すため、最初の描画より前でも作っておく
+        self.start_deferred_services()
+        if start_number is not None:
+            self.pending_start_numbers[thread_id] = start_number
+        else:
+            self.pending_start_numbers.pop(thread_id, None)
         # 新しいスレッドに接続するため、完走フラグをリセット
         self.is_thread_finished = False
-        
-        # ### 機能追加: 既存のウォッチャーを停止させる処理を追加 ###
-        if self.mainstream_watcher and self.mainstream_watcher.isRunning():
-            self.mainstream_watcher.stop()
-            self.mainstream_watcher.wait(3000)  # 最大3秒待機
+        # 準備済みの次スレに切り替える場合は、取得済みの DatPoller を引き継ぐため購読を残す
+        self.disarm_next_thread(keep_thread_id=thread_id)
+
+        # 停止を要求したものは接続処理の中で終了を待つ。その間に届いたシグナルは捨てる
+        retiring = []
+        if self.thread_connector is not None:
+            # 前の接続処理が停止させていたものも引き継ぎ、並行監視に戻せるようにする
+            retiring.append(self.thread_connector)
+            retiring.extend(self.thread_connector.retiring)
+            self.thread_connector = None
+        if self.mainstream_watcher is not None:
             logger.info("本流スレ監視を停止しました（新しいスレッド接続）")
+            retiring.append(self.mainstream_watcher)
             self.mainstream_watcher = None
-        
-        if self.next_thread_finder is not None and self.next_thread_finder.isRunning():
-            self.next_thread_finder.stop()
-            self.next_thread_finder.wait(3000)  # 最大3秒待機
+        if self.next_thread_finder is not None:
             logger.info(f"次スレ検索を停止しました（新しいスレッド接続: {thread_id}）")
+            retiring.append(self.next_thread_finder)
             self.next_thread_finder = None
-        
         if self.comment_fetcher is not None:
-            self.comment_fetcher.stop()
-            if not self.comment_fetcher.isFinished():
-                logger.warning(f"既存の CommentFetcher {self.current_thread_id} が終了していない可能性があります")
-        
+            retiring.append(self.comment_fetcher)
+            self.comment_fetcher = None
+        for task in retiring:
+            task.blockSignals(True)
+            if not isinstance(task, CommentFetcher):
+                # CommentFetcher.stop() は終了を待つため、接続処理の側で呼ぶ
+                task.stop()
+        self.stop_past_log_player()
+
         if self.overlay_window:
             self.overlay_window.comment_queue.clear()
             if self.overlay_window.flow_timer.isActive():
                 self.overlay_window.flow_timer.stop()
-        
-        if not self.check_thread_exists(thread_id):
-            self.show_error(f"スレッド {thread_id} は存在しません（.dat ファイルが見つかりません）。")
-            self.statusBar().showMessage(f"スレッド {thread_id} は存在しません")
-            return
-        
-        self.is_past_thread = False
-        if not thread_title:
-            thread_title = self.get_thread_title(thread_id)
-            if not thread_title:
-                thread_title = f"スレッド {thread_id} (過去ログ)"
-                self.is_past_thread = True
-                logger.info(f"スレッド {thread_id} は subject.txt にありません。過去ログとして接続します。")
-        
+            self.overlay_window.comments.clear()
+            self.overlay_window.row_usage.clear()
+
+        # 並行監視中のスレッドは取得済みの DatPoller を引き継ぐため、改めて dat を取得しない
+        watched = self.poll_scheduler is not None and self.poll_scheduler.is_subscribed(thread_id)
+        self.thread_connector = ThreadConnector(
+            thread_id,
+            thread_title,
+            subject_index=self.subject_index,
+            archive=self.dat_archive,
+            retiring=retiring,
+            prefetch=not watched,
+            use_range=self.settings.get("use_range_requests", True),
+            engine=self.get_board_engine(),
+            base_url=self.base_url,
+            parent=self
+        )
+        self.thread_connector.connected.connect(self.on_thread_connected)
+        self.thread_connector.connect_failed.connect(self.on_thread_connect_failed)
+        self.thread_connector.start()
+        self.statusBar().showMessage(f"スレッド {thread_id} に接続しています...")
+        logger.info(f"スレッド {thread_id} への接続処理を開始しました")
+
+    def on_thread_connected(self, result):
+        if self.sender() is not self.thread_connector:
+            return  # 後から始めた接続に置き換えられた
+        self.thread_connector = None
+        thread_id = result["thread_id"]
+        thread_title = result["title"]
+        self.is_past_thread = result["is_past_thread"]
+        start_number = self.pending_start_numbers.pop(thread_id, None)
+
         # スレッド切り替え時にmy_comment_numbersをリセット
         if self.overlay_window:
             self.overlay_window.reset_my_comments()
@@ -1273,6 +1771,8 @@ class MainWindow(QMainWindow):
         self.current_thread_id = thread_id
         self.current_thread_title = thread_title
         logger.info(f"スレッド接続 - ID: {thread_id}, タイトル: {thread_title}, 過去ログ: {self.is_past_thread}")
+        for task in result["retired"]:
+            self.return_to_watch(task, thread_id)
         
         if not self.overlay_window or not self.overlay_window.isVisible():
             self.overlay_window = CommentOverlayWindow(None)
@@ -1300,53 +1800,53 @@ class MainWindow(QMainWindow):
             self.overlay_window.show()
             logger.info(f"コメントオーバーレイウィンドウを開きました: x={overlay_x}, y={overlay_y}, width={overlay_width}, height={overlay_height}, is_maximized={self.overlay_window.is_maximized}")
         else:
-            self.overlay_window.comments.clear()
-            self.overlay_window.row_usage.clear()
             logger.info("既存のコメントオーバーレイウィンドウを再利用します")
         
-        self.start_thread_fetcher(thread_id, thread_title, is_past_thread=self.is_past_thread)
-        self.statusBar().showMessage(f"スレッド {thread_id} - {thread_title} に接続しました")
+        if start_number is not None and not self.is_past_thread:
+            start_number = None
+            message = f"スレッド {thread_id} は現行スレッドのため、最新のレスから表示します"
+        elif start_number is not None:
+            # 過去ログの取得後に on_past_log_loaded がこの番号から再生を始める
+            message = f"スレッド {thread_id} をレス {start_number} から再生します"
+        else:
+            message = f"スレッド {thread_id} - {thread_title} に接続しました"
+        self.start_thread_fetcher(thread_id, thread_title, is_past_thread=self.is_past_thread, start_number=start_number,
+                                  poller=result["poller"], initial_result=result["initial_result"])
+        self.statusBar().showMessage(message)
 
         # スレッド詳細タブに切り替え
         self.tab_widget.setCurrentIndex(1)
         logger.info(f"スレッド {thread_id} に接続し、スレッド詳細タブに切り替えました")
+
+    def on_thread_connect_failed(self, thread_id, message):
+        if self.sender() is not self.thread_connector:
+            return
+        self.thread_connector = None
+        self.pending_start_numbers.pop(thread_id, None)
+        self.show_error(message)
+        self.statusBar().showMessage(f"スレッド {thread_id} は存在しません")
     
-    def check_thread_exists(self, thread_id):
-        try:
-            url = f"https://bbs.eddibb.cc/liveedge/dat/{thread_id}.dat"
-            response = requests.get(url, timeout=5)
-            return response.status_code == 200
-        except:
-            return False
-    
-    def get_thread_title(self, thread_id):
-        try:
-            url = "https://bbs.eddibb.cc/liveedge/subject.txt"
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
-            
-            lines = response.text.splitlines()
-            for line in lines:
-                if not line:
-                    continue
-                thread_id_dat, title_res = line.split("<>", 1)
-                if thread_id_dat == f"{thread_id}.dat":
-                    title = title_res.split(" (")[0]
-                    logger.info(f"スレッドタイトル取得成功: {title}")
-                    return title
-            logger.warning(f"スレッド {thread_id} のタイトルが見つかりませんでした")
+    def create_dat_archive(self):
+        """設定で有効なら過去ログのアーカイブを開く"""
+        if not self.settings.get("use_dat_archive", True):
             return None
-        except Exception as e:
-            logger.error(f"スレッドタイトル取得に失敗しました: {str(e)}")
-            return None
-    
+        archive = DatArchive(max_bytes=int(self.settings.get("dat_archive_max_mb", 200) * 1024 * 1024))
+        archive.listeners.append(self.search_indexer.enqueue_dat)
+        return archive
+
     def handle_thread_filled(self, thread_id, thread_title):
         logger.info(f"スレッド {thread_id} が埋まりました。")
         
         # 1000レス到達を記録（再起動を防止）
         self.is_thread_finished = True
         
-        if self.settings.get("auto_next_thread", True):
+        prearmed = self.prearmed_thread
+        if self.settings.get("auto_next_thread", True) and prearmed is not None \
+                and prearmed["source_thread_id"] == thread_id:
+            # 先に取得を始めていた次スレへそのまま切り替える
+            logger.info(f"準備済みの次スレに切り替えます: {prearmed['title']}")
+            self.on_next_thread_found({"id": prearmed["id"], "title": prearmed["title"]})
+        elif self.settings.get("auto_next_thread", True):
             logger.info("次スレを検索します")
             search_duration = self.settings.get("next_thread_search_duration", 180)
             
@@ -1354,7 +1854,15 @@ class MainWindow(QMainWindow):
                 self.next_thread_finder.stop()
                 self.next_thread_finder.wait(3000)  # 最大3秒待機
             
-            self.next_thread_finder = NextThreadFinder(thread_id, thread_title, search_duration)
+            engine = self.get_board_engine()
+            if engine is not None:
+                from board_engine import AsyncNextThreadFinder
+                self.next_thread_finder = AsyncNextThreadFinder(engine, thread_id, thread_title, search_duration,
+                                                                subject_index=self.subject_index,
+                                                                base_url=self.base_url)
+            else:
+                self.next_thread_finder = NextThreadFinder(thread_id, thread_title, search_duration,
+                                                           subject_index=self.subject_index, base_url=self.base_url)
             self.next_thread_finder.next_thread_found.connect(self.on_next_thread_found)
             self.next_thread_finder.search_finished.connect(self.on_search_finished)
             self.next_thread_finder.start()
@@ -1390,13 +1898,23 @@ class MainWindow(QMainWindow):
                 self.mainstream_watcher.stop()
                 self.mainstream_watcher.wait(3000)  # 最大3秒待機
 
-            self.mainstream_watcher = MainstreamWatcher(
+            engine = self.get_board_engine()
+            if engine is None:
+                watcher_class = MainstreamWatcher
+            else:
+                from board_engine import AsyncMainstreamWatcher
+                watcher_class = AsyncMainstreamWatcher
+            watcher_args = () if engine is None else (engine,)
+            self.mainstream_watcher = watcher_class(
+                *watcher_args,
                 original_title=original_title_for_watcher,
                 original_thread_id=original_thread_id_for_watcher,
                 current_thread_id=next_thread_id,
                 watch_duration=watch_duration,
                 momentum_ratio=momentum_ratio,
                 grace_period=watch_delay, # ### `watch_delay` を `grace_period` として渡す ###
+                subject_index=self.subject_index,
+                base_url=self.base_url,
                 parent=self
             )
             self.mainstream_watcher.mainstream_thread_found.connect(self.on_mainstream_thread_found)
@@ -1445,6 +1963,7 @@ class MainWindow(QMainWindow):
         return int(part_match.group(1)) + 1 if part_match else 2
     
     def show_settings(self):
+        from settings_dialog import SettingsDialog
         dialog = SettingsDialog(self)
         if dialog.exec_():
             self.settings = dialog.get_settings()
@@ -1454,6 +1973,25 @@ class MainWindow(QMainWindow):
             
             if self.comment_fetcher is not None:
                 self.comment_fetcher.update_interval = self.settings["update_interval"]
+                self.apply_adaptive_polling()
+                if self.comment_fetcher.is_past_thread:
+                    self.comment_fetcher.set_playback_speed(self.settings.get("playback_speed", 1.0))
+
+            self.start_deferred_services()
+            if not self.settings["use_dat_archive"]:
+                self.dat_archive = None
+            elif self.dat_archive is None:
+                self.dat_archive = self.create_dat_archive()
+            else:
+                self.dat_archive.set_max_bytes(int(self.settings["dat_archive_max_mb"] * 1024 * 1024))
+
+            if self.past_log_player is not None:
+                self.past_log_player.set_speed(self.settings.get("playback_speed", 1.0))
+
+            self.subject_index.engine = self.get_board_engine()
+
+            if self.poll_scheduler is not None:
+                self.poll_scheduler.configure(self.settings["poll_budget_per_second"], self.settings["warm_poll_interval"])
             
             # 分離状態の書き込みウィジェットに透明度を反映
             if self.write_widget is not None and not self.is_docked:
@@ -1465,32 +2003,7 @@ class MainWindow(QMainWindow):
             print("現在の self.settings:", self.settings)
     
     def load_settings(self):
-        default_settings = {
-            "font_size": 31, "font_weight": 75, "font_shadow": 2, "font_color": "#FFFFFF", "font_family": "MS PGothic",
-            "font_shadow_directions": ["bottom-right"], "font_shadow_color": "#000000", "comment_speed": 6.0,
-            "comment_delay": 0, "display_position": "top", "max_comments": 80, "window_opacity": 0.8, "update_interval": 5,
-            "playback_speed": 1.0, "auto_next_thread": True, "next_thread_search_duration": 180, "first_launch": True,
-            "overlay_x": 100, "overlay_y": 100, "overlay_width": 600, "overlay_height": 800,
-            "hide_anchor_comments": False, "hide_url_comments": False, "spacing": 30, "ng_ids": [], "ng_names": [], "ng_texts": [],
-            "auth_token": None, "tinker_token": None, "hide_name_mail_on_detach": False, "display_images": True, "hide_image_urls": True,
-            # ### 機能追加: 本流スレ監視設定のデフォルト値を追加 ###
-            "watch_mainstream_thread": True,
-            "watch_duration": 60,
-            "watch_delay": 15,
-            "momentum_ratio": 1.5,
-        }
-        
-        try:
-            settings_file = os.path.expanduser("~/.edge_live_viewer/settings.json")
-            if os.path.exists(settings_file):
-                with open(settings_file, "r", encoding="utf-8") as f:
-                    loaded_settings = json.load(f)
-                for key, value in loaded_settings.items():
-                    if key in default_settings:
-                        default_settings[key] = value
-        except Exception as e:
-            logger.error(f"設定の読み込みに失敗しました: {str(e)}")
-        return default_settings
+        return load_settings()
     
     def save_window_position(self, x, y, width, height, is_maximized=None, normal_geometry=None):
         self.settings["overlay_x"] = x
@@ -1539,8 +2052,31 @@ class MainWindow(QMainWindow):
         self.statusBar().showMessage(f"エラー: {message[:50]}...")
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    # EXE 版では検索インデックスの再構築で起動する子プロセスもこの EXE を実行するため、
+    # 子プロセスとして起動された場合はここで処理を引き渡してアプリを起動しない
+    import multiprocessing
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="エッヂ実況ビュアー")
+    parser.add_argument("--headless", action="store_true", help="画面を使わず、新しいレスを JSONL で書き出す")
+    parser.add_argument("--thread", help="ヘッドレスモードで取得するスレッドのIDまたはURL")
+    parser.add_argument("--out", help="ヘッドレスモードの出力先（省略すると標準出力）")
+    parser.add_argument("--follow", action="store_true", help="ヘッドレスモードで1000レス到達後に次スレへ移る")
+    parser.add_argument("--from-number", type=int, help="ヘッドレスモードで接続時の既存レスをこの番号から書き出す")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="最初のスレッド一覧を表示するまでの段階ごとの時間を表示する")
+    args, qt_args = parser.parse_known_args()
+    startup_profile.enabled = args.profile_startup
+
+    if args.headless:
+        thread_match = re.search(r'(\d{10,})', args.thread or "")
+        if not thread_match:
+            parser.error("--headless には --thread でスレッドのIDまたはURLを指定してください")
+        from headless import run_headless
+        sys.exit(run_headless(thread_match.group(1), args.out, follow=args.follow, start_number=args.from_number))
+
+    app = QApplication(sys.argv[:1] + qt_args)
     app.setProperty("comment_time", time.time())
+    startup_profile.mark("qapplication")
     
     window = MainWindow()
     window.show()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+subject.txt の取得ごとのレス数からスレッドの直近の勢いを求める時系列ストア
+
+勢い（res_count / 経過時間）はスレ立てからの平均のため、止まった古いスレッドと
+伸びている新しいスレッドの順位を取り違える。ResCountSeries はスレッドごとに
+(取得時刻, レス数) を窓（1分・5分・15分）ごとの上限付きバッファに保持し、
+窓の始まりの直前の標本との差から1日あたりの勢いを求める。
+古い標本は追加のたびに左端から捨てるため、更新は償却 O(1)、勢いの取得は O(1)。
+
+初めて見たスレッドは (スレ立て時刻, 0) を最初の標本にするため、履歴がたまるまでは
+従来の平均の勢いと同じ値になる。
+"""
+
+import time
+import threading
+from collections import deque
+
+# 窓の長さ（秒）と、スレッドの辞書に書き込むキー
+WINDOWS = {60: 'momentum_1m', 300: 'momentum_5m', 900: 'momentum_15m'}
+# 本流判定や並べ替えに使う窓
+DECISION_WINDOW = 300
+# 窓ごとに保持する標本数の上限（subject.txt を毎秒取得しても15分窓が収まる）
+MAX_SAMPLES = 1024
+
+
+class ResCountSeries:
+    """1スレッド分の (時刻, レス数) の標本と、窓ごとの勢い"""
+
+    def __init__(self, windows=WINDOWS, max_samples=MAX_SAMPLES):
+        # 各バッファの先頭は「窓の始まり以前で最も新しい標本」（なければ最古の標本）
+        self.buffers = {window: deque(maxlen=max_samples) for window in windows}
+        self.latest = None
+
+    def add(self, timestamp, res_count):
+        sample = (timestamp, res_count)
+        if self.latest is not None and timestamp <= self.latest[0]:
+            return
+        self.latest = sample
+        for window, buffer in self.buffers.items():
+            buffer.append(sample)
+            start = timestamp - window
+            while len(buffer) >= 2 and buffer[1][0] <= start:
+                buffer.popleft()
+
+    def momentum(self, window):
+        """窓 window（秒）の1日あたりの勢い。標本が1つしかなければ None"""
+        buffer = self.buffers[window]
+        if self.latest is None or not buffer:
+            return None
+        base_time, base_count = buffer[0]
+        latest_time, latest_count = self.latest
+        if latest_time <= base_time:
+            return None
+        # 削除などでレス数が減った場合は勢いなしとして扱う
+        return max(0, int((latest_count - base_count) / (latest_time - base_time) * 86400))
+
+
+class MomentumTracker:
+    """subject.txt のスナップショットを受け取り、スレッドごとの ResCountSeries を保持する"""
+
+    def __init__(self, windows=WINDOWS, max_samples=MAX_SAMPLES):
+        self.windows = windows
+        self.max_samples = max_samples
+        self.series = {}  # thread_id -> ResCountSeries
+        self.lock = threading.Lock()
+
+    def observe(self, threads, now=None):
+        """スレッドID -> parse_subject_threads の辞書 を記録し、各辞書に窓ごとの勢いを書き込む
+
+        一覧から消えたスレッドの履歴は捨てる。
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            for thread_id in self.series.keys() - threads.keys():
+                del self.series[thread_id]
+            for thread_id, thread in threads.items():
+                series = self.series.get(thread_id)
+                if series is None:
+                    series = self.series[thread_id] = ResCountSeries(self.windows, self.max_samples)
+                    created_at = thread.get('timestamp', 0)
+                    if 0 < created_at < now:
+                        series.add(created_at, 0)
+                series.add(now, int(thread['res_count']))
+                for window, key in self.windows.items():
+                    thread[key] = series.momentum(window)
+
+    def momentum(self, thread_id, window=DECISION_WINDOW):
+        with self.lock:
+            series = self.series.get(str(thread_id))
+            return series.momentum(window) if series else None
+
+
+def recent_momentum(thread, window=DECISION_WINDOW):
+    """スレッドの辞書から直近の勢いを返す。記録がなければ None"""
+    return thread.get(WINDOWS[window])
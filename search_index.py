@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+アーカイブ済みスレッドの全文検索インデックス（SQLite FTS5）
+
+~/.edge_live_viewer/search.db にレスを保存し、本文は trigram トークナイザーの FTS5 で検索する。
+日本語は単語で区切れないため trigram を使う。3文字未満の語は FTS5 で引けないので LIKE で絞り込む。
+ID での検索は通常のインデックスで行う。
+
+書き込みは SearchIndexer（QThread）が1本の接続で順に処理する。DatArchive に保存された dat を
+その都度受け取って追加し、アーカイブ全体の再構築では dat の解析をプロセスプールで並列に行う。
+プロセスプールで動かす関数は、子プロセスが PyQt5 を読み込まずに済むよう dat_archive に置いている。
+"""
+
+import os
+import time
+import queue
+import sqlite3
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from dat_parser import parse_dat_content
+from dat_archive import parse_archive_file
+
+logger = logging.getLogger('SearchIndex')
+
+DEFAULT_INDEX_PATH = os.path.expanduser("~/.edge_live_viewer/search.db")
+TRIGRAM_MIN_LENGTH = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    title TEXT,
+    created_at REAL,
+    post_count INTEGER,
+    indexed_at REAL
+);
+CREATE TABLE IF NOT EXISTS posts (
+    rowid INTEGER PRIMARY KEY,
+    thread_id TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    post_id TEXT,
+    name TEXT,
+    date TEXT,
+    timestamp REAL,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS posts_thread ON posts (thread_id, number);
+CREATE INDEX IF NOT EXISTS posts_post_id ON posts (post_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(text, tokenize='trigram');
+"""
+
+
+class SearchIndex:
+    """検索インデックスへの接続。sqlite3 の接続はスレッドをまたげないため、使うスレッドで作成する"""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def is_indexed(self, thread_id):
+        return self.conn.execute("SELECT 1 FROM threads WHERE thread_id = ?", (str(thread_id),)).fetchone() is not None
+
+    def index_thread(self, thread_id, title, comments):
+        """スレッドのレスを登録する（登録済みなら置き換える）"""
+        thread_id = str(thread_id)
+        try:
+            created_at = float(thread_id)
+        except ValueError:
+            created_at = comments[0]['timestamp'] if comments and comments[0].get('timestamp') else None
+        with self.conn:
+            self._delete_thread(thread_id)
+            self.conn.execute(
+                "INSERT INTO threads (thread_id, title, created_at, post_count, indexed_at) VALUES (?, ?, ?, ?, ?)",
+                (thread_id, title, created_at, len(comments), time.time()))
+            for c in comments:
+                cursor = self.conn.execute(
+                    "INSERT INTO posts (thread_id, number, post_id, name, date, timestamp, text) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, c['number'], c['id'], c['name'], c['date'], c['timestamp'], c['text']))
+                self.conn.execute("INSERT INTO posts_fts (rowid, text) VALUES (?, ?)", (cursor.lastrowid, c['text']))
+
+    def _delete_thread(self, thread_id):
+        self.conn.execute("DELETE FROM posts_fts WHERE rowid IN (SELECT rowid FROM posts WHERE thread_id = ?)", (thread_id,))
+        self.conn.execute("DELETE FROM posts WHERE thread_id = ?", (thread_id,))
+        self.conn.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+
+    def search(self, text="", post_id="", since=None, limit=500):
+        """本文（空白区切りで AND）・ID・スレッド作成時刻の下限で検索し、新しいスレッドのレスから返す"""
+        conditions = []
+        params = []
+        fts_terms = []
+        for term in text.split():
+            if len(term) >= TRIGRAM_MIN_LENGTH:
+                fts_terms.append('"' + term.replace('"', '""') + '"')
+            else:
+                escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                conditions.append("p.text LIKE ? ESCAPE '\\'")
+                params.append(f"%{escaped}%")
+        if fts_terms:
+            conditions.append("p.rowid IN (SELECT rowid FROM posts_fts WHERE posts_fts MATCH ?)")
+            params.append(" AND ".join(fts_terms))
+        if post_id:
+            conditions.append("p.post_id = ?")
+            params.append(post_id)
+        if since is not None:
+            conditions.append("t.created_at >= ?")
+            params.append(since)
+        if not conditions:
+            return []
+        sql = ("SELECT p.thread_id, t.title, p.number, p.post_id, p.name, p.date, p.timestamp, p.text "
+               "FROM posts p JOIN threads t ON t.thread_id = p.thread_id "
+               f"WHERE {' AND '.join(conditions)} "
+               "ORDER BY t.created_at DESC, p.number LIMIT ?")
+        params.append(limit)
+        return [{
+            'thread_id': row['thread_id'],
+            'title': row['title'],
+            'number': row['number'],
+            'id': row['post_id'],
+            'name': row['name'],
+            'date': row['date'],
+            'timestamp': row['timestamp'],
+            'text': row['text'],
+        } for row in self.conn.execute(sql, params)]
+
+
+class SearchIndexer(QThread):
+    """検索インデックスへの書き込みと検索を GUI スレッドの外で順に処理する"""
+    thread_indexed = pyqtSignal(str)
+    search_finished = pyqtSignal(list)
+    reindex_finished = pyqtSignal(int)
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, max_workers=None, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.max_workers = max_workers
+        self.tasks = queue.Queue()
+        self.running = True
+
+    def enqueue_dat(self, thread_id, content, encoding=None, title=""):
+        """dat を登録する（どのスレッドから呼んでもよい。DatArchive の保存通知に使う）"""
+        self.tasks.put(("dat", (str(thread_id), bytes(content), encoding, title)))
+
+    def request_search(self, text="", post_id="", since=None):
+        self.tasks.put(("search", (text, post_id, since)))
+
+    def request_reindex(self, archive):
+        """アーカイブ全体からインデックスを作り直す"""
+        self.tasks.put(("reindex", archive.entries()))
+
+    def run(self):
+        index = SearchIndex(self.path)
+        try:
+            while self.running:
+                try:
+                    kind, args = self.tasks.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if kind is None:
+                    break
+                try:
+                    if kind == "dat":
+                        thread_id, content, encoding, title = args
+                        index.index_thread(thread_id, title, parse_dat_content(content, encoding))
+                        logger.info(f"検索インデックスに登録しました: {thread_id}")
+                        self.thread_indexed.emit(thread_id)
+                    elif kind == "search":
+                        self.search_finished.emit(index.search(*args))
+                    elif kind == "reindex":
+                        self.reindex_finished.emit(self.reindex(index, args))
+                except Exception as e:
+                    logger.error(f"検索インデックスの処理に失敗しました: {str(e)}")
+                    self.error_occurred.emit(f"検索インデックスの処理に失敗しました: {str(e)}")
+        finally:
+            index.close()
+
+    def reindex(self, index, entries):
+        """dat の展開と解析をプロセスプールで並列に行い、書き込みはこのスレッドでまとめて行う"""
+        start_time = time.time()
+        count = 0
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            for thread_id, title, comments in executor.map(parse_archive_file, entries, chunksize=4):
+                if not self.running:
+                    break
+                if comments is None:
+                    logger.warning(f"アーカイブを読み込めなかったため再構築から除外しました: {thread_id}")
+                    continue
+                index.index_thread(thread_id, title, comments)
+                count += 1
+        logger.info(f"検索インデックスを再構築しました: {count}スレッド, 所要時間: {time.time() - start_time:.2f}秒")
+        return count
+
+    def stop(self):
+        self.running = False
+        self.tasks.put((None, None))
+        self.wait(3000)
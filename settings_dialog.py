@@ -36,6 +36,8 @@ class SettingsDialog(QDialog):
             "playback_speed": 1.0,
             "auto_next_thread": True,
             "next_thread_search_duration": 180,
+            "next_thread_prearm_at": 950,
+            "board_base_url": "",
             "hide_anchor_comments": False,
             "hide_url_comments": False,
             "spacing": 30,
@@ -49,7 +51,15 @@ class SettingsDialog(QDialog):
             # ### 機能追加: 本流スレ監視設定のデフォルト値を追加 ###
             "watch_mainstream_thread": True,
             "watch_duration": 60,
-            "momentum_ratio": 1.5
+            "momentum_ratio": 1.5,
+            "adaptive_polling": False,
+            "adaptive_min_interval": 0.5,
+            "adaptive_max_interval": 10.0,
+            "async_engine": False,
+            "poll_budget_per_second": 4.0,
+            "warm_poll_interval": 10.0,
+            "use_dat_archive": True,
+            "dat_archive_max_mb": 200
         }
         
         self.load_settings()
@@ -260,6 +270,58 @@ class SettingsDialog(QDialog):
         self.update_interval_slider.valueChanged.connect(self.update_interval_label_text)
         network_form.addRow("更新間隔:", self.update_interval_slider)
         network_form.addRow("", self.update_interval_label)
+
+        # 適応ポーリング: 流速に応じて取得間隔を自動調整
+        self.adaptive_polling_check = QCheckBox("スレッドの流速に応じて更新間隔を自動調整する")
+        self.adaptive_polling_check.setChecked(self.settings.get("adaptive_polling", False))
+        network_form.addRow("", self.adaptive_polling_check)
+
+        self.adaptive_min_interval_spin = QDoubleSpinBox()
+        self.adaptive_min_interval_spin.setRange(0.5, 10.0)
+        self.adaptive_min_interval_spin.setSingleStep(0.5)
+        self.adaptive_min_interval_spin.setValue(self.settings.get("adaptive_min_interval", 0.5))
+        self.adaptive_min_interval_spin.setSuffix("秒")
+        network_form.addRow("自動調整の最短間隔:", self.adaptive_min_interval_spin)
+
+        self.adaptive_max_interval_spin = QDoubleSpinBox()
+        self.adaptive_max_interval_spin.setRange(1.0, 60.0)
+        self.adaptive_max_interval_spin.setSingleStep(1.0)
+        self.adaptive_max_interval_spin.setValue(self.settings.get("adaptive_max_interval", 10.0))
+        self.adaptive_max_interval_spin.setSuffix("秒")
+        network_form.addRow("自動調整の最長間隔:", self.adaptive_max_interval_spin)
+
+        self.async_engine_check = QCheckBox("非同期エンジンで取得する（監視数が多くてもスレッド1本で動作）")
+        self.async_engine_check.setChecked(self.settings.get("async_engine", False))
+        network_form.addRow("", self.async_engine_check)
+
+        self.poll_budget_spin = QDoubleSpinBox()
+        self.poll_budget_spin.setRange(0.5, 20.0)
+        self.poll_budget_spin.setSingleStep(0.5)
+        self.poll_budget_spin.setValue(self.settings.get("poll_budget_per_second", 4.0))
+        self.poll_budget_spin.setSuffix("回/秒")
+        network_form.addRow("並行監視のリクエスト上限:", self.poll_budget_spin)
+
+        self.warm_poll_interval_spin = QDoubleSpinBox()
+        self.warm_poll_interval_spin.setRange(1.0, 120.0)
+        self.warm_poll_interval_spin.setSingleStep(1.0)
+        self.warm_poll_interval_spin.setValue(self.settings.get("warm_poll_interval", 10.0))
+        self.warm_poll_interval_spin.setSuffix("秒")
+        network_form.addRow("並行監視の取得間隔:", self.warm_poll_interval_spin)
+
+        self.board_base_url_input = QLineEdit(self.settings.get("board_base_url", ""))
+        self.board_base_url_input.setPlaceholderText("https://bbs.eddibb.cc/liveedge（リレー経由なら http://ホスト:8765）")
+        network_form.addRow("板のURL（再起動後に反映）:", self.board_base_url_input)
+
+        self.use_dat_archive_check = QCheckBox("完結したスレッドを圧縮して保存し、過去ログをオフラインでも再生する")
+        self.use_dat_archive_check.setChecked(self.settings.get("use_dat_archive", True))
+        network_form.addRow("", self.use_dat_archive_check)
+
+        self.dat_archive_max_spin = QSpinBox()
+        self.dat_archive_max_spin.setRange(10, 10000)
+        self.dat_archive_max_spin.setSingleStep(10)
+        self.dat_archive_max_spin.setValue(self.settings.get("dat_archive_max_mb", 200))
+        self.dat_archive_max_spin.setSuffix("MB")
+        network_form.addRow("過去ログ保存の上限:", self.dat_archive_max_spin)
         
         self.auto_next_thread_check = QCheckBox("自動的に次スレを検出する")
         self.auto_next_thread_check.setChecked(self.settings["auto_next_thread"])
@@ -271,6 +333,14 @@ class SettingsDialog(QDialog):
         self.next_thread_search_duration_spin.setSuffix("秒")
         network_form.addRow("次スレ検索時間:", self.next_thread_search_duration_spin)
 
+        self.next_thread_prearm_spin = QSpinBox()
+        self.next_thread_prearm_spin.setRange(0, 999)
+        self.next_thread_prearm_spin.setSingleStep(10)
+        self.next_thread_prearm_spin.setSpecialValueText("無効")
+        self.next_thread_prearm_spin.setValue(self.settings.get("next_thread_prearm_at", 950))
+        self.next_thread_prearm_spin.setSuffix("レス")
+        network_form.addRow("次スレの事前準備:", self.next_thread_prearm_spin)
+
         # 通信設定タブ内の network_form に追加
         self.comment_delay_spin = QSpinBox()
         self.comment_delay_spin.setRange(0, 300)  # 0～300秒
@@ -318,8 +388,9 @@ class SettingsDialog(QDialog):
         playback_form = QFormLayout()
         
         self.playback_speed_combo = QComboBox()
-        # 新しい選択肢: 1.0～2.0 を 0.05刻みで生成
+        # 1.0～2.0 は 0.05刻み、それ以上は早送り用の倍率
         speed_options = [round(1.0 + i * 0.05, 2) for i in range(21)]  # [1.0, 1.05, ..., 2.0]
+        speed_options += [2.5, 3.0, 4.0, 6.0, 8.0, 12.0, 16.0]
         for speed in speed_options:
             self.playback_speed_combo.addItem(f"{speed}倍速", speed)
         # 現在の設定値を選択
@@ -530,9 +601,19 @@ class SettingsDialog(QDialog):
         self.settings["comment_delay"] = self.comment_delay_spin.value()
         self.settings["window_opacity"] = self.window_opacity_slider.value() / 100.0
         self.settings["update_interval"] = self.update_interval_slider.value()
+        self.settings["adaptive_polling"] = self.adaptive_polling_check.isChecked()
+        self.settings["adaptive_min_interval"] = self.adaptive_min_interval_spin.value()
+        self.settings["adaptive_max_interval"] = max(self.adaptive_min_interval_spin.value(), self.adaptive_max_interval_spin.value())
+        self.settings["async_engine"] = self.async_engine_check.isChecked()
+        self.settings["poll_budget_per_second"] = self.poll_budget_spin.value()
+        self.settings["warm_poll_interval"] = self.warm_poll_interval_spin.value()
+        self.settings["board_base_url"] = self.board_base_url_input.text().strip().rstrip("/")
+        self.settings["use_dat_archive"] = self.use_dat_archive_check.isChecked()
+        self.settings["dat_archive_max_mb"] = self.dat_archive_max_spin.value()
         self.settings["playback_speed"] = self.playback_speed_combo.currentData()
         self.settings["auto_next_thread"] = self.auto_next_thread_check.isChecked()
         self.settings["next_thread_search_duration"] = self.next_thread_search_duration_spin.value()
+        self.settings["next_thread_prearm_at"] = self.next_thread_prearm_spin.value()
         self.settings["font_shadow_color"] = self.font_shadow_color_button.text()
         self.settings["hide_anchor_comments"] = self.hide_anchor_checkbox.isChecked()
         self.settings["hide_url_comments"] = self.hide_url_checkbox.isChecked()
@@ -590,10 +671,14 @@ class SettingsDialog(QDialog):
                 "comment_speed": 6, "comment_delay": 0, "display_position": "center",
                 "max_comments": 80, "window_opacity": 0.8, "update_interval": 5,
                 "playback_speed": 1.0, "auto_next_thread": True, "next_thread_search_duration": 180,
+                "next_thread_prearm_at": 950, "board_base_url": "",
                 "hide_anchor_comments": False, "hide_url_comments": False, "spacing": 30,
                 "ng_ids": [], "ng_names": [], "ng_texts": [], "display_images": True,
                 # ### 機能追加: 本流スレ監視設定をリセット ###
-                "watch_mainstream_thread": True, "watch_duration": 60, "watch_delay": 15, "momentum_ratio": 1.5
+                "watch_mainstream_thread": True, "watch_duration": 60, "watch_delay": 15, "momentum_ratio": 1.5,
+                "adaptive_polling": False, "adaptive_min_interval": 0.5, "adaptive_max_interval": 10.0,
+                "async_engine": False, "poll_budget_per_second": 4.0, "warm_poll_interval": 10.0,
+                "use_dat_archive": True, "dat_archive_max_mb": 200
             }
             self.font_size_slider.setValue(self.settings["font_size"])
             self.font_weight_slider.setValue(self.settings["font_weight"])  # 修正: スライダーにリセット
@@ -611,6 +696,15 @@ class SettingsDialog(QDialog):
             self.max_comments_spin.setValue(self.settings["max_comments"])
             self.window_opacity_slider.setValue(int(self.settings["window_opacity"] * 100))
             self.update_interval_slider.setValue(self.settings["update_interval"])
+            self.adaptive_polling_check.setChecked(self.settings["adaptive_polling"])
+            self.adaptive_min_interval_spin.setValue(self.settings["adaptive_min_interval"])
+            self.adaptive_max_interval_spin.setValue(self.settings["adaptive_max_interval"])
+            self.async_engine_check.setChecked(self.settings["async_engine"])
+            self.poll_budget_spin.setValue(self.settings["poll_budget_per_second"])
+            self.warm_poll_interval_spin.setValue(self.settings["warm_poll_interval"])
+            self.board_base_url_input.setText(self.settings["board_base_url"])
+            self.use_dat_archive_check.setChecked(self.settings["use_dat_archive"])
+            self.dat_archive_max_spin.setValue(self.settings["dat_archive_max_mb"])
             index = 1
             for i in range(self.playback_speed_combo.count()):
                 if abs(self.playback_speed_combo.itemData(i) - self.settings["playback_speed"]) < 0.01:
@@ -619,6 +713,7 @@ class SettingsDialog(QDialog):
             self.playback_speed_combo.setCurrentIndex(index)
             self.auto_next_thread_check.setChecked(self.settings["auto_next_thread"])
             self.next_thread_search_duration_spin.setValue(self.settings["next_thread_search_duration"])
+            self.next_thread_prearm_spin.setValue(self.settings["next_thread_prearm_at"])
             index = self.font_family_combo.findData(self.settings["font_family"])
             if index >= 0:
                 self.font_family_combo.setCurrentIndex(index)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+起動にかかった時間を段階ごとに記録する（python main.py --profile-startup で表示する）
+
+main.py の先頭で読み込み、そこを起点に各段階の終わりで mark() を呼ぶ。記録するのは
+モジュールの読み込み・設定の読み込み・画面の構築・最初の描画・最初のスレッド一覧の表示。
+記録自体は常に行い（時刻を取るだけ）、表示は enabled のときだけ行う。
+Python インタプリタ自体の起動時間（EXE の展開を含む）は起点より前なので含まれない。
+"""
+
+import sys
+import time
+import logging
+
+logger = logging.getLogger('StartupProfile')
+
+
+class StartupProfile:
+    """起点からの経過時間を段階ごとに記録する"""
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.started_at = clock()
+        self.marks = []  # (段階名, 時刻)
+        self.enabled = False
+        self.reported = False
+
+    def mark(self, phase):
+        """phase の段階が終わった時刻を記録する（同じ段階は最初の1回だけ）"""
+        if all(name != phase for name, _ in self.marks):
+            self.marks.append((phase, self.clock()))
+
+    def has_mark(self, phase):
+        return any(name == phase for name, _ in self.marks)
+
+    def phases(self):
+        """[(段階名, その段階にかかったミリ秒, 起点からのミリ秒)]"""
+        result = []
+        previous = self.started_at
+        for name, at in self.marks:
+            result.append((name, (at - previous) * 1000, (at - self.started_at) * 1000))
+            previous = at
+        return result
+
+    def report(self, out=None):
+        """記録した段階を表にして out（省略時は標準エラー出力）に書き出す。表示は1回だけ"""
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        out = out or sys.stderr
+        out.write("起動プロファイル（起点: main.py の読み込み開始）\n")
+        for name, elapsed, total in self.phases():
+            out.write(f"  {name:<16} {elapsed:9.1f} ms  (累計 {total:9.1f} ms)\n")
+        out.flush()
+
+
+# main.py から使う、プロセスで1つの記録
+startup_profile = StartupProfile()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+subject.txt を1か所で取得・保持する SubjectIndex
+
+スレッド一覧・次スレ検索・本流監視・タイトル解決がそれぞれ subject.txt を取得していたのをまとめ、
+解析済みの一覧をスレッドIDごとの辞書で保持する。取得間隔は利用者が request_interval() で
+申告した間隔のうち最も短いものになり、申告がなければ refresh() で頼まれたときだけ取得する。
+
+一覧が変わると新規スレッド・レス数の変化・落ちたスレッドの差分をシグナルで通知する。
+取得のたびにレス数を MomentumTracker に記録し、各スレッドに直近の勢い（momentum_1m など）を付ける。
+QThread や BoardEngine 上の利用者は updated_since() / wait_for_update() で最新の一覧を受け取る。
+"""
+
+import time
+import logging
+import threading
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from board_core import BASE_URL, SUBJECT_ENCODING, ValidatorCache, decode_response, parse_subject_threads
+from momentum_series import MomentumTracker
+
+logger = logging.getLogger('SubjectIndex')
+
+
+def diff_subject(old, new):
+    """スレッドIDをキーにした新旧の一覧を比べ、(新規, レス数が変わったもの, 落ちたもの) を返す
+
+    レス数が変わったものには変化前のレス数を 'previous_res_count' として付ける。
+    """
+    added = [thread for thread_id, thread in new.items() if thread_id not in old]
+    changed = [dict(thread, previous_res_count=old[thread_id]['res_count'])
+               for thread_id, thread in new.items()
+               if thread_id in old and old[thread_id]['res_count'] != thread['res_count']]
+    dropped = [thread for thread_id, thread in old.items() if thread_id not in new]
+    return added, changed, dropped
+
+
+class SubjectIndex(QThread):
+    """subject.txt の取得を一本化し、解析済みの一覧と差分を配る"""
+    threads_updated = pyqtSignal(list)     # 一覧が変わったときの全スレッド（subject.txt の順）
+    threads_added = pyqtSignal(list)
+    res_counts_changed = pyqtSignal(list)
+    threads_dropped = pyqtSignal(list)
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, base_url=BASE_URL, engine=None, parent=None):
+        super().__init__(parent)
+        self.url = f"{base_url}/subject.txt"
+        self.validators = ValidatorCache()
+        # BoardEngine を設定するとそのセッションで取得する（None なら requests）
+        self.engine = engine
+        self.entries = {}  # thread_id -> parse_subject_threads の辞書
+        self.version = 0   # 一覧が変わるたびに増える（0 は未取得）
+        self.updated_at = 0
+        self.momentum = MomentumTracker()
+        self.demands = {}  # 利用者 -> 希望する取得間隔（秒）
+        self.refresh_requested = False
+        self.condition = threading.Condition()
+        self.fetch_lock = threading.Lock()
+        self.running = True
+
+    @property
+    def not_modified_count(self):
+        return self.validators.not_modified_count
+
+    def request_interval(self, owner, interval):
+        """owner が interval 秒ごとの更新を必要としていることを登録する（すぐに1回取得する）"""
+        with self.condition:
+            self.demands[owner] = interval
+            self.refresh_requested = True
+            self.condition.notify_all()
+
+    def release_interval(self, owner):
+        with self.condition:
+            self.demands.pop(owner, None)
+            self.condition.notify_all()
+
+    def refresh(self):
+        """次の周期を待たずに取得する"""
+        with self.condition:
+            self.refresh_requested = True
+            self.condition.notify_all()
+
+    def interval(self):
+        with self.condition:
+            return min(self.demands.values()) if self.demands else None
+
+    def is_loaded(self):
+        return self.version > 0
+
+    def threads(self):
+        """最新の一覧のコピー（呼び出し側が書き換えても索引には影響しない）"""
+        with self.condition:
+            return [dict(thread) for thread in self.entries.values()]
+
+    def get(self, thread_id):
+        with self.condition:
+            thread = self.entries.get(str(thread_id))
+            return dict(thread) if thread else None
+
+    def title(self, thread_id):
+        thread = self.get(thread_id)
+        return thread['title'] if thread else None
+
+    def __contains__(self, thread_id):
+        with self.condition:
+            return str(thread_id) in self.entries
+
+    def updated_since(self, version):
+        """version より新しい一覧があれば (一覧, 現在の version)、なければ None"""
+        with self.condition:
+            if self.version <= max(version, 0):
+                return None
+            return [dict(thread) for thread in self.entries.values()], self.version
+
+    def wait_for_update(self, version, timeout=None):
+        """version より新しい一覧ができるまで最大 timeout 秒待つ（QThread の利用者向け）"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.version > max(version, 0) or not self.running, timeout)
+        return self.updated_since(version)
+
+    def run(self):
+        last_fetch = 0
+        while self.running:
+            with self.condition:
+                while self.running and not self.refresh_requested:
+                    interval = min(self.demands.values()) if self.demands else None
+                    if interval is None:
+                        self.condition.wait()
+                        continue
+                    remaining = last_fetch + interval - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                if not self.running:
+                    break
+                self.refresh_requested = False
+            last_fetch = time.monotonic()
+            try:
+                self.fetch()
+            except Exception as e:
+                logger.error(f"subject.txt の取得に失敗しました: {str(e)}")
+                self.error_occurred.emit(f"スレッド一覧の取得に失敗しました: {str(e)}")
+
+    def fetch(self, timeout=5):
+        """subject.txt を条件付きGETで取得して一覧を更新する。一覧が変わったら True
+
+        通常は run() から呼ばれるが、タイトル解決のように結果をすぐに必要とする場合は
+        呼び出し元のスレッドから直接呼んでもよい。
+        """
+        with self.fetch_lock:
+            engine = self.engine
+            if engine is not None and engine.is_running():
+                future = engine.submit(engine.conditional_get(self.validators, self.url, timeout=timeout))
+                response, not_modified = future.result(timeout + 1)
+            else:
+                response, not_modified = self.validators.get(self.url, timeout=timeout)
+            if not_modified:
+                # レス数が変わっていないことも直近の勢いの標本になる
+                with self.condition:
+                    self.momentum.observe(self.entries)
+                logger.debug(f"subject.txt に変更はありません（304, 累計{self.not_modified_count}回）")
+                return False
+            response.raise_for_status()
+            new_entries = {thread['id']: thread for thread in parse_subject_threads(decode_response(response, SUBJECT_ENCODING))}
+            self.momentum.observe(new_entries)
+
+            with self.condition:
+                added, changed, dropped = diff_subject(self.entries, new_entries)
+                # 勢いは取得時刻で変わるため、差分がなくても一覧は差し替える
+                self.entries = new_entries
+                self.updated_at = time.time()
+                if not (added or changed or dropped) and self.version > 0:
+                    return False
+                self.version += 1
+                threads = [dict(thread) for thread in new_entries.values()]
+                self.condition.notify_all()
+
+        logger.info(f"subject.txt を更新しました: {len(threads)}件（新規{len(added)}, レス数変化{len(changed)}, 落ち{len(dropped)}）")
+        if added:
+            self.threads_added.emit(added)
+        if changed:
+            self.res_counts_changed.emit(changed)
+        if dropped:
+            self.threads_dropped.emit(dropped)
+        self.threads_updated.emit(threads)
+        return True
+
+    def stop(self):
+        logger.info("SubjectIndex の停止をリクエスト")
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.wait(3000)
@@ -1,122 +1,95 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import re
+"""
+板の取得処理を QThread・QObject で動かし、結果を pyqtSignal で通知するクラス群
+
+subject.txt・dat の取得と解析、次スレ・本流の判定などの処理そのものは board_core にあり、
+ここでは GUI スレッドの外で動かしてシグナルに変換する。board_core の名前はこれまでどおりここからも読み込める。
+起動を速くするため requests は直接読み込まず、board_core の http_get / HttpClient が最初の取得時に読み込む。
+"""
+
 import time
 import logging
-import html
-from datetime import datetime
-import requests
 from concurrent.futures import ThreadPoolExecutor
-from PyQt5.QtCore import QThread, pyqtSignal
-import difflib  # 類似度計算のために追加
+
+from PyQt5.QtCore import Qt, QObject, QThread, QTimer, pyqtSignal
+
+from board_core import (
+    BASE_URL, MIN_PLAYBACK_SPEED, http_get, HttpClient, MAX_PLAYBACK_SPEED, ValidatorCache, parse_subject_line, parse_subject_threads,
+    extract_last_number, select_next_thread, select_next_thread_in, parse_subject_basic_info,
+    filter_mainstream_candidates, first_post_timestamp, thread_created_at, first_post_request_headers,
+    format_momentum, momentum_value, sort_threads, find_mainstream_thread, check_mainstream,
+    fetch_subject_basic_info, search_next_thread, IncrementalDatParser, AdaptivePollInterval, PlaybackTimeline,
+    DatPoller, SUBJECT_ENCODING, DAT_ENCODING, decode_response,
+)
+from momentum_series import recent_momentum
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('ThreadFetcher')
 
-class ThreadFetcher(QThread):
-    threads_fetched = pyqtSignal(list)
-    error_occurred = pyqtSignal(str)
-    
-    def __init__(self, parent=None, sort_by="momentum"):
-        super().__init__(parent)
-        self.running = True
-        self.sort_by = sort_by
-        self.base_url = "https://bbs.eddibb.cc/liveedge"
-        
-    def run(self):
-        try:
-            logger.info(f"スレッド一覧の取得を開始します（ソート順: {self.sort_by}）")
-            start_time = time.time()
-            threads = self.fetch_threads()
-            logger.info(f"取得したスレッド数: {len(threads)}, 所要時間: {time.time() - start_time:.2f}秒")
-            if self.sort_by == "momentum":
-                # 修正: 'momentum'キーは既に数値なので、int()変換は不要
-                threads.sort(key=lambda x: x.get('momentum', 0), reverse=True)
-                logger.info("勢い順にソートしました")
-            elif self.sort_by == "date":
-                threads.sort(key=lambda x: x.get('timestamp', 0), reverse=True)
-                logger.info("新着順にソートしました")
-            self.threads_fetched.emit(threads)
-            logger.info("スレッド一覧を送信しました")
-        except Exception as e:
-            logger.error(f"スレッド一覧の取得に失敗しました: {str(e)}")
-            self.error_occurred.emit(f"スレッド一覧の取得に失敗しました: {str(e)}")
-    
-    # 削除: このメソッドは不要になりました
-    # def fetch_dat(self, thread_id):
-    #     ...
+class PastLogPlayer(QObject):
+    """取得済みの過去ログを GUI スレッドのタイマーで再生する
 
-    def fetch_threads(self):
-        subject_url = f"{self.base_url}/subject.txt"
-        subject_response = requests.get(subject_url, timeout=5) # タイムアウトを少し延長
-        subject_response.raise_for_status()
-        
-        subject_lines = subject_response.text.splitlines()
-        threads = []
-        
-        current_timestamp = time.time()
+    過去ログは PlaybackTimeline として保持し続けるため、シーク・一時停止・再開・速度変更は
+    dat を取り直さずメモリ上の操作だけで行える。シグナルは CommentFetcher と同じ名前にしてある。
+    """
+    comments_fetched = pyqtSignal(list)
+    playback_finished = pyqtSignal()
 
-        for line in subject_lines:
-            if not line:
-                continue
-            try:
-                thread_id_dat, title_res = line.split("<>", 1)
-                thread_id = thread_id_dat.replace(".dat", "")
-                
-                title_res_match = re.search(r'(.*)\s*\((\d+)\)$', title_res)
-                if not title_res_match:
-                    continue
-                
-                title = html.unescape(title_res_match.group(1).strip())
-                res_count_str = title_res_match.group(2)
-                res_count = int(res_count_str)
-                
-                # --- ここからが修正箇所 ---
-                
-                # 1. スレッドIDをUNIXタイムスタンプとして直接利用
-                timestamp = int(thread_id)
-                
-                # 2. タイムスタンプから表示用の日付文字列を生成
-                dt_object = datetime.fromtimestamp(timestamp)
-                date_str = dt_object.strftime('%Y/%m/%d %H:%M:%S')
-                
-                # 3. 勢いを計算
-                time_diff = current_timestamp - timestamp
-                momentum = 0
-                if time_diff > 0:
-                    momentum = int(res_count / time_diff * 86400)
-
-                threads.append({
-                    'id': thread_id,
-                    'title': title,
-                    'res_count': res_count_str,
-                    'timestamp': timestamp,
-                    'date': date_str,
-                    # 修正: 勢いは数値で保持し、表示時にカンマ区切りにする
-                    'momentum': momentum
-                })
-                # --- 修正ここまで ---
+    def __init__(self, thread_id, comments, playback_speed=1.0, frame_interval=1 / 60, parent=None):
+        super().__init__(parent)
+        self.thread_id = thread_id
+        self.frame_interval = frame_interval
+        self.timeline = PlaybackTimeline(comments, max(MIN_PLAYBACK_SPEED, min(MAX_PLAYBACK_SPEED, playback_speed)))
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+
+    def play(self, start_number=None):
+        """start_number（省略時は先頭）から再生を始める"""
+        self.timeline.pause()
+        self.timeline.seek_number(start_number or 0)
+        self.resume()
+
+    def seek(self, number):
+        self.timeline.seek_number(number)
+        if not self.timeline.is_paused():
+            self.tick()
+
+    def pause(self):
+        self.timer.stop()
+        self.timeline.pause()
+
+    def resume(self):
+        if self.timeline.is_paused():
+            self.timeline.resume()
+        self.tick()
+
+    def is_paused(self):
+        return self.timeline.is_paused()
+
+    def set_speed(self, speed):
+        self.timeline.set_speed(max(MIN_PLAYBACK_SPEED, min(MAX_PLAYBACK_SPEED, speed)))
+        if not self.timeline.is_paused():
+            self.tick()
 
-            except Exception as e:
-                logger.warning(f"subject.txt の解析に失敗しました: {str(e)} - Line: {line}")
-                continue
-        
-        logger.info(f"subject.txt から取得したスレッド数: {len(threads)}")
-        
-        # 削除: ThreadPoolExecutorを使った個別datファイルの取得処理はすべて不要
-        # with ThreadPoolExecutor(max_workers=200) as executor:
-        #     ...
-        
-        return threads
-    
     def stop(self):
-        logger.info("ThreadFetcher の停止をリクエスト")
-        self.running = False
-        
-from datetime import datetime
-import time
-import re
+        self.pause()
+
+    def tick(self):
+        """期限を迎えたコメントをまとめて通知し、次の期限（最短1フレーム後）にタイマーを設定する"""
+        self.timer.stop()
+        batch = self.timeline.pop_due()
+        if batch:
+            self.comments_fetched.emit(batch)
+        wait = self.timeline.time_until_next()
+        if wait is None:
+            self.timeline.pause()
+            self.playback_finished.emit()
+            return
+        self.timer.start(int(max(wait, self.frame_interval) * 1000))
 
 class CommentFetcher(QThread):
     comments_fetched = pyqtSignal(list)
@@ -125,38 +98,34 @@ class CommentFetcher(QThread):
     error_occurred = pyqtSignal(str)
     thread_over_1000 = pyqtSignal(str)
     playback_finished = pyqtSignal()  # 新しいシグナルを追加
+    interval_changed = pyqtSignal(float)  # 適応ポーリング時の次回取得までの間隔（秒）
     
-    def __init__(self, thread_id, thread_title="", update_interval=0.5, is_past_thread=False, playback_speed=1.0, comment_delay=0, start_number=None, parent=None):
+    def __init__(self, thread_id, thread_title="", update_interval=0.5, is_past_thread=False, playback_speed=1.0, comment_delay=0, start_number=None, use_range=True, poller=None, playback=True, archive=None, initial_result=None, base_url=BASE_URL, parent=None):
         super().__init__(parent)
         self.thread_id = thread_id
         self.thread_title = thread_title
         self.update_interval = update_interval
         self.is_past_thread = is_past_thread
-        self.playback_speed = max(1.0, min(2.0, playback_speed))
+        self.playback_speed = max(MIN_PLAYBACK_SPEED, min(MAX_PLAYBACK_SPEED, playback_speed))
+        self.frame_interval = 1 / 60  # 過去ログ再生でまとめて通知する単位（秒）
         self.comment_delay = comment_delay  # 修正: 引数として追加し、正しく代入
         self.start_number = start_number  # 開始位置を追加
+        self.use_range = use_range  # Range リクエストで差分のみ取得するか
+        self.playback = playback  # False なら過去ログは取得して all_comments_fetched を送るだけ（再生は PastLogPlayer）
+        self.archive = archive  # DatArchive。過去ログはまずここから読み、完結した dat を保存する
         self.running = True
         self.last_res_index = -1
         self.max_retries = 3
         self.retry_delay = 2
         self.is_first_fetch = True
-        logger.info(f"CommentFetcher 初期化: thread_id={thread_id}, playback_speed={self.playback_speed}, comment_delay={self.comment_delay}")
-
-    def parse_datetime(self, date_str):
-        """投稿日時文字列をdatetimeオブジェクトに変換（日本語曜日対応）"""
-        try:
-            match = re.match(r'(\d{4}/\d{2}/\d{2}\(\S+\) \d{2}:\d{2}:\d{2}\.\d+)', date_str)
-            if not match:
-                logger.warning(f"日時形式が不正: {date_str}")
-                return None
-            date_part = match.group(1)
-            base, millis = date_part.rsplit('.', 1)
-            millis = millis.ljust(6, '0')
-            normalized_date = re.sub(r'\(\S+\)', '', f"{base}.{millis}")
-            return datetime.strptime(normalized_date, "%Y/%m/%d %H:%M:%S.%f")
-        except ValueError as e:
-            logger.warning(f"日時解析に失敗: {date_str}, エラー: {str(e)}")
-            return None
+        self.poll_interval = None  # AdaptivePollInterval（適応ポーリング時のみ）
+        # 並行監視で取得済みの DatPoller を渡された場合は、その続きから差分だけを取得する
+        self.poller = poller or DatPoller(thread_id, use_range=use_range, base_url=base_url)
+        self.parser = self.poller.parser
+        self.validators = self.poller.validators
+        # ThreadConnector が接続時に取得した最初の poll 結果（あれば1回目の取得の代わりに使う）
+        self.initial_result = initial_result
+        logger.info(f"CommentFetcher 初期化: thread_id={thread_id}, playback_speed={self.playback_speed}, comment_delay={self.comment_delay}, use_range={self.use_range}")
     
     def safe_sleep(self, duration):
         """中断可能なスリープ"""
@@ -167,77 +136,79 @@ class CommentFetcher(QThread):
         while elapsed < adjusted_duration and self.running:
             time.sleep(min(step, adjusted_duration - elapsed))
             elapsed += step
+
+    @property
+    def not_modified_count(self):
+        return self.validators.not_modified_count
+
+    def set_adaptive_polling(self, enabled, min_interval=0.5, max_interval=10.0):
+        """適応ポーリングの有効/無効を切り替える。無効時は update_interval 固定で取得する"""
+        if enabled:
+            self.poll_interval = AdaptivePollInterval(min_interval, max_interval, initial_interval=self.update_interval)
+        else:
+            self.poll_interval = None
+        logger.info(f"CommentFetcher {self.thread_id} 適応ポーリング: {enabled} ({min_interval}〜{max_interval}秒)")
+
+    def next_poll_interval(self, new_comments):
+        """今回の取得結果から次回の取得までの間隔を決め、適応ポーリング時は通知する"""
+        if self.poll_interval is None:
+            return self.update_interval
+        interval = self.poll_interval.observe(new_comments)
+        self.interval_changed.emit(interval)
+        return interval
+
+    def http_get(self, url, headers):
+        return http_get(url, headers, timeout=5)
+
+    def poll_dat(self):
+        """datを取得し、前回以降に追記されたコメントだけを解析して返す。戻り値: (新しいコメントのリスト, 再同期したか)
+
+        過去ログはアーカイブにあればそこから読み、なければ取得後にアーカイブする。
+        接続時に取得済みの結果を渡されていれば、1回目はそれを返す。
+        """
+        if self.initial_result is not None:
+            result, self.initial_result = self.initial_result, None
+            if self.is_past_thread:
+                self.archive_dat()
+            return result
+        if self.is_past_thread and self.archive is not None and not self.parser.data:
+            archived = self.archive.get(self.thread_id)
+            if archived:
+                content, encoding = archived
+                self.parser.encoding = encoding
+                return self.parser.feed_full(content)[0], False
+        result = self.poller.poll(self.http_get)
+        if self.is_past_thread:
+            self.archive_dat()
+        return result
+
+    def archive_dat(self):
+        """完結した dat（過去ログ・1000レス到達）をアーカイブに保存する"""
+        if self.archive is not None and self.parser.data:
+            self.archive.put(self.thread_id, self.parser.data, self.parser.encoding, self.thread_title)
     
     def run(self):
         retry_count = 0
         
         while self.running:
             try:
-                url = f"https://bbs.eddibb.cc/liveedge/dat/{self.thread_id}.dat"
-                response = requests.get(url, timeout=5)
-                response.raise_for_status()
-                
-                lines = response.text.split('\n')
-                new_comments = []
-                
-                # 全コメントをパース
-                for i in range(len(lines)):
-                    line = lines[i]
-                    if not line.strip():
-                        continue
-                    
-                    parts = line.split('<>')
-                    if len(parts) >= 4:
-                        name = parts[0]
-                        date_id = parts[2]
-                        text = parts[3]
-                        
-                        id_match = re.search(r'ID:([^ ]+)', date_id)
-                        user_id = id_match.group(1) if id_match else ""
-                        
-                        date_match = re.search(r'(\d{4}/\d{2}/\d{2}\(\S+\) \d{2}:\d{2}:\d{2}\.\d+)', date_id)
-                        date = date_match.group(1) if date_match else date_id
-                        
-                        text = text.replace('<br>', ' ')
-                        text = re.sub(r'<.*?>', '', text)
-                        text = re.sub(r'!metadent:.*?$', '', text, flags=re.MULTILINE)
-                        text = html.unescape(text)
-                        
-                        comment = {
-                            'number': i + 1,
-                            'name': name,
-                            'date': date,
-                            'id': user_id,
-                            'text': text,
-                            'timestamp': self.parse_datetime(date)
-                        }
-                        new_comments.append(comment)
+                new_comments, resynced = self.poll_dat()
+                if resynced:
+                    logger.info(f"再同期しました: {self.thread_id}, 行数={self.parser.line_count}")
                 
                 # 過去ログの場合
                 if self.is_past_thread and self.is_first_fetch:
                     # 全コメントを即座に送信（スレッド詳細画面用）
                     self.all_comments_fetched.emit(new_comments)
+                    if not self.playback:
+                        break
                     
                     # 再生開始位置を決定
                     start_index = max(0, (self.start_number - 1) if self.start_number else 0)
                     playback_comments = new_comments[start_index:]  # start_number以降のコメント
                     
                     # 時間差再生
-                    if playback_comments:
-                        base_time = playback_comments[0]['timestamp']
-                        if not base_time:
-                            self.comments_fetched.emit(playback_comments)
-                        else:
-                            prev_time = base_time
-                            for comment in playback_comments:
-                                if not self.running:
-                                    break
-                                time_diff = (comment['timestamp'] - prev_time).total_seconds()
-                                if time_diff > 0:
-                                    self.safe_sleep(time_diff)
-                                if self.running:
-                                    self.comments_fetched.emit([comment])
-                                    prev_time = comment['timestamp']
+                    self.play_timeline(PlaybackTimeline(playback_comments, self.playback_speed))
                     
                     # 再生終了後にシグナルを発行してループを終了
                     self.playback_finished.emit()
@@ -245,8 +216,18 @@ class CommentFetcher(QThread):
                 
                 else:
                     # リアルタイムモードまたは2回目以降
-                    start_index = self.last_res_index + 1 if not self.is_first_fetch else max(0, len(lines) - 5)
+                    if not self.is_first_fetch:
+                        start_index = self.last_res_index + 1
+                    elif self.start_number:
+                        # 開始番号の指定があれば、接続時点の既存レスもその番号から通知する。
+                        # 並行監視から引き継いだ DatPoller では、今回より前に解析済みのレスも含めて選ぶ
+                        start_index = self.start_number - 1
+                        new_comments = self.parser.comments
+                    else:
+                        start_index = max(0, self.parser.line_count - 4)
                     batch_comments = [c for c in new_comments if c['number'] > start_index]
+                    # コメントを流す間隔の計算に使われるため、次回の取得間隔をコメントより先に通知する
+                    interval = self.next_poll_interval(batch_comments)
                     if batch_comments:
                         # 遅延処理を削除し、取得後すぐに通知する
                         self.comments_fetched.emit(batch_comments)
@@ -257,14 +238,15 @@ class CommentFetcher(QThread):
                     self.is_first_fetch = False
                 
                 # 1000レス到達チェック
-                if len(lines) >= 1000 and not self.is_past_thread:
+                if self.parser.line_count >= 1000 and not self.is_past_thread:
+                    self.archive_dat()
                     self.thread_filled.emit(self.thread_id, self.thread_title)
                     self.thread_over_1000.emit(f"スレッド： {self.thread_title} が1000レスに到達しました。")
                     break
                 
-                self.safe_sleep(self.update_interval)
+                self.safe_sleep(interval)
                 
-            except requests.exceptions.RequestException as e:
+            except OSError as e:  # requests の通信エラーを含む
                 retry_count += 1
                 logger.warning(f"コメント取得失敗 ({retry_count}/{self.max_retries}): {str(e)}")
                 if retry_count >= self.max_retries:
@@ -275,6 +257,26 @@ class CommentFetcher(QThread):
                 self.error_occurred.emit(f"コメントの取得に失敗しました: {str(e)}")
                 self.safe_sleep(self.update_interval)
     
+    def play_timeline(self, timeline):
+        """タイムラインに沿ってコメントを流す。1フレーム内に期限を迎えたコメントは1回で通知する"""
+        timeline.start()
+        while self.running and not timeline.finished():
+            if timeline.speed != self.playback_speed:
+                # 再生中の速度変更は現在位置を保ったまま反映する
+                timeline.set_speed(self.playback_speed)
+            batch = timeline.pop_due()
+            if batch:
+                self.comments_fetched.emit(batch)
+            wait = timeline.time_until_next()
+            if wait is None:
+                break
+            # 期限が近くても1フレームは待ち、その間に期限を迎えたものをまとめる。停止要求には0.1秒以内に応じる
+            time.sleep(min(max(wait, self.frame_interval), 0.1))
+
+    def set_playback_speed(self, speed):
+        """再生速度を変更する（再生中でもよい）"""
+        self.playback_speed = max(MIN_PLAYBACK_SPEED, min(MAX_PLAYBACK_SPEED, speed))
+
     def stop(self):
         self.running = False
         logger.info(f"CommentFetcher {self.thread_id} の停止をリクエスト")
@@ -290,151 +292,197 @@ class CommentFetcher(QThread):
             logger.info(f"CommentFetcher {self.thread_id} を正常に停止しました")
 
 
+class ThreadConnector(QThread):
+    """スレッドへの接続準備を GUI スレッドの外で行う
+
+    存在確認・タイトル解決・最初の dat 取得を行い、その間に切り替え前の取得処理（retiring）を並行して停止する。
+    存在確認のために取得した dat は DatPoller に解析させ、CommentFetcher の最初の取得結果として引き渡す。
+    prefetch=False（並行監視中のスレッドなど）では dat を取得せず、存在するものとして扱う。
+    """
+    connected = pyqtSignal(dict)  # thread_id, title, is_past_thread, poller, initial_result, retired
+    connect_failed = pyqtSignal(str, str)  # thread_id, メッセージ
+
+    def __init__(self, thread_id, thread_title=None, subject_index=None, archive=None, retiring=(),
+                 prefetch=True, use_range=True, engine=None, base_url=BASE_URL, parent=None):
+        super().__init__(parent)
+        self.thread_id = thread_id
+        self.thread_title = thread_title
+        self.subject_index = subject_index
+        self.archive = archive
+        self.retiring = list(retiring)  # stop() / wait() を持つ停止対象（CommentFetcher やウォッチャー）
+        self.prefetch = prefetch
+        self.use_range = use_range
+        self.engine = engine
+        self.base_url = base_url
+        self.running = True
+
+    def run(self):
+        with ThreadPoolExecutor(max_workers=max(1, len(self.retiring))) as executor:
+            teardown = [executor.submit(self.retire, task) for task in self.retiring]
+            try:
+                result, error = self.resolve()
+            except Exception as e:
+                result, error = None, f"スレッド {self.thread_id} への接続に失敗しました: {str(e)}"
+            # 切り替え前の DatPoller を並行監視に戻せるよう、停止を見届けてから通知する
+            for future in teardown:
+                future.result()
+        if not self.running:
+            return
+        if result is None:
+            self.connect_failed.emit(self.thread_id, error)
+        else:
+            result["retired"] = self.retiring
+            self.connected.emit(result)
+
+    def retire(self, task):
+        try:
+            task.stop()
+            task.wait(3000)
+        except Exception as e:
+            logger.warning(f"{type(task).__name__} の停止に失敗しました: {str(e)}")
+
+    def resolve(self):
+        """接続に必要な情報をまとめる。戻り値は (結果の辞書, エラーメッセージ) のどちらかが None"""
+        thread_id = self.thread_id
+        thread_title = self.thread_title
+        is_past_thread = False
+        if not thread_title:
+            thread_title = self.lookup_title()
+            if not thread_title:
+                thread_title = f"スレッド {thread_id} (過去ログ)"
+                is_past_thread = True
+                logger.info(f"スレッド {thread_id} は subject.txt にありません。過去ログとして接続します。")
+
+        # アーカイブ済みの過去ログはオフラインでも開けるよう、取得せずに CommentFetcher に任せる
+        archived = self.archive is not None and thread_id in self.archive
+        poller = None
+        initial_result = None
+        if self.prefetch and not (is_past_thread and archived):
+            listed = self.subject_index is not None and thread_id in self.subject_index
+            poller = DatPoller(thread_id, use_range=self.use_range, base_url=self.base_url)
+            try:
+                initial_result = self.fetch_first(poller)
+            except OSError as e:  # requests の通信エラーを含む
+                if not (listed or archived):
+                    return None, f"スレッド {thread_id} は存在しません（.dat ファイルが見つかりません）。"
+                # 一覧にはあるので、取得は CommentFetcher のリトライに任せる
+                logger.warning(f"接続時の dat 取得に失敗しました: {thread_id}: {str(e)}")
+                poller = None
+
+        return {
+            "thread_id": thread_id,
+            "title": thread_title,
+            "is_past_thread": is_past_thread,
+            "poller": poller,
+            "initial_result": initial_result,
+        }, None
+
+    def lookup_title(self):
+        if self.subject_index is None:
+            return None
+        title = self.subject_index.title(self.thread_id)
+        if not title:
+            # 立ったばかりのスレッドかもしれないため、一覧を取り直してから判断する
+            try:
+                self.subject_index.fetch()
+            except Exception as e:
+                logger.error(f"スレッドタイトル取得に失敗しました: {str(e)}")
+                return None
+            title = self.subject_index.title(self.thread_id)
+        if title:
+            logger.info(f"スレッドタイトル取得成功: {title}")
+        else:
+            logger.warning(f"スレッド {self.thread_id} のタイトルが見つかりませんでした")
+        return title
+
+    def fetch_first(self, poller, timeout=5):
+        """dat 全体を取得して poller に解析させ、poll() と同じ形の結果を返す"""
+        engine = self.engine
+        if engine is not None and engine.is_running():
+            return engine.submit(engine.poll_dat(poller, timeout=timeout)).result(timeout + 1)
+        return poller.poll(lambda url, headers: http_get(url, headers, timeout=timeout))
+
+    def stop(self):
+        logger.info(f"ThreadConnector {self.thread_id} の停止をリクエスト")
+        self.running = False
+
+
 class NextThreadFinder(QThread):
     next_thread_found = pyqtSignal(dict)
     search_finished = pyqtSignal(bool)
     
-    def __init__(self, thread_id, thread_title, search_duration=180, parent=None):
+    def __init__(self, thread_id, thread_title, search_duration=180, subject_index=None, base_url=BASE_URL, parent=None):
         super().__init__(parent)
         self.thread_id = thread_id
         self.thread_title = thread_title
         self.search_duration = search_duration
         self.running = True
+        self.base_url = base_url
+        self.validators = ValidatorCache()
+        # SubjectIndex を渡すと subject.txt を自分では取得せず、索引の更新を待って判定する
+        self.subject_index = subject_index
+
+    @property
+    def not_modified_count(self):
+        return self.validators.not_modified_count
         
     def run(self):
-        start_time = time.time()
-        
-        while self.running and (time.time() - start_time) < self.search_duration:
-            try:
-                next_thread = self.find_next_thread()
-                if next_thread:
+        if self.subject_index is not None:
+            self.run_with_index()
+            return
+
+        next_thread = search_next_thread(self.thread_id, self.thread_title, self.fetch_threads, self.search_duration,
+                                         should_stop=lambda: not self.running)
+        if next_thread and self.running:
+            logger.info(f"次スレを発見しました: {next_thread['title']} (ID: {next_thread['id']})")
+            self.next_thread_found.emit(next_thread)
+            self.search_finished.emit(True)
+            return
+
+        if self.running:
+            logger.info(f"次スレが見つかりませんでした: {self.thread_title}")
+            self.search_finished.emit(False)
+    
+    def run_with_index(self):
+        """SubjectIndex に3秒間隔の取得を頼み、一覧が更新されるたびに判定する"""
+        index = self.subject_index
+        index.request_interval(self, 3.0)
+        deadline = time.time() + self.search_duration
+        version = -1  # 取得済みの一覧があればまずそれで判定する
+        try:
+            while self.running and time.time() < deadline:
+                update = index.wait_for_update(version, timeout=min(1.0, max(0, deadline - time.time())))
+                if update is None:
+                    continue
+                threads, version = update
+                next_thread = select_next_thread_in(self.thread_id, self.thread_title, threads)
+                if next_thread and self.running:
                     logger.info(f"次スレを発見しました: {next_thread['title']} (ID: {next_thread['id']})")
                     self.next_thread_found.emit(next_thread)
                     self.search_finished.emit(True)
                     return
-                logger.info("次スレが見つからなかったため、3秒後に再試行します")
-                time.sleep(3)
-            except Exception as e:
-                logger.error(f"次スレ検索中にエラーが発生しました: {str(e)}")
-                time.sleep(3)  # エラー時も継続
-        
+        finally:
+            index.release_interval(self)
+
         if self.running:
             logger.info(f"次スレが見つかりませんでした: {self.thread_title}")
             self.search_finished.emit(False)
-    
+
+    def fetch_threads(self):
+        """subject.txt を条件付きGETで取得する。変更がなければ None"""
+        return fetch_subject_basic_info(self.validators, self.base_url)
+
     def find_next_thread(self):
         """次スレを検索するロジック（●→通常ルール→反省会ルールの順で検索）"""
         try:
-            url = "https://bbs.eddibb.cc/liveedge/subject.txt"
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
-            
-            lines = response.text.splitlines()
-            
-            starts_with_mark = self.thread_title.startswith('●')
-            logger.info(f"現在のスレッド: {self.thread_title}, 前スレが「●」で始まるか: {starts_with_mark}")
-            
-            # ★★★ 変更点1: 最初にすべての候補をレス数付きでリストアップする ★★★
-            all_candidates = []
-            for line in lines:
-                if not line: continue
-                try:
-                    thread_id_dat, title_res = line.split("<>", 1)
-                    
-                    title_res_match = re.search(r'(.*)\s*\((\d+)\)$', title_res)
-                    if not title_res_match: continue
-                    
-                    thread_id = thread_id_dat.replace(".dat", "")
-                    title = html.unescape(title_res_match.group(1).strip())
-                    res_count = int(title_res_match.group(2))
-                    
-                    if thread_id == self.thread_id: continue
-
-                    # 1000レス未満の候補のみをリストに追加する
-                    if res_count < 1000:
-                        all_candidates.append({
-                            "id": thread_id,
-                            "title": title,
-                            "res_count": res_count
-                        })
-                except Exception as e:
-                    logger.warning(f"subject.txtの行解析エラー: {line}, {e}")
-
-            if not all_candidates:
-                logger.info("1000レス未満の次スレ候補が見つかりませんでした")
+            threads = self.fetch_threads()
+            if threads is None:
+                # subject.txt が前回から変わっていなければ判定結果も変わらない
+                logger.info("subject.txt に変更はありません（304）")
                 return None
-            logger.info(f"次スレ候補を{len(all_candidates)}件に絞り込みました（1000レス未満のスレッドのみ）")
-
-            # --- ここから下のロジックは、絞り込まれた `all_candidates` に対して実行 ---
-            
-            if starts_with_mark:
-                # ●ルール: 絞り込まれた候補の中で、最もID(時刻)が新しいものを選択
-                mark_candidates = [c for c in all_candidates if c['title'].startswith('●')]
-                if mark_candidates:
-                    best_candidate = max(mark_candidates, key=lambda c: int(c['id']))
-                    logger.info(f"次スレを発見しました（●ルール）: {best_candidate['title']} (ID: {best_candidate['id']})")
-                    return best_candidate # 辞書のキーを合わせて返す
-            
-            # 通常ルール
-            else:
-                # ★★★ 変更点2: 候補リストに類似度や番号情報を追加していく ★★★
-                candidates_with_info = []
-                for candidate in all_candidates:
-                    similarity = difflib.SequenceMatcher(None, self.thread_title, candidate['title']).ratio()
-                    if similarity >= 0.3:
-                        next_number, _ = self.extract_last_number(candidate['title'])
-                        candidate['similarity'] = similarity
-                        candidate['number'] = next_number
-                        candidate['is_star'] = bool(re.search(r'★(\d+)$', candidate['title']))
-                        candidates_with_info.append(candidate)
-                
-                current_number, has_number = self.extract_last_number(self.thread_title)
-                
-                if has_number:
-                    LOWER_BOUND_OFFSET = 2
-                    UPPER_BOUND_OFFSET = 3
-                    start_num = max(1, int(current_number) - LOWER_BOUND_OFFSET)
-                    end_num = int(current_number) + UPPER_BOUND_OFFSET
-                    expected_numbers = list(range(start_num, end_num + 1))
-                else:
-                    expected_numbers = [1, 2]
-
-                valid_candidates = []
-                for candidate in candidates_with_info:
-                    next_num = candidate["number"]
-                    if next_num in expected_numbers or \
-                       (candidate["is_star"] and next_num in [1, 2]) or \
-                       (not has_number and next_num == 2 and re.search(r'(★2|Part\.2|Part2)', candidate["title"])):
-                        valid_candidates.append(candidate)
-                
-                if valid_candidates:
-                    best_candidate = max(valid_candidates, key=lambda c: c["similarity"])
-                    logger.info(f"次スレを発見しました（通常ルール）: {best_candidate['title']} (ID: {best_candidate['id']}, 類似度: {best_candidate['similarity']:.2f})")
-                    return {"id": best_candidate["id"], "title": best_candidate["title"]}
-
-            # 反省会ルール (フォールバック)
-            logger.info("通常の次スレが見つからなかったため、『反省会』スレッドのフォールバック検索を実行します。")
-            
-            reflection_candidates = []
-            # all_candidatesではなく、情報が付与されたcandidates_with_infoを使う
-            for candidate in candidates_with_info: 
-                if "反省会" in candidate["title"]:
-                    if candidate.get("similarity", 0) >= 0.6: # 類似度情報がなければ0として扱う
-                        reflection_candidates.append(candidate)
-                        logger.debug(f"反省会候補: {candidate['title']} (類似度: {candidate.get('similarity', 0):.2f})")
-
-            if reflection_candidates:
-                best_reflection_candidate = max(reflection_candidates, key=lambda c: c.get('similarity', 0))
-                logger.info(f"次スレを発見しました（反省会ルール）: {best_reflection_candidate['title']}")
-                return {
-                    "id": best_reflection_candidate["id"],
-                    "title": best_reflection_candidate["title"]
-                }
-            
-            logger.info("すべての検索ルールで次スレを見つけることができませんでした。")
-            return None
+            return select_next_thread_in(self.thread_id, self.thread_title, threads)
         
-        except requests.RequestException as e:
+        except OSError as e:
             logger.error(f"subject.txt の取得に失敗しました: {str(e)}")
             return None
         except Exception as e:
@@ -442,24 +490,7 @@ class NextThreadFinder(QThread):
             return None
     
     def extract_last_number(self, title):
-        """タイトルから末尾に最も近いスレッド進行に関連する数字を抽出"""
-        # 「★数字」「Part.数字」「Part数字」を優先的に検索
-        star_match = re.search(r'★(\d+)$', title)
-        part_dot_match = re.search(r'Part\.(\d+)$', title)
-        part_match = re.search(r'Part(\d+)$', title)
-        
-        if star_match:
-            return float(star_match.group(1)), True
-        elif part_dot_match:
-            return float(part_dot_match.group(1)), True
-        elif part_match:
-            return float(part_match.group(1)), True
-        
-        # 上記がない場合、最後の数字を返す
-        number_match = re.findall(r'(\d*\.\d+|\d+)', title)
-        if number_match:
-            return float(number_match[-1]), True
-        return 0, False  # 数字がない場合は0とFalseを返す
+        return extract_last_number(title)
     
     def stop(self):
         logger.info(f"NextThreadFinder {self.thread_id} の停止をリクエスト")
@@ -474,7 +505,7 @@ class MainstreamWatcher(QThread):
     # ### 修正箇所: grace_period (猶予期間) をコンストラクタに追加 ###
     def __init__(self, original_title, original_thread_id, current_thread_id, 
                  watch_duration=60, momentum_ratio=1.5, min_res=10, 
-                 grace_period=15, parent=None):
+                 grace_period=15, subject_index=None, base_url=BASE_URL, parent=None):
         super().__init__(parent)
         self.original_title = original_title
         self.original_thread_id = original_thread_id
@@ -484,9 +515,30 @@ class MainstreamWatcher(QThread):
         self.min_res = min_res
         self.grace_period = grace_period # 猶予期間をプロパティとして保持
         self.running = True
-        self.base_url = "https://bbs.eddibb.cc/liveedge"
+        self.base_url = base_url
+        self.validators = ValidatorCache()
+        # SubjectIndex を渡すと subject.txt は索引から読む（取得は索引がまとめて行う）
+        self.subject_index = subject_index
+        self.subject_version = -1
+        # スレッドIDが時刻でないスレッドだけ、dat の先頭を取得して作成時刻を調べる（結果は監視中保持する）
+        self.created_at = {}
+        self.session = HttpClient(timeout=2)
+
+    @property
+    def not_modified_count(self):
+        return self.validators.not_modified_count
 
     def run(self):
+        if self.subject_index is not None:
+            self.subject_index.request_interval(self, 5.0)
+        try:
+            self.watch()
+        finally:
+            if self.subject_index is not None:
+                self.subject_index.release_interval(self)
+            self.session.close()
+
+    def watch(self):
         start_time = time.time()
         # ### 修正箇所: ログメッセージを分かりやすく ###
         logger.info(f"本流スレッドの監視を開始します。{self.grace_period}秒後に比較を開始し、その後{self.watch_duration}秒間監視します。")
@@ -509,35 +561,26 @@ class MainstreamWatcher(QThread):
                 
                 # 1. subject.txt から全スレッドの基本情報を取得
                 all_threads = self.fetch_threads_basic_info()
-                if not all_threads or not self.running: break
-
-                # 2. 現在接続中のスレッド情報を取得
-                current_thread = next((t for t in all_threads if t['id'] == self.current_thread_id), None)
-                if not current_thread:
-                    logger.warning(f"現在接続中のスレッド {self.current_thread_id} が一覧に見つかりません。監視を中止します。")
-                    break
-                
-                # 3. 事前フィルタリングで候補を高速に絞り込む
-                candidate_threads = self.filter_candidates(all_threads)
-
-                # 4. 絞り込んだ候補と現在スレッドの勢いを計算
-                threads_to_fetch_momentum = [current_thread] + candidate_threads
-                self.calculate_momentum_for_list(threads_to_fetch_momentum)
-                
-                current_momentum = int(current_thread.get('momentum', '0').replace(',', ''))
-                if current_momentum == 0: 
+                if all_threads is None:
+                    # subject.txt に変化がなければ比較結果も変わらないため次の周期を待つ
+                    logger.debug("本流監視: subject.txt に変更はありません（304）")
                     time.sleep(5)
                     continue
+                if not all_threads or not self.running: break
 
-                # 5. 最終比較と判断
-                for thread in candidate_threads:
-                    if int(thread.get('momentum', '0').replace(',', '')) > current_momentum * self.momentum_ratio:
-                        logger.info(f"本流スレッドを発見しました: {thread['title']} (勢い: {thread['momentum']})")
-                        if self.running: self.mainstream_thread_found.emit(thread)
-                        self.running = False
-                        break
-                
-                if not self.running: break
+                # 2. 接続中のスレッドと、事前フィルタリングで絞り込んだ候補の勢いを比べる
+                #    作成時刻はスレッドIDから求めるため、通常は subject.txt のレス数だけで計算できる
+                thread = check_mainstream(all_threads, self.original_title, self.original_thread_id,
+                                          self.current_thread_id, self.momentum_ratio, self.min_res,
+                                          created_at_of=self.dat_created_at)
+                if thread is False:
+                    break
+                if thread:
+                    logger.info(f"本流スレッドを発見しました: {thread['title']} (勢い: {thread['momentum']}, "
+                                f"直近5分: {recent_momentum(thread)})")
+                    if self.running: self.mainstream_thread_found.emit(thread)
+                    self.running = False
+                    break
             except Exception as e:
                 logger.error(f"本流スレッド監視中にエラーが発生しました: {e}")
 
@@ -547,161 +590,42 @@ class MainstreamWatcher(QThread):
         if self.running: self.search_finished.emit()
 
     def fetch_threads_basic_info(self):
-        """subject.txt のみからスレッド情報を取得する軽量メソッド"""
-        try:
-            subject_url = f"{self.base_url}/subject.txt"
-            response = requests.get(subject_url, timeout=2)
-            response.raise_for_status()
-            threads = []
-            for line in response.text.splitlines():
-                if not line: continue
-                try:
-                    thread_id_dat, title_res = line.split("<>", 1)
-                    title_res_match = re.search(r'(.*)\s*\((\d+)\)$', title_res)
-                    if not title_res_match: continue
-                    threads.append({
-                        'id': thread_id_dat.replace(".dat", ""),
-                        'title': html.unescape(title_res_match.group(1).strip()),
-                        'res_count': title_res_match.group(2)
-                    })
-                except Exception: continue
+        """subject.txt のみからスレッド情報を取得する軽量メソッド（変更がなければ None）"""
+        if self.subject_index is not None:
+            update = self.subject_index.updated_since(self.subject_version)
+            if update is None:
+                return None
+            threads, self.subject_version = update
             return threads
+        try:
+            return fetch_subject_basic_info(self.validators, self.base_url, timeout=2)
         except Exception:
             return []
 
-    # ### 修正箇所3: filter_candidatesメソッドをNextThreadFinderのロジックで全面刷新 ###
     def filter_candidates(self, all_threads):
-        """
-        NextThreadFinderの判定ロジックを完全に模倣し、本流の可能性がある候補を絞り込む
-        """
-        # 1. ●ルールのチェック
-        starts_with_mark = self.original_title.startswith('●')
-        
-        if starts_with_mark:
-            logger.debug("本流監視: ●ルールを適用します")
-            candidates = []
-            for thread in all_threads:
-                if thread['id'] == self.current_thread_id or thread['id'] == self.original_thread_id:
-                    continue
-                if thread['title'].startswith('●'):
-                    candidates.append(thread)
-            return candidates
-
-        # 2. 通常ルールの適用
-        # a. 期待される次スレの番号を計算
-        current_number, has_number = self.extract_last_number(self.original_title)
-        expected_numbers = []
-        if not has_number:
-            expected_numbers = [2]
-        else:
-            expected_numbers = [current_number + 1, current_number]
-        
-        logger.debug(f"本流監視: 元スレ='{self.original_title}', 期待される番号={expected_numbers}")
-
-        # b. 候補の選別
-        valid_candidates = []
-        for thread in all_threads:
-            # 基本的な除外条件
-            if thread['id'] == self.current_thread_id: continue
-            if thread['id'] == self.original_thread_id: continue
-            if int(thread['res_count']) >= 1000: continue
-            if int(thread['res_count']) < self.min_res: continue
-
-            # タイトル類似度が低すぎるものは、番号チェックの前に除外
-            similarity = difflib.SequenceMatcher(None, self.original_title, thread['title']).ratio()
-            if similarity < 0.3:
-                continue
-
-            # 候補スレの番号が期待値と一致するかチェック
-            next_num, _ = self.extract_last_number(thread['title'])
-            is_star = bool(re.search(r'★(\d+)$', thread['title']))
-
-            if next_num in expected_numbers:
-                valid_candidates.append(thread)
-            elif is_star and next_num in [1, 2]:
-                valid_candidates.append(thread)
-            elif not has_number and next_num == 2:
-                if re.search(r'(★2|Part\.2|Part2)(?:\s+.*)?$', thread['title']):
-                    valid_candidates.append(thread)
-        
-        if valid_candidates:
-            logger.debug(f"本流監視: {len(valid_candidates)}件の候補を発見しました")
-        
-        return valid_candidates
-        
-    # ### 追加4: NextThreadFinderからロジックを移植 ###
+        """NextThreadFinderの判定ロジックを模倣し、本流の可能性がある候補を絞り込む"""
+        return filter_mainstream_candidates(all_threads, self.original_title, self.original_thread_id,
+                                            self.current_thread_id, self.min_res)
+
     def extract_last_number(self, title):
-        """タイトルから末尾に最も近いスレッド進行に関連する数字を抽出"""
-        star_match = re.search(r'★(\d+)$', title)
-        part_dot_match = re.search(r'Part\.(\d+)$', title)
-        part_match = re.search(r'Part(\d+)$', title)
-        
-        if star_match:
-            return float(star_match.group(1)), True
-        elif part_dot_match:
-            return float(part_dot_match.group(1)), True
-        elif part_match:
-            return float(part_match.group(1)), True
-        
-        number_match = re.findall(r'(\d*\.\d+|\d+)', title)
-        if number_match:
-            return float(number_match[-1]), True
-        return 0, False
-
-    def calculate_momentum_for_list(self, thread_list):
-        """指定されたスレッドのリストに対してのみ、勢いを計算する"""
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            future_to_thread = {executor.submit(self.fetch_dat_timestamp, thread['id']): thread for thread in thread_list}
-            for future in future_to_thread:
-                if not self.running: break
-                thread = future_to_thread[future]
-                try:
-                    timestamp = future.result()
-                    momentum = "0"
-                    if timestamp > 0:
-                        time_diff = time.time() - timestamp
-                        if time_diff > 0:
-                            momentum = f"{int(float(thread['res_count']) / time_diff * 86400):,}"
-                    thread['momentum'] = momentum
-                except Exception:
-                    thread['momentum'] = "0"
+        return extract_last_number(title)
+
+    def dat_created_at(self, thread_id):
+        """スレッドIDが時刻でないスレッドの作成時刻（dat の1行目から求め、監視中は保持する）"""
+        if thread_id not in self.created_at:
+            self.created_at[thread_id] = self.fetch_dat_timestamp(thread_id)
+        return self.created_at[thread_id]
 
     def fetch_dat_timestamp(self, thread_id):
+        """dat の先頭だけを取得し、1行目の投稿時刻を返す（取得できなければ 0）"""
         try:
             dat_url = f"{self.base_url}/dat/{thread_id}.dat"
-            response = requests.get(dat_url, timeout=0.5)
+            response = self.session.get(dat_url, headers=first_post_request_headers(), timeout=2)
             response.raise_for_status()
-            date_match = re.search(r'(\d{4}/\d{2}/\d{2}).*?(\d{2}:\d{2}:\d{2})', response.text.split('\n', 1)[0])
-            if date_match:
-                return datetime.strptime(f"{date_match.group(1)} {date_match.group(2)}", '%Y/%m/%d %H:%M:%S').timestamp()
-            return 0
+            return first_post_timestamp(decode_response(response, DAT_ENCODING))
         except Exception:
             return 0
     
     def stop(self):
         logger.info(f"MainstreamWatcher {self.original_title} の停止をリクエスト")
         self.running = False
-    
-if __name__ == "__main__":
-    import sys
-    from PyQt5.QtWidgets import QApplication, QLabel, QVBoxLayout, QWidget
-    
-    app = QApplication(sys.argv)
-    window = QWidget()
-    layout = QVBoxLayout()
-    label = QLabel("スレッド一覧を取得中...")
-    layout.addWidget(label)
-    window.setLayout(layout)
-    window.show()
-    
-    def on_threads_fetched(threads):
-        text = "取得したスレッド一覧:\n"
-        for thread in threads[:10]:
-            text += f"{thread['title']} (ID: {thread['id']}, レス数: {thread['res_count']}, 勢い: {thread['momentum']})\n"
-        label.setText(text)
-    
-    fetcher = ThreadFetcher()
-    fetcher.threads_fetched.connect(on_threads_fetched)
-    fetcher.start()
-    
-    sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+次スレ検索・本流監視で使うスレッドタイトルの類似度計算
+
+タイトルは一度だけ正規化（NFKC・末尾の ★n / Part n の除去）し、文字の出現数を署名として保持する。
+候補は文字の転置インデックスで集め、共通する文字数から求めた類似度の上限
+（difflib.SequenceMatcher.quick_ratio と同じ値）が閾値に届かないものは厳密な計算を省く。
+上限は実際の類似度以上になるため、絞り込みで本来一致するタイトルを落とすことはない。
+厳密な類似度（SequenceMatcher.ratio）はタイトルの組ごとに、インデックスはタイトルの並びごとにキャッシュする。
+"""
+
+import re
+import difflib
+import unicodedata
+from functools import lru_cache
+from collections import Counter, defaultdict
+
+# スレッド進行を表す末尾の番号（番号の違いで類似度が下がらないように取り除く）
+SERIES_NUMBER_PATTERN = re.compile(r'\s*(?:★\s*\d+|part\.?\s*\d+)\s*$', re.IGNORECASE)
+
+
+@lru_cache(maxsize=4096)
+def normalize_title(title):
+    """類似度の比較用にタイトルを正規化する（NFKC・小文字化・末尾の番号と前後の空白の除去）"""
+    normalized = unicodedata.normalize('NFKC', title).casefold().strip()
+    return SERIES_NUMBER_PATTERN.sub('', normalized)
+
+
+@lru_cache(maxsize=4096)
+def title_signature(normalized):
+    """正規化済みタイトルの文字ごとの出現数"""
+    return Counter(normalized)
+
+
+@lru_cache(maxsize=65536)
+def _ratio(normalized_a, normalized_b):
+    return difflib.SequenceMatcher(None, normalized_a, normalized_b).ratio()
+
+
+def similarity(title_a, title_b):
+    """2つのタイトルの類似度（0〜1）。正規化したタイトルの SequenceMatcher.ratio"""
+    return _ratio(normalize_title(title_a), normalize_title(title_b))
+
+
+class TitleIndex:
+    """タイトルの集合に対し、あるタイトルと類似度が閾値以上のものを探す"""
+
+    def __init__(self, titles=()):
+        self.postings = defaultdict(list)  # 文字 -> [(正規化済みタイトル, 出現数)]
+        self.titles = defaultdict(list)    # 正規化済みタイトル -> 元のタイトル
+        for title in titles:
+            self.add(title)
+
+    def add(self, title):
+        normalized = normalize_title(title)
+        if normalized not in self.titles:
+            for char, count in title_signature(normalized).items():
+                self.postings[char].append((normalized, count))
+        self.titles[normalized].append(title)
+
+    def __len__(self):
+        return sum(len(titles) for titles in self.titles.values())
+
+    def similar(self, title, threshold):
+        """類似度が threshold 以上のタイトルを {元のタイトル: 類似度} で返す"""
+        query = normalize_title(title)
+        if not query:
+            return {}
+        overlaps = defaultdict(int)
+        for char, count in title_signature(query).items():
+            for normalized, candidate_count in self.postings.get(char, ()):
+                overlaps[normalized] += min(count, candidate_count)
+
+        matches = {}
+        for normalized, overlap in overlaps.items():
+            # 一致する文字数は共通する文字数を超えないため、これが類似度の上限になる
+            if 2.0 * overlap / (len(query) + len(normalized)) < threshold:
+                continue
+            ratio = _ratio(query, normalized)
+            if ratio >= threshold:
+                for original in self.titles[normalized]:
+                    matches[original] = ratio
+        return matches
+
+
+@lru_cache(maxsize=8)
+def _index_for(titles):
+    return TitleIndex(titles)
+
+
+def similar_titles(title, titles, threshold):
+    """titles のうち title との類似度が threshold 以上のものを {タイトル: 類似度} で返す
+
+    一覧は数秒おきの検索で変わらないことが多いため、同じタイトルの並びに対するインデックスは使い回す。
+    """
+    return _index_for(tuple(titles)).similar(title, threshold)